@@ -1,36 +1,71 @@
+import json
+import math
 import os
-import pickle
+import threading
+import time
 import numpy as np
-import pandas as pd
-from fastapi import FastAPI, HTTPException, Depends, Security
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from sklearn.linear_model import LogisticRegression
-from sklearn.datasets import make_classification
-from sqlalchemy import create_engine, Column, Integer, Float, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-import mlflow
-import mlflow.sklearn
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Header, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, Integer, Float, String, Table, MetaData, Index, select
 from dotenv import load_dotenv
 from loguru import logger
 
+from dataset import (
+    DEFAULT_N_SAMPLES, SQLDatasetStore, make_dataset, rows_digest, format_digest
+)
+from auth import ApiKey, require_scope
+from database import create_db_engine
+from features import FEATURES
+from metrics import (
+    CONTENT_TYPE, INFERENCE_BATCH_SIZE, METRICS_ENABLED, REGISTRY, RETRAIN_PHASE_SECONDS, ROWS_LOADED,
+    PhaseTimer, TimedRoute, instrument_engine
+)
+from inference import MAX_BATCH_SIZE, predict_with_proba, validate_batch, load_npy_batch
+from batching import MICROBATCH_ENABLED, MicroBatcher
+from jobs import JobManager, generate_job
+from prediction_log import PREDICTION_LOG_ENABLED, PredictionLogger, ensure_rollup, prediction_volume
+from model_store import ModelStore, ModelWatcher, ServingModel
+from status_watch import StatusNotifier, etag_matches, status_etag
+from drift import DriftMonitor, reference_profile
+from training import (
+    RETRAIN_MODE, FULL_REFIT_EVERY, TRAIN_EPOCHS, TRAIN_MEMORY_BUDGET_MB, blend_performance, fit_candidates,
+    fit_streaming, in_memory_bytes, partial_update, split_holdout, supports_incremental
+)
+
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Continual ML API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    # Serve whatever is already published, then follow new versions
+    refresh_serving_model()
+    sync_model_versions()
+    model_watcher.start()
+    yield
+    model_watcher.stop()
+    job_manager.shutdown()
+    prediction_logger.stop()
 
-# Security
-security = HTTPBearer()
-API_KEY = os.getenv("API_KEY", "default-key-change-me")
+app = FastAPI(title="Continual ML API", lifespan=lifespan)
+if METRICS_ENABLED:
+    # Must be set before the routes below are declared
+    app.router.route_class = TimedRoute
 
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Security(security)):
-    if credentials.credentials != API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API key")
-    return credentials.credentials
+# Security: scoped, rate-limited API keys (see auth.py)
+require_predict = require_scope("predict")
+require_feedback = require_scope("feedback")
+require_train = require_scope("train")
+require_read = require_scope("read")
 
 # Database setup
-DATABASE_URL = "sqlite:///./ml_data.db"
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine()
+if METRICS_ENABLED:
+    instrument_engine(engine)
 metadata = MetaData()
 
 # Dataset table
@@ -38,139 +73,464 @@ dataset_table = Table(
     'datasets',
     metadata,
     Column('id', Integer, primary_key=True),
-    Column('feature1', Float),
-    Column('feature2', Float),
-    Column('target', Integer)
+    *FEATURES.columns(),
+    Column('target', Integer),
+    # Never reuse ids after /generate clears the table, so the training
+    # watermark can tell new rows from replaced ones
+    sqlite_autoincrement=True
+)
+
+# Every served prediction, written in batches by the prediction logger
+predictions_table = Table(
+    'predictions',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('created_at', Float, nullable=False),
+    *FEATURES.columns(),
+    Column('prediction', Integer),
+    Column('probability', Float),
+    Column('model_version', Integer),
+    Index('ix_predictions_created_at', 'created_at')
+)
+
+# Prediction counts per PREDICTION_ROLLUP_SECONDS interval and model version,
+# updated with every prediction log flush; /stats/predictions reads only this
+prediction_rollup_table = Table(
+    'prediction_rollups',
+    metadata,
+    Column('bucket_start', Integer, primary_key=True),
+    Column('model_version', Integer, primary_key=True),
+    Column('n_predictions', Integer, nullable=False),
+    Column('n_positive', Integer, nullable=False),
+    Column('sum_probability', Float, nullable=False)
+)
+
+# One row per published model; outlives the versions the model store prunes
+model_versions_table = Table(
+    'model_versions',
+    metadata,
+    Column('version', Integer, primary_key=True),
+    Column('published_at', Float, nullable=False),
+    Column('performance', Float),
+    Column('mode', String),
+    Column('candidate', String),
+    Column('model_type', String),
+    Column('n_rows', Integer)
+)
+
+# Content fingerprint per dataset table (row count, max id, rolling digest),
+# kept current by bulk_insert_dataset so checking for new data is O(1)
+fingerprint_table = Table(
+    'dataset_fingerprints',
+    metadata,
+    Column('table_name', String, primary_key=True),
+    Column('n_rows', Integer, nullable=False),
+    Column('max_id', Integer, nullable=False),
+    Column('digest', String(16), nullable=False)
 )
 
-metadata.create_all(engine)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Where training rows live: the datasets table (default) or Parquet partitions
+DATASET_BACKEND = os.getenv("DATASET_BACKEND", "sql")
+if DATASET_BACKEND == "parquet":
+    from parquet_store import ParquetDatasetStore
+    dataset_store = ParquetDatasetStore()
+else:
+    dataset_store = SQLDatasetStore(engine, dataset_table, fingerprint_table)
+
+_db_ready = False
+
+def init_db():
+    """Create missing tables; idempotent and cheap after the first call in a process"""
+    global _db_ready
+    if not _db_ready:
+        metadata.create_all(engine)
+        # Predictions logged before the rollup table existed
+        ensure_rollup(engine, predictions_table, prediction_rollup_table)
+        _db_ready = True
+
+def record_model_version(version, meta):
+    """Add a published model to the model_versions history (no-op if already there)"""
+    row = {
+        "version": version,
+        "published_at": meta.get("published_at", time.time()),
+        "performance": meta.get("performance"),
+        "mode": meta.get("mode"),
+        "candidate": meta.get("candidate"),
+        "model_type": meta.get("model_type"),
+        "n_rows": (meta.get("watermark") or {}).get("n_rows"),
+    }
+    with engine.begin() as connection:
+        exists = connection.execute(
+            select(model_versions_table.c.version).where(model_versions_table.c.version == version)
+        ).first()
+        if exists is None:
+            connection.execute(model_versions_table.insert(), row)
+
+def sync_model_versions():
+    """Backfill the history from versions still in the model store"""
+    with engine.connect() as connection:
+        known = set(connection.execute(select(model_versions_table.c.version)).scalars())
+    for version in model_store.versions():
+        if version not in known:
+            try:
+                record_model_version(version, model_store.load_metadata(version))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read metadata of model version {version}: {str(e)}")
+
+# Wakes /model-status long-poll and SSE clients when the serving model changes
+status_notifier = StatusNotifier()
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Rolling drift, accuracy and calibration metrics for the serving model
+drift_monitor = DriftMonitor()
+
+# Buffered, asynchronous persistence of /predict inputs and outputs
+prediction_logger = PredictionLogger(engine, predictions_table, rollup=prediction_rollup_table)
+
+# Worker pool for dataset generation, training and MLflow logging
+job_manager = JobManager()
 
-# Global model variable and performance tracking
-current_model = None
-model_performance = 0.0
+# Versioned model store shared by the trainer and every API process.
+# serving_model is a read-only snapshot that is only ever replaced as a whole,
+# so request handlers read it once and never see a half-updated model.
+model_store = ModelStore()
+serving_model: Optional[ServingModel] = None
+_serving_lock = threading.Lock()
 PERFORMANCE_THRESHOLD = float(os.getenv("PERFORMANCE_THRESHOLD", "0.8"))
 
-class PredictionInput(BaseModel):
-    feature1: float
-    feature2: float
+# One float field per schema feature
+PredictionInput = FEATURES.request_model()
+
+class BatchPredictionInput(BaseModel):
+    rows: List[List[float]] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class FeedbackInput(BaseModel):
+    rows: List[List[float]] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    # Training targets are binary (stored as int8); anything else would add a class
+    labels: List[Literal[0, 1]] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+def _worker_info():
+    """Identify this API worker and the model version it is serving"""
+    snapshot = serving_model
+    return {"pid": os.getpid(), "model_version": snapshot.version if snapshot is not None else None}
 
 @app.get("/health")
 def health_check():
     logger.info("Health check requested")
-    return {"status": "ok", "message": "API is running"}
+    return {"status": "ok", "message": "API is running", "worker": _worker_info()}
+
+def generate_and_store(n_samples):
+    """Generate a dataset and replace the datasets table with it"""
+    init_db()
+    # Generate dataset
+    X, y = make_dataset(n_samples)
+    
+    # Same rows as already stored: keep them, so ids and the fingerprint the
+    # serving model was trained on stay valid and no retrain is triggered
+    current = dataset_store.fingerprint()
+    if current["n_rows"] == len(X) and current["digest"] == format_digest(rows_digest(X, y)):
+        logger.info("Generated dataset is identical to the stored one - keeping existing rows")
+        return len(X)
+    
+    # Replace existing data in a single bulk transaction
+    return dataset_store.insert(X, y, replace=True)
 
 @app.post("/generate")
-def generate_dataset(api_key: str = Depends(verify_api_key)):
-    """Generate a linear dataset with 2 features and store in DB"""
+def generate_dataset(
+    n_samples: int = Query(DEFAULT_N_SAMPLES, ge=1, le=10_000_000),
+    api_key: ApiKey = Depends(require_train)
+):
+    """Generate a linear dataset over the feature schema and store in DB"""
     try:
-        logger.info("Starting dataset generation")
-        
-        # Generate dataset
-        X, y = make_classification(n_samples=1000, n_features=2, n_redundant=0, 
-                                 n_informative=2, n_clusters_per_class=1, random_state=42)
+        logger.info(f"Starting dataset generation ({n_samples} samples)")
         
-        # Store in database
-        session = SessionLocal()
+        # Runs in a worker process so the API keeps serving meanwhile
+        samples = job_manager.run(generate_job, n_samples)["samples"]
         
-        # Clear existing data
-        session.execute(dataset_table.delete())
-        
-        # Insert new data
-        for i in range(len(X)):
-            session.execute(dataset_table.insert().values(
-                feature1=float(X[i][0]),
-                feature2=float(X[i][1]),
-                target=int(y[i])
-            ))
-        
-        session.commit()
-        session.close()
-        
-        logger.success(f"Dataset generated successfully with {len(X)} samples")
-        return {"message": "Dataset generated and stored successfully", "samples": len(X)}
+        logger.success(f"Dataset generated successfully with {samples} samples")
+        return {"message": "Dataset generated and stored successfully", "samples": samples}
     except Exception as e:
         logger.error(f"Dataset generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def retrain_model_internal():
-    """Internal retraining function - called by Prefect automation only"""
-    global current_model, model_performance
-    
+def set_serving_model(new_model):
+    """Atomically swap the serving model reference, ignoring stale versions"""
+    # The watcher thread and retrain threads both call this; without the lock
+    # an older version could pass the check and overwrite a newer one
+    with _serving_lock:
+        return _set_serving_model(new_model)
+
+def _set_serving_model(new_model):
+    global serving_model
+    current = serving_model
+    if current is not None and new_model.version <= current.version:
+        return current
+    features = new_model.metadata.get("features")
+    if features is not None and features != list(FEATURES.names):
+        logger.error(f"Model version {new_model.version} expects features {features}, "
+                     f"not the configured schema {list(FEATURES.names)} - not serving it")
+        return current
+    serving_model = new_model
+    drift_monitor.reset(new_model.metadata.get("reference_profile"), new_model.version)
+    status_notifier.notify()
+    if new_model.scorer is None:
+        logger.info(f"No fast-path scorer for {type(new_model.model).__name__} - serving through sklearn")
+    logger.info(f"Now serving model version {new_model.version}")
+    return new_model
+
+def refresh_serving_model():
+    """Load the latest published version if it is newer than the one being served"""
+    current = serving_model
+    latest = model_store.latest_version()
+    if latest is not None and (current is None or latest > current.version):
+        set_serving_model(model_store.load_serving_model(latest))
+    return serving_model
+
+model_watcher = ModelWatcher(
+    model_store,
+    get_current_version=lambda: serving_model.version if serving_model is not None else None,
+    on_update=set_serving_model
+)
+
+def retrain_model_internal(full_refit=False):
+    """Internal retraining function - called by Prefect automation only
+
+    In incremental mode only rows added since the last run (id above the
+    training watermark) are loaded and fed to partial_fit. A full refit is
+    done on request, when there is no incremental model yet, when the table
+    was rewritten, or every FULL_REFIT_EVERY incremental updates.
+
+    Unless full_refit is set, nothing is trained when the data fingerprint
+    matches the serving model's. Only one retrain runs at a time across all
+    processes sharing the model store; a concurrent call returns at once
+    with skipped=True.
+    """
+    with model_store.exclusive("retrain") as acquired:
+        if not acquired:
+            logger.info("Another retrain is already running - skipping")
+            snapshot = serving_model
+            return {"message": "Retraining already in progress", "skipped": True, "mode": None, "new_samples": 0,
+                    "accuracy": snapshot.performance if snapshot is not None else 0.0,
+                    "version": snapshot.version if snapshot is not None else None}
+        return _retrain(full_refit)
+
+def _retrain(full_refit):
+    init_db()
     try:
         logger.info("Starting automated model retraining process")
         
-        # Load data from database
-        session = SessionLocal()
-        result = session.execute(dataset_table.select()).fetchall()
-        session.close()
+        # Continue from the newest published model, whichever process trained it
+        base = refresh_serving_model()
+        if base is not None and base.model is None:
+            # Served from the compact artifact; training needs the estimator itself
+            base = base._replace(model=model_store.load(base.version)[0])
+        watermark = base.metadata.get("watermark") if base is not None else None
         
-        if not result:
+        fingerprint = dataset_store.fingerprint()
+        n_rows, max_id = fingerprint["n_rows"], fingerprint["max_id"]
+        
+        if n_rows == 0:
             logger.warning("No data available for training - generating default dataset")
             # Generate default dataset if none exists
-            X, y = make_classification(n_samples=1000, n_features=2, n_redundant=0, 
-                                     n_informative=2, n_clusters_per_class=1, random_state=42)
-            # Store in database
-            session = SessionLocal()
-            for i in range(len(X)):
-                session.execute(dataset_table.insert().values(
-                    feature1=float(X[i][0]),
-                    feature2=float(X[i][1]),
-                    target=int(y[i])
-                ))
-            session.commit()
-            session.close()
+            X, y = make_dataset()
+            dataset_store.insert(X, y, replace=False)
+            fingerprint = dataset_store.fingerprint()
+            n_rows, max_id = fingerprint["n_rows"], fingerprint["max_id"]
+        
+        if not full_refit and base is not None and base.metadata.get("data_fingerprint") == fingerprint:
+            logger.info(f"Training data unchanged since model version {base.version} - skipping retrain")
+            return {"message": "No new data - model unchanged", "accuracy": base.performance,
+                    "mode": base.metadata.get("mode"), "new_samples": 0, "version": base.version, "skipped": True}
+        
+        incremental = (
+            RETRAIN_MODE == "incremental"
+            and not full_refit
+            and watermark is not None
+            and supports_incremental(base.model)
+            and watermark["updates"] < FULL_REFIT_EVERY
+            and base.metadata.get("features", list(FEATURES.names)) == list(FEATURES.names)
+        )
+        if incremental:
+            # Rows at or below the watermark must be exactly the ones we trained
+            # on; anything else means /generate replaced the table.
+            seen_rows, _ = dataset_store.watermark(max_id=watermark["max_id"])
+            if seen_rows != watermark["n_rows"]:
+                logger.info("Dataset was rewritten since last training - doing a full refit")
+                incremental = False
+        
+        timer = PhaseTimer(RETRAIN_PHASE_SECONDS)
+        if incremental:
+            with timer.phase("load"):
+                X, y = dataset_store.load(min_id=watermark["max_id"], max_id=max_id)
+            ROWS_LOADED.inc(len(X), "incremental")
+            n_samples = len(X)
+            if len(X) == 0:
+                logger.info("No new rows since last training - keeping current model")
+                return {"message": "No new data - model unchanged", "accuracy": base.performance,
+                        "mode": base.metadata.get("mode"), "new_samples": 0, "version": base.version, "skipped": True}
+            logger.info(f"Incrementally updating model with {len(X)} new samples")
+            with timer.phase("fit"):
+                # Score the new rows before learning from them (prequential evaluation)
+                prequential = base.model.score(X, y)
+                model = partial_update(base.model, X, y)
+            # performance stays a held-out estimate: the new rows only count
+            # once there are enough of them, weighted against the rows behind it
+            score, evaluated_rows = blend_performance(
+                base.performance, base.metadata.get("evaluated_rows", 0), prequential, len(X))
+            logger.info(f"Prequential accuracy {prequential:.3f} on {len(X)} rows; accuracy now {score:.3f}")
+            profile = base.metadata.get("reference_profile")
+            candidate = base.metadata.get("candidate")
+            candidates = []
+        elif in_memory_bytes(n_rows, FEATURES.n_features) > TRAIN_MEMORY_BUDGET_MB * 2**20:
+            # Too big to load: stream shuffled blocks through SGD instead
+            logger.info(f"{n_rows} rows exceed the {TRAIN_MEMORY_BUDGET_MB:g} MB training budget - training out of core")
+            with timer.phase("fit"):
+                best = fit_streaming(dataset_store, n_rows, max_id, FEATURES.n_features)
+            # Every epoch plus the validation pass reads the table once
+            ROWS_LOADED.inc(n_rows * (TRAIN_EPOCHS + 1), "streaming")
+            n_samples = n_rows
+            model, score, candidate = best["model"], best["accuracy"], best["name"]
+            evaluated_rows = best["validation_rows"]
+            logger.info(f"Streamed {TRAIN_EPOCHS} epochs in blocks of {best['block_rows']} rows: accuracy {score:.3f}")
+            candidates = [best]
+            profile = reference_profile(best["sample"])
         else:
-            # Prepare data
-            X = np.array([[row.feature1, row.feature2] for row in result])
-            y = np.array([row.target for row in result])
+            # Load training rows straight into NumPy buffers
+            with timer.phase("load"):
+                X, y = dataset_store.load(max_id=max_id)
+            ROWS_LOADED.inc(len(X), "full")
+            n_samples = len(X)
+            X_train, X_val, y_train, y_val = split_holdout(X, y)
+            logger.info(f"Training with {len(X_train)} samples, validating on {len(X_val)}")
+            # Candidates are fitted in parallel and the best on validation wins
+            with timer.phase("fit"):
+                candidates = fit_candidates(X_train, y_train, X_val, y_val, RETRAIN_MODE)
+            best = candidates[0]
+            model, score, candidate = best["model"], best["accuracy"], best["name"]
+            evaluated_rows = len(y_val)
+            logger.info("Candidates: " + ", ".join(f"{c['name']}={c['accuracy']:.3f}" for c in candidates))
+            profile = reference_profile(X_train)
         
-        logger.info(f"Training with {len(X)} samples")
+        mode = "incremental" if incremental else "full"
         
-        # Start MLflow tracking (moved here to prevent hanging during import)
+        # Imported here: mlflow alone costs more than the rest of the API's startup
+        import mlflow
+        import mlflow.sklearn
         mlflow.set_experiment("continual_ml")
-        with mlflow.start_run():
-            # Train model
-            model = LogisticRegression(random_state=42)
-            model.fit(X, y)
-            
+        with mlflow.start_run() as run:
             # Log metrics
-            score = model.score(X, y)
             mlflow.log_metric("accuracy", score)
-            mlflow.log_param("model_type", "LogisticRegression")
-            mlflow.log_param("n_samples", len(X))
+            if incremental:
+                mlflow.log_metric("prequential_accuracy", prequential)
+            mlflow.log_param("evaluation", "prequential" if incremental else "holdout")
+            mlflow.log_param("model_type", type(model).__name__)
+            mlflow.log_param("retrain_mode", mode)
+            mlflow.log_param("n_samples", n_samples)
             mlflow.log_param("performance_threshold", PERFORMANCE_THRESHOLD)
+            mlflow.log_param("candidate", candidate)
+            
+            # One child run per candidate considered for this version
+            for result in candidates:
+                with mlflow.start_run(run_name=result["name"], nested=True):
+                    mlflow.log_params({"candidate": result["name"], "model_type": type(result["model"]).__name__, **result["params"]})
+                    mlflow.log_metric("accuracy", result["accuracy"])
+                    mlflow.log_metric("fit_seconds", result["fit_seconds"])
+                    mlflow.set_tag("selected", str(result["name"] == candidate).lower())
             
             # Log model
-            mlflow.sklearn.log_model(model, "model")
+            with timer.phase("log_model"):
+                mlflow.sklearn.log_model(model, "model")
+            mlflow.log_metrics({f"{phase}_seconds": seconds for phase, seconds in timer.seconds.items()})
             
-            # Update global model and performance
-            current_model = model
-            model_performance = score
+            # Publish to the model store; API processes pick it up from there
+            with timer.phase("publish"):
+                published = model_store.publish(model, {
+                    "performance": score,
+                    # Rows performance was measured on, so incremental updates can weight it
+                    "evaluated_rows": evaluated_rows,
+                    "mode": mode,
+                    "model_type": type(model).__name__,
+                    "candidate": candidate,
+                    # Input columns, in order, the model expects
+                    "features": list(FEATURES.names),
+                    # Validation accuracy of every candidate in the last full refit
+                    "candidates": {c["name"]: c["accuracy"] for c in candidates} or base.metadata.get("candidates"),
+                    "mlflow_run_id": run.info.run_id,
+                    # Training feature distribution the drift monitor compares against
+                    "reference_profile": profile,
+                    # Highest datasets.id and row count this model was trained on
+                    "watermark": {
+                        "max_id": max_id,
+                        "n_rows": n_rows,
+                        "updates": watermark["updates"] + 1 if incremental else 0,
+                    },
+                    # Exact training data identity, so unchanged data skips retraining
+                    "data_fingerprint": fingerprint,
+                    # Where this run's time went (load, fit, log_model), for /metrics
+                    "retrain_seconds": dict(timer.seconds),
+                    "rows_loaded": n_samples,
+                })
+            mlflow.log_param("model_version", published.version)
+            # Version the compact serving artifact with the run
+            for path in model_store.artifact_paths(published.version):
+                mlflow.log_artifact(path, artifact_path="serving")
+            set_serving_model(published)
+            record_model_version(published.version, published.metadata)
             
-            logger.success(f"Model retrained successfully with accuracy: {score:.3f}")
-            return {"message": "Model retrained successfully", "accuracy": score}
+            logger.success(f"Model retrained successfully ({mode}) with accuracy: {score:.3f}")
+            return {"message": "Model retrained successfully", "accuracy": score, "mode": mode, "new_samples": n_samples, "version": published.version, "candidate": candidate, "timings": timer.seconds}
             
     except Exception as e:
         logger.error(f"Model retraining failed: {str(e)}")
         raise Exception(f"Retraining failed: {str(e)}")
 
+def _predict_with(snapshot, X):
+    """Score a feature matrix with one serving snapshot"""
+    if snapshot.scorer is not None:
+        return snapshot.scorer.predict_with_proba(X)
+    return predict_with_proba(snapshot.model, X)
+
+def _predict_current(X):
+    """Score a feature matrix with whatever model is serving at call time"""
+    snapshot = serving_model
+    if snapshot is None:
+        raise RuntimeError("No model available")
+    INFERENCE_BATCH_SIZE.observe(len(X), "microbatch")
+    return _predict_with(snapshot, X)
+
+# Optional request coalescer: concurrent /predict calls share one predict_proba
+predict_batcher = MicroBatcher(_predict_current) if MICROBATCH_ENABLED else None
+
 @app.post("/predict")
-def predict(input_data: PredictionInput, api_key: str = Depends(verify_api_key)):
+async def predict(input_data: PredictionInput, api_key: ApiKey = Depends(require_predict)):
     """Make prediction using logistic regression on the latest dataset"""
-    global current_model
-    
-    if current_model is None:
+    snapshot = serving_model
+    if snapshot is None:
         logger.warning("Prediction attempted without trained model")
         raise HTTPException(status_code=400, detail="No model available. Please wait for automated retraining.")
     
+    # Prepare input: every schema feature in one attrgetter call
+    row = FEATURES.row(input_data)
+    # Checked before any path: a bad row must not reach a shared micro-batch
+    if not all(math.isfinite(x) for x in row):
+        raise HTTPException(status_code=422, detail="Input contains NaN or infinite values")
+    
     try:
-        # Prepare input
-        X = np.array([[input_data.feature1, input_data.feature2]])
+        # Make prediction - the label is derived from the probabilities
+        if snapshot.scorer is not None and predict_batcher is None:
+            # A dot product and a sigmoid: cheaper than any thread hand-off
+            prediction, probability = snapshot.scorer.predict_one(row)
+            INFERENCE_BATCH_SIZE.observe(1, "single")
+        elif predict_batcher is not None:
+            prediction, probability = await predict_batcher.submit(row)
+        else:
+            INFERENCE_BATCH_SIZE.observe(1, "single")
+            labels, probabilities = await run_in_threadpool(_predict_with, snapshot, np.array([row]))
+            prediction, probability = labels[0], probabilities[0]
         
-        # Make prediction
-        prediction = current_model.predict(X)[0]
-        probability = current_model.predict_proba(X)[0].max()
+        if PREDICTION_LOG_ENABLED:
+            prediction_logger.log((time.time(), *row, int(prediction), float(probability), snapshot.version))
+        drift_monitor.observe(row)
         
         logger.info(f"Prediction made: {prediction} with probability {probability:.3f}")
         
@@ -183,21 +543,277 @@ def predict(input_data: PredictionInput, api_key: str = Depends(verify_api_key))
         logger.error(f"Prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/model-status")
-def get_model_status():
-    """Get current model status and performance"""
-    global current_model, model_performance
+def _predict_batch(X):
+    """Run one vectorized predict_proba over a validated batch"""
+    snapshot = serving_model
+    if snapshot is None:
+        logger.warning("Batch prediction attempted without trained model")
+        raise HTTPException(status_code=400, detail="No model available. Please wait for automated retraining.")
+    
+    try:
+        INFERENCE_BATCH_SIZE.observe(len(X), "batch")
+        labels, probabilities = _predict_with(snapshot, X)
+    except Exception as e:
+        logger.error(f"Batch prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    predictions = labels.astype(int).tolist()
+    probabilities = probabilities.astype(float).tolist()
+    if PREDICTION_LOG_ENABLED:
+        now = time.time()
+        prediction_logger.log_many([
+            (now, *row, p, prob, snapshot.version)
+            for row, p, prob in zip(X.tolist(), predictions, probabilities)
+        ])
+    
+    drift_monitor.observe_many(X)
+    
+    logger.info(f"Batch prediction made for {len(X)} rows")
     return {
-        "model_trained": current_model is not None,
-        "performance": model_performance,
+        "count": len(X),
+        "predictions": predictions,
+        "probabilities": probabilities
+    }
+
+@app.post("/predict/batch")
+def predict_batch(input_data: BatchPredictionInput, api_key: ApiKey = Depends(require_predict)):
+    """Make predictions for many rows (JSON lists of features) in one call"""
+    try:
+        X = validate_batch(np.asarray(input_data.rows, dtype=np.float64))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _predict_batch(X)
+
+@app.post("/predict/batch/npy")
+async def predict_batch_npy(request: Request, api_key: ApiKey = Depends(require_predict)):
+    """Make predictions for a NumPy .npy encoded (n, n_features) feature matrix"""
+    payload = await request.body()
+    try:
+        X = load_npy_batch(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Large batches take a few ms of CPU - keep that off the event loop
+    return await run_in_threadpool(_predict_batch, X)
+
+@app.post("/jobs/generate", status_code=202)
+def submit_generate_job(
+    n_samples: int = Query(DEFAULT_N_SAMPLES, ge=1, le=10_000_000),
+    api_key: ApiKey = Depends(require_train)
+):
+    """Queue dataset generation in the background and return a job id to poll"""
+    return job_manager.submit("generate", n_samples=n_samples).to_dict()
+
+@app.post("/jobs/retrain", status_code=202)
+def submit_retrain_job(full_refit: bool = False, api_key: ApiKey = Depends(require_train)):
+    """Queue a retrain (training + MLflow logging + publish) in the background"""
+    return job_manager.submit("retrain", full_refit=full_refit).to_dict()
+
+def _get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, api_key: ApiKey = Depends(require_read)):
+    """Poll the status of a background job"""
+    return _get_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, api_key: ApiKey = Depends(require_read)):
+    """Return a finished job's result; 202 while it is still pending or running"""
+    job = _get_job(job_id)
+    if job.status in ("pending", "running"):
+        return JSONResponse(status_code=202, content=job.to_dict())
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    return {**job.to_dict(), "result": job.result}
+
+@app.post("/feedback")
+def submit_feedback(input_data: FeedbackInput, api_key: ApiKey = Depends(require_feedback)):
+    """Report ground-truth labels for live traffic.
+
+    Rows are scored by the serving model to update the windowed accuracy and
+    calibration metrics, then appended to the training data.
+    """
+    try:
+        X = validate_batch(np.asarray(input_data.rows, dtype=np.float64))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    y = np.asarray(input_data.labels, dtype=np.int64)
+    if len(y) != len(X):
+        raise HTTPException(status_code=422, detail=f"Got {len(X)} rows but {len(y)} labels")
+    
+    snapshot = serving_model
+    if snapshot is not None:
+        labels, probabilities = _predict_with(snapshot, X)
+        drift_monitor.observe_labeled(probabilities, labels == y)
+    
+    dataset_store.insert(X, y, replace=False)
+    logger.info(f"Received feedback for {len(X)} rows")
+    return {"accepted": len(X)}
+
+@app.get("/dataset/fingerprint")
+def get_dataset_fingerprint(api_key: ApiKey = Depends(require_read)):
+    """Identity of the current training data and whether the serving model was trained on it"""
+    fingerprint = dataset_store.fingerprint()
+    snapshot = serving_model
+    trained_on = snapshot.metadata.get("data_fingerprint") if snapshot is not None else None
+    return {
+        **fingerprint,
+        "model_version": snapshot.version if snapshot is not None else None,
+        "model_fingerprint": trained_on,
+        "model_up_to_date": trained_on == fingerprint,
+    }
+
+@app.get("/drift")
+def get_drift():
+    """Rolling drift metrics (PSI/KS per feature, windowed accuracy, calibration) for this worker"""
+    return drift_monitor.evaluate(PERFORMANCE_THRESHOLD)
+
+def _serving_metadata(key):
+    snapshot = serving_model
+    return snapshot.metadata.get(key) if snapshot is not None else None
+
+REGISTRY.gauge("model_version", "Version of the model this worker is serving",
+               lambda: serving_model.version if serving_model is not None else None)
+REGISTRY.gauge("model_training_rows", "Rows the serving model's training run loaded",
+               lambda: _serving_metadata("rows_loaded"))
+REGISTRY.gauge("model_retrain_phase_seconds", "Phase durations of the run that produced the serving model",
+               lambda: {(phase,): seconds for phase, seconds in (_serving_metadata("retrain_seconds") or {}).items()},
+               labelnames=("phase",))
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of this worker's counters and histograms"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/prediction-log/stats")
+def get_prediction_log_stats(api_key: ApiKey = Depends(require_read)):
+    """Buffer depth, throughput and drop counters of the prediction logger"""
+    return prediction_logger.stats()
+
+@app.get("/stats/predictions")
+def get_prediction_stats(
+    bucket_seconds: int = Query(3600, ge=1, le=31 * 86400),
+    start: Optional[float] = Query(None, description="Unix time of the first bucket; default the first prediction"),
+    end: Optional[float] = Query(None, description="Unix time to stop before"),
+    limit: int = Query(500, ge=1, le=5000),
+    api_key: ApiKey = Depends(require_read)
+):
+    """Prediction volume, positive rate and mean probability per time bucket, from the rollup.
+
+    bucket_seconds is rounded up to a multiple of PREDICTION_ROLLUP_SECONDS.
+    Pass next_start back as start to fetch the following page.
+    """
+    rollup_seconds = prediction_logger.rollup_seconds
+    bucket_seconds = -(-bucket_seconds // rollup_seconds) * rollup_seconds
+    buckets, next_start = prediction_volume(engine, prediction_rollup_table, bucket_seconds, start, end, limit)
+    return {"bucket_seconds": bucket_seconds, "buckets": buckets, "next_start": next_start}
+
+@app.get("/stats/models")
+def get_model_history(
+    limit: int = Query(50, ge=1, le=1000),
+    before: Optional[int] = Query(None, description="Only versions older than this one"),
+    api_key: ApiKey = Depends(require_read)
+):
+    """Published model versions, newest first; pass next_before back as before for the next page"""
+    c = model_versions_table.c
+    query = select(model_versions_table).order_by(c.version.desc()).limit(limit + 1)
+    if before is not None:
+        query = query.where(c.version < before)
+    with engine.connect() as connection:
+        rows = [dict(row) for row in connection.execute(query).mappings()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {"models": rows, "next_before": rows[-1]["version"] if more else None}
+
+def _model_status():
+    """Build the /model-status payload and its ETag"""
+    snapshot = serving_model
+    performance = snapshot.performance if snapshot is not None else 0.0
+    status = {
+        "model_trained": snapshot is not None,
+        "model_version": snapshot.version if snapshot is not None else None,
+        "performance": performance,
         "threshold": PERFORMANCE_THRESHOLD,
-        "needs_retraining": model_performance < PERFORMANCE_THRESHOLD,
+        "needs_retraining": performance < PERFORMANCE_THRESHOLD,
+        "worker": _worker_info(),
+        "microbatching": predict_batcher.stats() if predict_batcher is not None else None,
         "automation_note": "Model retraining is fully automated via Prefect - no manual intervention required"
     }
+    return status, status_etag(status)
+
+def _status_response(status, etag):
+    return JSONResponse(content=status, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def _not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/model-status")
+def get_model_status(if_none_match: Optional[str] = Header(None)):
+    """Get current model status and performance; 304 if the client's ETag is still current"""
+    status, etag = _model_status()
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return _status_response(status, etag)
+
+@app.get("/model-status/watch")
+async def watch_model_status(
+    timeout: float = Query(30.0, ge=0, le=300),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Long-poll: answer as soon as the status differs from the client's ETag, or 304 after timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status, etag = _model_status()
+        if not etag_matches(if_none_match, etag):
+            return _status_response(status, etag)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return _not_modified(etag)
+        await status_notifier.wait(remaining)
+
+@app.get("/model-status/events")
+async def stream_model_status(
+    request: Request,
+    timeout: float = Query(300.0, ge=0, le=3600),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Server-sent events: a `status` event now and on every model change.
+
+    The stream closes after `timeout` seconds; EventSource clients reconnect
+    with Last-Event-ID and only get an event if the status changed meanwhile.
+    """
+    deadline = time.monotonic() + timeout
+    
+    async def events():
+        last_etag = last_event_id
+        while not await request.is_disconnected():
+            status, etag = _model_status()
+            if etag != last_etag:
+                last_etag = etag
+                yield f"event: status\nid: {etag}\ndata: {json.dumps(status)}\n\n"
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not await status_notifier.wait(min(remaining, SSE_KEEPALIVE_SECONDS)):
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting FastAPI application")
     host = os.getenv("FASTAPI_HOST", "0.0.0.0")
     port = int(os.getenv("FASTAPI_PORT", 8000))
-    uvicorn.run(app, host=host, port=port) 
\ No newline at end of file
+    workers = int(os.getenv("API_WORKERS", 1))
+    if workers > 1:
+        # Each worker loads the latest published model from the shared model
+        # store at startup and follows new versions with its own watcher
+        logger.info(f"Starting {workers} API workers")
+        uvicorn.run("app:app", host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(app, host=host, port=port) 
\ No newline at end of file
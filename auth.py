@@ -0,0 +1,177 @@
+"""API keys: several keys with scopes, hashed in memory, rate-limited per key.
+
+Keys are only ever held as SHA-256 digests. A request hashes its bearer
+token once and looks the digest up in a dict, so the cost does not grow
+with the number of keys, and the final equality check is constant-time.
+Each key has its own token bucket, so one noisy client runs out of tokens
+instead of starving inference for the others. Limits are per process: with
+several uvicorn workers a key gets its rate once per worker.
+
+API_KEYS holds extra keys as comma-separated entries:
+
+    name:secret:scope+scope[:rate[:burst]]
+
+where secret is the key itself or `sha256=<hex digest>` of it, scopes come
+from SCOPES (or `*`), and rate/burst override the defaults for that key.
+The legacy API_KEY is always accepted with every scope.
+Run `python auth.py hash <key>` to print the digest form of a key.
+"""
+import hashlib
+import hmac
+import math
+import os
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Security
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from metrics import AUTH_REJECTIONS
+
+load_dotenv()
+
+API_KEY = os.getenv("API_KEY", "default-key-change-me")
+API_KEYS = os.getenv("API_KEYS", "")
+# Sustained requests per second per key, and how many may arrive at once
+# (0 disables rate limiting)
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "1000"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "2000"))
+
+SCOPES = ("predict", "feedback", "train", "read")
+HASH_PREFIX = "sha256="
+
+
+def hash_key(secret):
+    return hashlib.sha256(secret.encode()).digest()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens/sec, holding at most `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "_lock")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, now=None):
+        """Spend one token; returns 0.0 if one was available, else seconds until one is"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if tokens >= 1.0:
+                self.tokens = tokens - 1.0
+                return 0.0
+            self.tokens = tokens
+            return (1.0 - tokens) / self.rate
+
+
+class ApiKey(NamedTuple):
+    name: str
+    digest: bytes
+    scopes: frozenset
+    limiter: Optional[TokenBucket]
+
+    def allows(self, scope):
+        return scope in self.scopes or "*" in self.scopes
+
+
+class KeyStore:
+    """Digest -> ApiKey lookup"""
+
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._keys = {}
+
+    def add(self, name, secret, scopes=("*",), rate=None, burst=None):
+        """Register a key given as plaintext or as `sha256=<hex>`"""
+        if secret.startswith(HASH_PREFIX):
+            digest = bytes.fromhex(secret[len(HASH_PREFIX):])
+            if len(digest) != 32:
+                raise ValueError(f"API key {name!r}: expected a 64-character SHA-256 hex digest")
+        elif secret:
+            digest = hash_key(secret)
+        else:
+            raise ValueError(f"API key {name!r} is empty")
+        scopes = frozenset(scopes)
+        unknown = scopes - {*SCOPES, "*"}
+        if unknown:
+            raise ValueError(f"API key {name!r}: unknown scopes {sorted(unknown)}")
+        rate = self.rate if rate is None else rate
+        burst = self.burst if burst is None else burst
+        limiter = TokenBucket(rate, max(burst, 1.0)) if rate > 0 else None
+        key = self._keys[digest] = ApiKey(name, digest, scopes, limiter)
+        return key
+
+    def authenticate(self, token):
+        """The ApiKey a bearer token belongs to, or None"""
+        digest = hash_key(token)
+        key = self._keys.get(digest)
+        if key is None or not hmac.compare_digest(key.digest, digest):
+            return None
+        return key
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def from_env(cls, legacy_key=API_KEY, spec=API_KEYS):
+        store = cls()
+        if legacy_key:
+            store.add("default", legacy_key)
+        for entry in filter(None, (part.strip() for part in spec.split(","))):
+            fields = entry.split(":")
+            if len(fields) < 3 or len(fields) > 5:
+                raise ValueError(f"Invalid API_KEYS entry for {fields[0]!r}: expected name:secret:scopes[:rate[:burst]]")
+            name, secret, scopes = fields[:3]
+            rate = float(fields[3]) if len(fields) > 3 else None
+            burst = float(fields[4]) if len(fields) > 4 else None
+            store.add(name, secret, scopes.split("+"), rate, burst)
+        return store
+
+
+KEY_STORE = KeyStore.from_env()
+
+security = HTTPBearer()
+
+
+def require_scope(scope, store=None):
+    """FastAPI dependency accepting keys with `scope`; returns the ApiKey.
+
+    Async so FastAPI runs it on the event loop instead of handing every
+    request to the threadpool for a few microseconds of work.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown scope {scope!r}")
+
+    async def verify(credentials: HTTPAuthorizationCredentials = Security(security)):
+        key = (store or KEY_STORE).authenticate(credentials.credentials)
+        if key is None:
+            AUTH_REJECTIONS.inc(1, "invalid_key")
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        if not key.allows(scope):
+            AUTH_REJECTIONS.inc(1, "scope")
+            raise HTTPException(status_code=403, detail=f"API key lacks the '{scope}' scope")
+        if key.limiter is not None:
+            wait = key.limiter.take()
+            if wait:
+                AUTH_REJECTIONS.inc(1, "rate_limited")
+                raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                                    headers={"Retry-After": str(math.ceil(wait))})
+        return key
+
+    return verify
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "hash":
+        sys.exit("usage: python auth.py hash <key>")
+    print(HASH_PREFIX + hash_key(sys.argv[2]).hex())
@@ -0,0 +1,115 @@
+"""Asyncio micro-batcher that coalesces concurrent single-row predictions"""
+import asyncio
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MICROBATCH_ENABLED = os.getenv("PREDICT_MICROBATCH", "false").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+
+
+class MicroBatcher:
+    """Collect rows for up to max_batch_size items or max_wait_ms, then score them together.
+
+    predict_fn receives an (n, d) array and returns (labels, probabilities);
+    each waiting caller gets its own row of the result back. It runs in the
+    loop's default executor so a slow model never blocks other coroutines.
+    If it fails on a batch, the rows are retried one by one so only the
+    callers whose row fails get the exception.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # The queue and worker task belong to one event loop; recreate them
+        # if we are now running on a different one (e.g. a new test client).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, row):
+        """Queue one feature row and wait for its (label, probability)"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one item, then gather more until the batch is full or the deadline passes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without paying for a timer
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _predict(self, rows):
+        X = np.array(rows, dtype=np.float64)
+        return await self._loop.run_in_executor(None, self.predict_fn, X)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            futures = [future for _, future in batch]
+            try:
+                labels, probabilities = await self._predict([row for row, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    if not futures[0].done():
+                        futures[0].set_exception(e)
+                    continue
+                await self._run_separately(batch)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for future, label, probability in zip(futures, labels, probabilities):
+                if not future.done():
+                    future.set_result((label, probability))
+
+    async def _run_separately(self, batch):
+        """Score each row of a failed batch on its own, failing only the rows that fail again"""
+        for row, future in batch:
+            try:
+                labels, probabilities = await self._predict([row])
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += 1
+            if not future.done():
+                future.set_result((labels[0], probabilities[0]))
+
+    def stats(self):
+        """Return counters describing how well requests are being coalesced"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
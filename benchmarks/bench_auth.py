@@ -0,0 +1,87 @@
+"""Measure what API key checks cost per request.
+
+Times KeyStore.authenticate and TokenBucket.take on their own, then drives
+minimal FastAPI apps over ASGI (as bench_metrics does) whose /ping endpoint
+is guarded by:
+
+    none     no dependency
+    legacy   the previous check: a sync dependency comparing one key with !=
+    scoped   require_scope: hashed lookup, constant-time compare, token bucket
+
+Usage:
+    python benchmarks/bench_auth.py --calls 20000 --keys 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI, HTTPException, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from auth import KeyStore, require_scope
+from bench_metrics import drive, per_call_ns
+
+KEY = "bench-key"
+
+
+def make_app(guard):
+    app = FastAPI()
+    dependencies = [Depends(guard)] if guard is not None else []
+
+    @app.get("/ping", dependencies=dependencies)
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def legacy_guard():
+    security = HTTPBearer()
+
+    def verify_api_key(credentials: HTTPAuthorizationCredentials = Security(security)):
+        if credentials.credentials != KEY:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return credentials.credentials
+
+    return verify_api_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--keys", type=int, default=1_000, help="extra keys registered in the store")
+    args = parser.parse_args()
+
+    store = KeyStore(rate=1e12, burst=1e12)
+    for i in range(args.keys):
+        store.add(f"key{i}", f"secret-{i}", ["predict"])
+    key = store.add("bench", KEY, ["predict"])
+    call = min(per_call_ns(lambda: None, args.calls * 4) for _ in range(args.rounds))
+    lookup = min(per_call_ns(lambda: store.authenticate(KEY), args.calls * 4) for _ in range(args.rounds))
+    take = min(per_call_ns(key.limiter.take, args.calls * 4) for _ in range(args.rounds))
+    print(f"authenticate ({len(store)} keys) {lookup - call:7.0f} ns")
+    print(f"TokenBucket.take         {take - call:7.0f} ns")
+
+    apps = {
+        "none": make_app(None),
+        "legacy": make_app(legacy_guard()),
+        "scoped": make_app(require_scope("predict", store)),
+    }
+    headers = [(b"authorization", f"Bearer {KEY}".encode())]
+    loop = asyncio.new_event_loop()
+    best = dict.fromkeys(apps, float("inf"))
+    # Interleave rounds so drift in machine load hits every variant alike
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            best[name] = min(best[name], loop.run_until_complete(drive(app, args.calls, headers)))
+    loop.close()
+    for name, ns in best.items():
+        print(f"FastAPI GET, {name:<7} {ns / 1000:7.1f} us  (+{ns - best['none']:.0f} ns per request)")
+
+
+if __name__ == "__main__":
+    main()
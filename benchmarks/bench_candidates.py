@@ -0,0 +1,58 @@
+"""Compare sequential and parallel candidate training.
+
+Fits every candidate of a retrain mode once with n_jobs=1 and once in
+parallel, and reports the wall-clock time of each run next to the slowest
+single candidate and the sum of all candidate fit times. With enough cores
+the parallel run should land near the slowest candidate.
+
+Usage:
+    python benchmarks/bench_candidates.py --rows 200000 --jobs -1
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import make_dataset
+from training import fit_candidates, split_holdout
+
+
+def timed_run(X_train, y_train, X_val, y_val, mode, n_jobs):
+    start = time.perf_counter()
+    results = fit_candidates(X_train, y_train, X_val, y_val, mode=mode, n_jobs=n_jobs)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--mode", choices=["full", "incremental"], default="full")
+    parser.add_argument("--jobs", type=int, default=-1, help="joblib n_jobs for the parallel run")
+    args = parser.parse_args()
+
+    X, y = make_dataset(args.rows)
+    X_train, X_val, y_train, y_val = split_holdout(X, y)
+    print(f"{args.rows} rows, {args.mode} candidates, {os.cpu_count()} CPUs")
+
+    # Warm up the worker pool so process start-up is not billed to the run
+    fit_candidates(X_train[:1000], y_train[:1000], X_val[:200], y_val[:200], mode=args.mode, n_jobs=args.jobs)
+
+    sequential, results = timed_run(X_train, y_train, X_val, y_val, args.mode, 1)
+    parallel, _ = timed_run(X_train, y_train, X_val, y_val, args.mode, args.jobs)
+
+    for result in results:
+        print(f"  {result['name']:<16} accuracy {result['accuracy']:.4f}  fit {result['fit_seconds']:.2f}s")
+    slowest = max(result["fit_seconds"] for result in results)
+    total = sum(result["fit_seconds"] for result in results)
+    print(f"sum of fits   {total:.2f}s")
+    print(f"slowest fit   {slowest:.2f}s")
+    print(f"sequential    {sequential:.2f}s")
+    print(f"parallel      {parallel:.2f}s  ({sequential / parallel:.2f}x)")
+    print(f"selected      {results[0]['name']}")
+
+
+if __name__ == "__main__":
+    main()
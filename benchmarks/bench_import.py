@@ -0,0 +1,70 @@
+"""Measure cold import time of the API with `python -X importtime`.
+
+Each module is imported `--runs` times in a fresh interpreter. The report
+gives the median total import time and the slowest top-level dependencies
+of the last run. With --budget-ms the script exits non-zero when the median
+goes over budget, so it can guard startup time in CI.
+
+Usage:
+    python benchmarks/bench_import.py --modules app --runs 5 --budget-ms 2000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Return {top-level import: cumulative microseconds} and the module's own total"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    top_level = {}
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace("import time:", "|", 1).split("|"))
+        if not cumulative_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == module and depth == 0:
+            total = int(cumulative_us)
+        elif depth == 1:
+            top_level[name] = int(cumulative_us)
+    return total, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["app"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if a median import exceeds this")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        totals = []
+        for _ in range(args.runs):
+            total, top_level = import_times(module)
+            totals.append(total / 1000)
+        median = statistics.median(totals)
+        print(f"{module}: median {median:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+        for name, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        if args.budget_ms is not None and median > args.budget_ms:
+            over_budget.append(f"{module} {median:.0f} ms > {args.budget_ms:.0f} ms")
+
+    if over_budget:
+        print("Import budget exceeded: " + "; ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
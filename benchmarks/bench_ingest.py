@@ -0,0 +1,94 @@
+"""Benchmark dataset ingest throughput (rows/sec) for the bulk insert path.
+
+Usage:
+    python benchmarks/bench_ingest.py                  # 1k, 100k, 1M samples
+    python benchmarks/bench_ingest.py --sizes 1000 5000 --baseline
+    python benchmarks/bench_ingest.py --backend parquet --sizes 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Integer, Table, MetaData
+
+from database import create_db_engine
+from dataset import make_dataset, SQLDatasetStore
+from features import FEATURES
+
+
+def make_table(schema=FEATURES):
+    metadata = MetaData()
+    table = Table(
+        'datasets',
+        metadata,
+        Column('id', Integer, primary_key=True),
+        *schema.columns(),
+        Column('target', Integer)
+    )
+    return metadata, table
+
+
+def make_store(backend, directory, schema=FEATURES):
+    """Return (dataset store, engine or None) for a backend rooted in directory"""
+    if backend == "parquet":
+        from parquet_store import ParquetDatasetStore
+        return ParquetDatasetStore(os.path.join(directory, "dataset_store"), schema=schema), None
+    engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    metadata, table = make_table(schema)
+    metadata.create_all(engine)
+    return SQLDatasetStore(engine, table, fingerprints=None), engine
+
+
+def per_row_insert(engine, table, X, y):
+    """The historical one-statement-per-row path, kept for comparison"""
+    with engine.begin() as connection:
+        connection.execute(table.delete())
+        for i in range(len(X)):
+            connection.execute(table.insert().values(
+                **{name: float(X[i][j]) for j, name in enumerate(FEATURES.names)},
+                target=int(y[i])
+            ))
+
+
+def run(sizes, baseline=False, backend="sql"):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store, engine = make_store(backend, tmp)
+
+        for n in sizes:
+            X, y = make_dataset(n)
+
+            start = time.perf_counter()
+            store.insert(X, y, replace=True)
+            elapsed = time.perf_counter() - start
+            results.append({"method": f"bulk-{backend}", "n_samples": n, "seconds": elapsed, "rows_per_sec": n / elapsed})
+
+            if baseline and engine is not None:
+                start = time.perf_counter()
+                per_row_insert(engine, store.table, X, y)
+                elapsed = time.perf_counter() - start
+                results.append({"method": "per_row", "n_samples": n, "seconds": elapsed, "rows_per_sec": n / elapsed})
+
+        if engine is not None:
+            engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--baseline", action="store_true", help="also time the per-row insert loop (sql only)")
+    parser.add_argument("--backend", choices=["sql", "parquet"], default="sql")
+    args = parser.parse_args()
+
+    print(f"{'method':<14}{'n_samples':>12}{'seconds':>10}{'rows/sec':>14}")
+    for r in run(args.sizes, args.baseline, args.backend):
+        print(f"{r['method']:<14}{r['n_samples']:>12}{r['seconds']:>10.3f}{r['rows_per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
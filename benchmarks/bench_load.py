@@ -0,0 +1,74 @@
+"""Benchmark the streaming dataset loader used by retraining.
+
+Reports load time, rows/sec and peak traced memory so linear scaling and the
+bounded working set can be checked at each size.
+
+Usage:
+    python benchmarks/bench_load.py --sizes 100000 1000000 10000000
+    python benchmarks/bench_load.py --backend parquet --sizes 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import make_dataset
+from bench_ingest import make_store
+
+
+def run(sizes, chunk_size, backend="sql"):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store, engine = make_store(backend, tmp)
+
+        for n in sizes:
+            X, y = make_dataset(n)
+            store.insert(X, y, replace=True)
+            del X, y
+
+            start = time.perf_counter()
+            X, y = store.load(chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            buffers = X.nbytes + y.nbytes
+            del X, y
+
+            # tracemalloc slows allocation-heavy code a lot, so memory is
+            # measured on a separate, untimed pass
+            tracemalloc.start()
+            X, y = store.load(chunk_size=chunk_size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del X, y
+
+            results.append({
+                "n_samples": n,
+                "seconds": elapsed,
+                "rows_per_sec": n / elapsed,
+                "buffer_mb": buffers / 2**20,
+                "peak_overhead_mb": (peak - buffers) / 2**20,
+            })
+
+        if engine is not None:
+            engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--backend", choices=["sql", "parquet"], default="sql")
+    args = parser.parse_args()
+
+    print(f"{'n_samples':>12}{'seconds':>10}{'rows/sec':>14}{'buffers MB':>12}{'overhead MB':>13}")
+    for r in run(args.sizes, args.chunk_size, args.backend):
+        print(f"{r['n_samples']:>12}{r['seconds']:>10.3f}{r['rows_per_sec']:>14,.0f}"
+              f"{r['buffer_mb']:>12.1f}{r['peak_overhead_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measure what instrumentation costs per request.
+
+Times Histogram.observe and Counter.inc on their own, then drives two
+minimal FastAPI apps directly over ASGI (no server, no HTTP parsing), one
+with TimedRoute and one without, so the difference is the per-request cost
+of the latency histogram: one perf_counter pair and one observe().
+
+Usage:
+    python benchmarks/bench_metrics.py --calls 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+
+from metrics import Registry, TimedRoute
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def make_app(timed):
+    app = FastAPI()
+    if timed:
+        app.router.route_class = TimedRoute
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app, calls, headers=()):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+             "headers": list(headers), "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("method", "route", "status"))
+    counter = registry.counter("rows_total", "Rows", ("mode",))
+    observe = min(per_call_ns(lambda: histogram.observe(0.002, "GET", "/ping", 200), args.calls * 4)
+                  for _ in range(args.rounds))
+    inc = min(per_call_ns(lambda: counter.inc(1, "full"), args.calls * 4) for _ in range(args.rounds))
+    call = min(per_call_ns(lambda: None, args.calls * 4) for _ in range(args.rounds))
+    print(f"Histogram.observe   {observe - call:7.0f} ns  (excluding {call:.0f} ns of lambda call)")
+    print(f"Counter.inc         {inc - call:7.0f} ns")
+
+    plain, timed = make_app(False), make_app(True)
+    loop = asyncio.new_event_loop()
+    bare = measured = float("inf")
+    # Interleave rounds so drift in machine load hits both sides alike
+    for _ in range(args.rounds):
+        bare = min(bare, loop.run_until_complete(drive(plain, args.calls)))
+        measured = min(measured, loop.run_until_complete(drive(timed, args.calls)))
+    loop.close()
+    print(f"FastAPI GET, bare   {bare / 1000:7.1f} us")
+    print(f"FastAPI GET, timed  {measured / 1000:7.1f} us  (+{measured - bare:.0f} ns per request)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Load generator for /predict with and without the micro-batcher.
+
+Each run keeps `--concurrency` clients sending single-row requests back to
+back for `--duration` seconds and reports throughput with p50/p99 latency.
+Requests go through httpx's in-process ASGI transport, so no server or
+network is needed; client and server share one event loop, which makes the
+numbers a relative comparison rather than absolute capacity.
+
+Usage:
+    python benchmarks/bench_microbatch.py --concurrency 1 16 64 --max-sizes 16 64 --max-waits 1 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+
+import app as api
+from auth import API_KEY
+from batching import MicroBatcher
+from features import FEATURES
+
+AUTH_HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+
+
+async def client_loop(client, stop_at, latencies, rng):
+    while time.perf_counter() < stop_at:
+        body = dict(zip(FEATURES.names, rng.normal(size=FEATURES.n_features).tolist()))
+        start = time.perf_counter()
+        response = await client.post("/predict", json=body, headers=AUTH_HEADERS)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def load(concurrency, duration):
+    latencies = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop_at = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, stop_at, latencies, np.random.default_rng(i)) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def run(concurrency_levels, max_sizes, max_waits, duration):
+    if api.serving_model is None:
+        api.retrain_model_internal()
+
+    configs = [("off", None)] + [
+        (f"n={size},t={wait}ms", (size, wait)) for size in max_sizes for wait in max_waits
+    ]
+    results = []
+    for label, config in configs:
+        for concurrency in concurrency_levels:
+            api.predict_batcher = MicroBatcher(api._predict_current, *config) if config else None
+            result = asyncio.run(load(concurrency, duration))
+            if api.predict_batcher is not None:
+                result["mean_batch_size"] = api.predict_batcher.stats()["mean_batch_size"]
+            results.append({"batcher": label, "concurrency": concurrency, **result})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--max-sizes", type=int, nargs="+", default=[32])
+    parser.add_argument("--max-waits", type=float, nargs="+", default=[1.0, 5.0])
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    args = parser.parse_args()
+
+    # Per-request log lines would dominate the measurement
+    api.logger.remove()
+
+    print(f"{'batcher':<16}{'clients':>8}{'requests':>10}{'rps':>10}{'p50 ms':>9}{'p99 ms':>9}{'batch':>7}")
+    for r in run(args.concurrency, args.max_sizes, args.max_waits, args.duration):
+        print(f"{r['batcher']:<16}{r['concurrency']:>8}{r['requests']:>10}{r['rps']:>10,.0f}"
+              f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r.get('mean_batch_size', 1.0):>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare loading a published model from the compact artifact and from the pickle.
+
+Publishes a LogisticRegression to a temporary model store, then times
+`load_serving_model` (memory-mapped weights and JSON header) against
+`load` (unpickling the estimator and compiling the scorer from it), both
+cold in a fresh interpreter, where unpickling has to import sklearn, and
+warm in this process.
+
+Usage:
+    python benchmarks/bench_model_load.py --repeat 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import make_dataset
+from model_store import ModelStore, make_serving_model
+from training import build_model
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+COLD_LOAD = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from model_store import ModelStore, make_serving_model
+store = ModelStore({store!r})
+if {compact}:
+    store.load_serving_model({version})
+else:
+    model, metadata = store.load({version})
+    make_serving_model(model, {version}, metadata)
+print(time.perf_counter() - start)
+"""
+
+
+def cold_load(store_root, version, compact):
+    code = COLD_LOAD.format(root=ROOT, store=store_root, version=version, compact=compact)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ModelStore(root)
+        X, y = make_dataset(10_000)
+        version = store.publish(build_model("full").fit(X, y), {"performance": 1.0}).version
+        sizes = {name: os.path.getsize(os.path.join(root, f"v{version:06d}", name))
+                 for name in ("model.pkl", "scorer.json", "weights.npy")}
+
+        def from_pickle():
+            model, metadata = store.load(version)
+            return make_serving_model(model, version, metadata)
+
+        compact = best_of(lambda: store.load_serving_model(version), args.repeat)
+        pickled = best_of(from_pickle, args.repeat)
+        compact_cold = min(cold_load(root, version, True) for _ in range(3))
+        pickled_cold = min(cold_load(root, version, False) for _ in range(3))
+
+    print("artifact sizes: " + ", ".join(f"{name} {size} B" for name, size in sizes.items()))
+    print(f"cold (new process, incl. imports)  compact {compact_cold * 1e3:7.1f} ms   pickle {pickled_cold * 1e3:7.1f} ms")
+    print(f"warm (modules loaded)              compact {compact * 1e6:7.1f} us   pickle {pickled * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
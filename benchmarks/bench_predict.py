@@ -0,0 +1,91 @@
+"""Throughput benchmark: single-row /predict versus /predict/batch (JSON and .npy).
+
+Runs in-process against the ASGI app through TestClient, so it needs no server
+or network. A model is trained first if none is loaded.
+
+Usage:
+    python benchmarks/bench_predict.py --rows 1000 --batch-sizes 100 1000 10000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app as api
+from auth import API_KEY
+from features import FEATURES
+
+AUTH_HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+
+
+def ensure_model():
+    if api.serving_model is None:
+        api.retrain_model_internal()
+
+
+def bench_single(client, X):
+    start = time.perf_counter()
+    for row in X.tolist():
+        response = client.post("/predict", json=dict(zip(FEATURES.names, row)), headers=AUTH_HEADERS)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_batch_json(client, X, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        response = client.post("/predict/batch", json={"rows": X[i:i + batch_size].tolist()}, headers=AUTH_HEADERS)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_batch_npy(client, X, batch_size):
+    headers = {**AUTH_HEADERS, "Content-Type": "application/x-npy"}
+    start = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        buffer = io.BytesIO()
+        np.save(buffer, X[i:i + batch_size])
+        response = client.post("/predict/batch/npy", content=buffer.getvalue(), headers=headers)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run(n_rows, batch_sizes, single_rows):
+    ensure_model()
+    client = TestClient(api.app)
+    rng = np.random.default_rng(0)
+
+    results = []
+    X = rng.normal(size=(single_rows, FEATURES.n_features))
+    elapsed = bench_single(client, X)
+    results.append({"endpoint": "/predict", "batch_size": 1, "rows": single_rows, "seconds": elapsed, "rows_per_sec": single_rows / elapsed})
+
+    X = rng.normal(size=(n_rows, FEATURES.n_features))
+    for batch_size in batch_sizes:
+        elapsed = bench_batch_json(client, X, batch_size)
+        results.append({"endpoint": "/predict/batch", "batch_size": batch_size, "rows": n_rows, "seconds": elapsed, "rows_per_sec": n_rows / elapsed})
+        elapsed = bench_batch_npy(client, X, batch_size)
+        results.append({"endpoint": "/predict/batch/npy", "batch_size": batch_size, "rows": n_rows, "seconds": elapsed, "rows_per_sec": n_rows / elapsed})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows sent through the batch endpoints")
+    parser.add_argument("--single-rows", type=int, default=1_000, help="rows sent through /predict one at a time")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<22}{'batch':>8}{'rows':>10}{'seconds':>10}{'rows/sec':>14}")
+    for r in run(args.rows, args.batch_sizes, args.single_rows):
+        print(f"{r['endpoint']:<22}{r['batch_size']:>8}{r['rows']:>10}{r['seconds']:>10.3f}{r['rows_per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark the schema-driven paths as the number of features grows.
+
+For each width (2, 32 and 256 features by default) a FeatureSchema is built
+and used the way the API uses the configured one:
+
+    request   validate a /predict JSON body into the schema's request model
+              and pack it into a feature row
+    score     single-row LinearScorer.predict_one on that row
+    pack      turn a batch of JSON row lists into one contiguous float64 array
+    ingest    dataset_store.insert rows/sec (SQL, plus Parquet if installed)
+    load      dataset_store.load rows/sec
+
+Usage:
+    python benchmarks/bench_schema.py
+    python benchmarks/bench_schema.py --widths 2 32 256 512 --rows 20000 --backends sql parquet
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from dataset import make_dataset
+from features import FeatureSchema
+from scoring import LinearScorer
+from bench_ingest import make_store
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def per_call_us(fn, calls=2_000, repeat=5):
+    def loop():
+        for _ in range(calls):
+            fn()
+    return best_of(loop, repeat) / calls * 1e6
+
+
+def run_width(n_features, n_rows, batch_size, backends):
+    schema = FeatureSchema.numbered(n_features)
+    X, y = make_dataset(n_rows, n_features=n_features)
+    result = {"n_features": n_features}
+
+    request_model = schema.request_model()
+    body = dict(zip(schema.names, X[0].tolist()))
+    result["request_us"] = per_call_us(lambda: schema.row(request_model.model_validate(body)))
+
+    row = schema.row(request_model.model_validate(body))
+    rng = np.random.default_rng(0)
+    scorer = LinearScorer(rng.normal(size=(1, n_features)), [0.1], [0, 1])
+    result["score_us"] = per_call_us(lambda: scorer.predict_one(row))
+
+    # What /predict/batch does with a validated JSON body
+    rows = X[:batch_size].tolist()
+    result["pack_us"] = best_of(lambda: np.asarray(rows, dtype=np.float64), 20) * 1e6
+
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store, engine = make_store(backend, tmp, schema)
+            store.insert(X[:10], y[:10], replace=True)  # warm-up: imports, table creation
+            start = time.perf_counter()
+            store.insert(X, y, replace=True)
+            result[f"{backend}_ingest_rows_s"] = n_rows / (time.perf_counter() - start)
+            start = time.perf_counter()
+            store.load()
+            result[f"{backend}_load_rows_s"] = n_rows / (time.perf_counter() - start)
+            if engine is not None:
+                engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--widths", type=int, nargs="+", default=[2, 32, 256])
+    parser.add_argument("--rows", type=int, default=20_000, help="rows ingested and loaded per width")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="rows per packed JSON batch")
+    parser.add_argument("--backends", nargs="+", choices=["sql", "parquet"], default=None)
+    args = parser.parse_args()
+    backends = args.backends or ["sql"] + (["parquet"] if importlib.util.find_spec("pyarrow") else [])
+
+    header = f"{'features':>8}{'request us':>12}{'score us':>10}{'pack us':>10}"
+    for backend in backends:
+        header += f"{backend + ' ingest/s':>18}{backend + ' load/s':>18}"
+    print(f"{args.rows} rows per store, batches of {args.batch_size} rows")
+    print(header)
+    for width in args.widths:
+        r = run_width(width, args.rows, args.batch_size, backends)
+        line = f"{r['n_features']:>8}{r['request_us']:>12.1f}{r['score_us']:>10.1f}{r['pack_us']:>10.0f}"
+        for backend in backends:
+            line += f"{r[f'{backend}_ingest_rows_s']:>18,.0f}{r[f'{backend}_load_rows_s']:>18,.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Microbenchmark: per-call latency of sklearn inference versus the compiled linear scorer.
+
+Usage:
+    python benchmarks/bench_scoring.py --batch-sizes 1 100 10000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from dataset import make_dataset
+from inference import predict_with_proba
+from scoring import build_scorer
+
+
+def time_call(fn, number):
+    """Best-of-5 mean seconds per call"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def run(batch_sizes):
+    X, y = make_dataset(1000)
+    model = LogisticRegression(random_state=42).fit(X, y)
+    scorer = build_scorer(model)
+    rng = np.random.default_rng(0)
+
+    results = []
+    for n in batch_sizes:
+        X_batch = rng.normal(size=(n, X.shape[1]))
+        number = max(10, 20_000 // n)
+        cases = {
+            "sklearn predict + predict_proba": lambda: (model.predict(X_batch), model.predict_proba(X_batch)),
+            "sklearn predict_with_proba": lambda: predict_with_proba(model, X_batch),
+            "scorer numpy": lambda: scorer.predict_with_proba(X_batch),
+        }
+        if n == 1:
+            row = X_batch[0].tolist()
+            cases["scorer pure python"] = lambda: scorer.predict_one(row)
+        for name, fn in cases.items():
+            seconds = time_call(fn, number)
+            results.append({"method": name, "batch_size": n, "us_per_call": seconds * 1e6, "rows_per_sec": n / seconds})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'method':<34}{'batch':>7}{'us/call':>12}{'rows/sec':>16}")
+    for r in run(args.batch_sizes):
+        print(f"{r['method']:<34}{r['batch_size']:>7}{r['us_per_call']:>12.2f}{r['rows_per_sec']:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
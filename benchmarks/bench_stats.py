@@ -0,0 +1,133 @@
+"""Benchmark dashboard aggregations against a large prediction history.
+
+Fills a throwaway SQLite database with N predictions spread over --days,
+builds the rollup, then times one page of hourly prediction volume:
+
+    scan     GROUP BY over the predictions table itself
+    rollup   prediction_volume() over the rollup table, as /stats/predictions does
+
+plus the cost the rollup adds to each prediction log flush.
+
+Usage:
+    python benchmarks/bench_stats.py
+    python benchmarks/bench_stats.py --rows 5000000 --days 90
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import Column, Float, Index, Integer, MetaData, Table, cast, func, select
+
+from database import create_db_engine
+from features import FEATURES
+from prediction_log import PredictionLogger, RECORD_FIELDS, prediction_volume, rebuild_rollup
+
+
+def make_tables():
+    metadata = MetaData()
+    predictions = Table(
+        'predictions',
+        metadata,
+        Column('id', Integer, primary_key=True),
+        Column('created_at', Float, nullable=False),
+        *FEATURES.columns(),
+        Column('prediction', Integer),
+        Column('probability', Float),
+        Column('model_version', Integer),
+        Index('ix_predictions_created_at', 'created_at')
+    )
+    rollup = Table(
+        'prediction_rollups',
+        metadata,
+        Column('bucket_start', Integer, primary_key=True),
+        Column('model_version', Integer, primary_key=True),
+        Column('n_predictions', Integer, nullable=False),
+        Column('n_positive', Integer, nullable=False),
+        Column('sum_probability', Float, nullable=False)
+    )
+    return metadata, predictions, rollup
+
+
+def make_records(n_rows, days, now, rng):
+    created_at = np.sort(now - rng.random(n_rows) * days * 86400)
+    probability = rng.random(n_rows)
+    version = 1 + (np.arange(n_rows) * 10 // n_rows)
+    features = rng.normal(size=(n_rows, FEATURES.n_features))
+    return [(t, *x, int(p > 0.5), p, v) for t, x, p, v in
+            zip(created_at.tolist(), features.tolist(), probability.tolist(), version.tolist())]
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--page", type=int, default=500, help="hourly buckets per page")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        metadata, predictions, rollup = make_tables()
+        metadata.create_all(engine)
+
+        records = make_records(args.rows, args.days, now, rng)
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            for i in range(0, len(records), 100_000):
+                connection.execute(predictions.insert(),
+                                   [dict(zip(RECORD_FIELDS, r)) for r in records[i:i + 100_000]])
+        print(f"Inserted {args.rows:,} predictions over {args.days} days in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        n_buckets = rebuild_rollup(engine, predictions, rollup)
+        print(f"Rollup rebuild: {time.perf_counter() - start:.2f}s -> {n_buckets:,} rows")
+
+        page_start = int(now) // 3600 * 3600 - (args.page - 1) * 3600
+        p = predictions.c
+        second = cast(func.floor(p.created_at), Integer)
+        hour = (second - second % 3600).label("hour")
+        scan_query = (select(hour, p.model_version, func.count(), func.sum(p.prediction), func.sum(p.probability))
+                      .where(p.created_at >= page_start)
+                      .group_by(hour, p.model_version))
+
+        def scan():
+            with engine.connect() as connection:
+                connection.execute(scan_query).all()
+
+        scan_s = best_of(scan, 3)
+        rollup_s = best_of(lambda: prediction_volume(engine, rollup, 3600, page_start, limit=args.page))
+        print(f"{args.page} hourly buckets, scan:   {scan_s * 1000:9.1f} ms")
+        print(f"{args.page} hourly buckets, rollup: {rollup_s * 1000:9.1f} ms  ({scan_s / rollup_s:.0f}x)")
+
+        # Flush cost with and without maintaining the rollup
+        batch = [(now, *r[1:]) for r in records[:1000]]
+        for label, table in (("without rollup", None), ("with rollup", rollup)):
+            prediction_logger = PredictionLogger(engine, predictions, batch_size=1000, flush_interval=60,
+                                                 rollup=table)
+
+            def flush():
+                prediction_logger.log_many(batch)
+                prediction_logger.flush()
+
+            print(f"Flush of 1000 records, {label}: {best_of(flush) * 1000:6.1f} ms")
+            prediction_logger.stop()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
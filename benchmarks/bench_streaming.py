@@ -0,0 +1,79 @@
+"""Compare in-memory and out-of-core training on one dataset.
+
+Ingests --rows rows into a throwaway store, then trains:
+
+    in-memory   dataset_store.load() + LogisticRegression.fit (logreg_c1)
+    streaming   fit_streaming() with --budget-mb, over --epochs passes
+
+reporting wall time, Python-heap peak (tracemalloc, which numpy allocations
+report to) and accuracy on rows held out of both.
+
+Usage:
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --rows 2000000 --features 32 --budget-mb 16 --backend parquet
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import make_dataset
+from features import FeatureSchema
+from training import build_model, fit_streaming, in_memory_bytes
+from bench_ingest import make_store
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--budget-mb", type=float, default=8.0)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--backend", choices=["sql", "parquet"], default="sql")
+    args = parser.parse_args()
+
+    schema = FeatureSchema.numbered(args.features)
+    n_test = max(1_000, args.rows // 10)
+    X, y = make_dataset(args.rows + n_test, n_features=args.features)
+    X_test, y_test = X[args.rows:], y[args.rows:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store, engine = make_store(args.backend, tmp, schema)
+        store.insert(X[:args.rows], y[:args.rows], replace=True)
+        del X, y
+        n_rows, max_id = store.watermark()
+        print(f"{n_rows:,} rows x {args.features} features ({args.backend}); "
+              f"in-memory training data ~{in_memory_bytes(n_rows, args.features) / 2**20:.0f} MB")
+
+        def in_memory():
+            X_train, y_train = store.load()
+            return build_model("full").fit(X_train, y_train)
+
+        model, seconds, peak = measure(in_memory)
+        print(f"in-memory   {seconds:7.1f} s  peak {peak:8.1f} MB  test accuracy {model.score(X_test, y_test):.4f}")
+
+        result, seconds, peak = measure(lambda: fit_streaming(
+            store, n_rows, max_id, args.features, epochs=args.epochs, memory_budget_mb=args.budget_mb))
+        print(f"streaming   {seconds:7.1f} s  peak {peak:8.1f} MB  test accuracy "
+              f"{result['model'].score(X_test, y_test):.4f}  ({args.epochs} epochs, blocks of "
+              f"{result['block_rows']:,} rows, budget {args.budget_mb:g} MB)")
+        if engine is not None:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
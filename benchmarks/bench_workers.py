@@ -0,0 +1,116 @@
+"""Load test /predict against a real uvicorn server with 1, 2, 4... workers.
+
+For each worker count the server is started as `python app.py` with
+API_WORKERS=n on a local port, a model is published to the shared model store
+beforehand, and `--clients` threads with keep-alive sessions send single-row
+requests for `--duration` seconds. The report shows throughput per worker
+count and which model version every worker said it was serving.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --clients 32 --duration 10
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import requests
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def ensure_published_model():
+    import app as api
+    if api.model_store.latest_version() is None:
+        api.retrain_model_internal()
+    from auth import API_KEY
+    return API_KEY
+
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status = requests.get(f"{base_url}/model-status", timeout=1).json()
+            if status["model_trained"]:
+                return
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def client_thread(base_url, headers, stop_at, counts, index):
+    from features import FEATURES
+
+    session = requests.Session()
+    rng = np.random.default_rng(index)
+    n = 0
+    while time.time() < stop_at:
+        body = dict(zip(FEATURES.names, rng.normal(size=FEATURES.n_features).tolist()))
+        session.post(f"{base_url}/predict", json=body, headers=headers).raise_for_status()
+        n += 1
+    counts[index] = n
+
+
+def run_one(workers, clients, duration, api_key):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "API_WORKERS": str(workers), "FASTAPI_HOST": "127.0.0.1", "FASTAPI_PORT": str(port)}
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(base_url)
+        headers = {"Authorization": f"Bearer {api_key}"}
+
+        counts = [0] * clients
+        stop_at = time.time() + duration
+        threads = [threading.Thread(target=client_thread, args=(base_url, headers, stop_at, counts, i))
+                   for i in range(clients)]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+
+        # Ask enough times to reach every worker at least once
+        serving = {}
+        for _ in range(workers * 20):
+            worker = requests.get(f"{base_url}/model-status").json()["worker"]
+            serving[worker["pid"]] = worker["model_version"]
+        return {"workers": workers, "requests": sum(counts), "rps": sum(counts) / elapsed, "serving": serving}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    api_key = ensure_published_model()
+    baseline = None
+    print(f"{'workers':>8}{'requests':>10}{'rps':>10}{'speedup':>9}  versions by pid")
+    for workers in args.workers:
+        r = run_one(workers, args.clients, args.duration, api_key)
+        baseline = baseline or r["rps"]
+        print(f"{r['workers']:>8}{r['requests']:>10}{r['rps']:>10,.0f}{r['rps'] / baseline:>9.2f}  {r['serving']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Run the end-to-end benchmark suite and write the results as JSON.
+
+Everything runs locally against a throwaway workspace (SQLite database,
+model store, MLflow directory), so no network or existing state is needed:
+
+    import      cold `import app` time (python -X importtime, median of runs)
+    startup     seconds from launching `python app.py` until /health answers
+    predict     /predict latency percentiles and requests/sec against that
+                server, one client sequentially and then --clients in parallel
+                over keep-alive sessions
+    scaling     dataset generation (what /generate runs) and a full retrain
+                per dataset size, with the retrain's phase timings
+    webhook     the notification dispatcher posting to a local stub that
+                stands in for Discord and rate-limits every few requests
+
+Results go to --output as JSON with the commit and machine they came from.
+Pass --compare with an earlier results file to print the change of every
+metric; with --max-regression the run fails when one got worse by more than
+that fraction.
+
+Usage:
+    python benchmarks/run_all.py --output bench.json
+    python benchmarks/run_all.py --quick --output new.json --compare bench.json --max-regression 0.25
+    python benchmarks/run_all.py --only predict webhook
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SECTIONS = ["import", "startup", "predict", "scaling", "webhook"]
+API_KEY = "bench-key"
+
+# Metric name suffixes where a larger value is an improvement
+HIGHER_IS_BETTER = ("rps", "rows_per_sec", "speedup")
+
+
+def isolate(workdir):
+    """Point every piece of state the API writes at workdir; must run before importing app"""
+    os.environ.update({
+        "API_KEY": API_KEY,
+        # Load tests measure the server, not the per-key rate limit
+        "RATE_LIMIT_PER_SECOND": "0",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "MODEL_STORE_DIR": os.path.join(workdir, "model_store"),
+        "DATASET_DIR": os.path.join(workdir, "dataset_store"),
+        "JOB_STATE_DIR": os.path.join(workdir, "job_state"),
+        "MLFLOW_TRACKING_URI": "file://" + os.path.join(workdir, "mlruns"),
+    })
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": ordered[-1] * 1e3}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_import(args):
+    from bench_import import import_times
+    totals = [import_times("app")[0] / 1000 for _ in range(args.import_runs)]
+    return {"app": {"median_ms": statistics.median(totals), "min_ms": min(totals), "runs": len(totals)}}
+
+
+class Server:
+    """`python app.py` on a free local port, started and stopped around a block"""
+
+    def __init__(self):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.startup_seconds = None
+
+    def __enter__(self):
+        import http_client
+        env = {**os.environ, "FASTAPI_HOST": "127.0.0.1", "FASTAPI_PORT": str(self.port), "API_WORKERS": "1"}
+        start = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        session = http_client.build_session(retry=http_client.build_retry(total=0))
+        deadline = start + 120
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API server exited with code {self.process.returncode}")
+            try:
+                if session.get(f"{self.base_url}/health", timeout=1).ok:
+                    self.startup_seconds = time.perf_counter() - start
+                    return self
+            except Exception:
+                time.sleep(0.05)
+        raise RuntimeError("API server did not start within 120 s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+def ensure_model():
+    import app as api
+    api.init_db()
+    if api.model_store.latest_version() is None:
+        api.generate_and_store(1_000)
+        api.retrain_model_internal(full_refit=True)
+
+
+def predict_client(base_url, stop_at, n_requests, seed, latencies):
+    import numpy as np
+    import http_client
+    from features import FEATURES
+
+    session = http_client.build_session(pool_size=1)
+    headers = {"Authorization": f"Bearer {API_KEY}"}
+    rows = np.random.default_rng(seed).normal(size=(1024, FEATURES.n_features)).tolist()
+    bodies = [dict(zip(FEATURES.names, row)) for row in rows]
+    i = 0
+    while i < n_requests and time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        session.post(f"{base_url}/predict", json=bodies[i % len(bodies)], headers=headers).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+
+def load_test(base_url, clients, duration, n_requests):
+    """Run clients threads until duration passes or each sent n_requests"""
+    per_client = [[] for _ in range(clients)]
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=predict_client, args=(base_url, stop_at, n_requests, i, per_client[i]))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = [latency for client in per_client for latency in client]
+    return {"clients": clients, "requests": len(latencies), "seconds": elapsed,
+            "rps": len(latencies) / elapsed, **percentiles(latencies)}
+
+
+def bench_startup_and_predict(args, sections):
+    ensure_model()
+    results = {}
+    with Server() as server:
+        if "startup" in sections:
+            results["startup"] = {"seconds_to_ready": server.startup_seconds}
+        if "predict" in sections:
+            # Warm up connections, the scorer and the prediction logger
+            load_test(server.base_url, 1, 5, 200)
+            results["predict"] = {
+                "single": load_test(server.base_url, 1, args.duration, args.single_requests),
+                "concurrent": load_test(server.base_url, args.clients, args.duration, sys.maxsize),
+            }
+    return results
+
+
+def bench_scaling(args):
+    import numpy as np
+    import app as api
+    from features import FEATURES
+
+    api.init_db()
+    # Pay the lazy imports and MLflow's first-run setup outside the timed runs
+    api.generate_and_store(100)
+    api.retrain_model_internal(full_refit=True)
+    results = {}
+    for n in args.sizes:
+        # Start from an empty dataset: identical regenerated rows are not rewritten
+        api.dataset_store.insert(np.empty((0, FEATURES.n_features)), np.empty(0), replace=True)
+        start = time.perf_counter()
+        api.generate_and_store(n)
+        generate = time.perf_counter() - start
+        start = time.perf_counter()
+        retrain = api.retrain_model_internal(full_refit=True)
+        retrain_seconds = time.perf_counter() - start
+        results[str(n)] = {
+            "generate_seconds": generate,
+            "generate_rows_per_sec": n / generate,
+            "retrain_seconds": retrain_seconds,
+            "retrain_rows_per_sec": n / retrain_seconds,
+            "phases_seconds": retrain.get("timings", {}),
+        }
+    return results
+
+
+def bench_webhook(args):
+    from notifications import NotificationDispatcher
+    from webhook_stub import WebhookStub
+
+    with WebhookStub(rate_limit_every=5, retry_after=0.01) as stub:
+        dispatcher = NotificationDispatcher(stub.url, min_interval=args.webhook_interval, linger=0.01)
+        enqueue = []
+        start = time.perf_counter()
+        for i in range(args.notifications):
+            t = time.perf_counter()
+            dispatcher.notify(f"Benchmark notification {i}", "Benchmark", 0x69db7c)
+            enqueue.append(time.perf_counter() - t)
+        deadline = time.monotonic() + 60
+        while dispatcher.stats()["sent"] + dispatcher.stats()["failed"] < args.notifications and time.monotonic() < deadline:
+            time.sleep(0.005)
+        delivered_after = time.perf_counter() - start
+        dispatcher.stop()
+        stats = dispatcher.stats()
+        enqueue_us = sorted(t * 1e6 for t in enqueue)
+        return {
+            "notifications": args.notifications,
+            "delivered": len(stub.embeds()),
+            "delivery_seconds": delivered_after,
+            "enqueue_p50_us": enqueue_us[len(enqueue_us) // 2],
+            "enqueue_p99_us": enqueue_us[min(len(enqueue_us) - 1, int(0.99 * len(enqueue_us)))],
+            "posts": stats["posts"],
+            "rate_limited": stats["rate_limited"],
+            "failed": stats["failed"],
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(tree, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only"""
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new, max_regression=None):
+    """Print every metric present in both runs; return the names that regressed beyond max_regression"""
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    regressions = []
+    print(f"\nvs {old['meta'].get('commit') or 'baseline'}:")
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[name], new_flat[name]
+        if not before:
+            continue
+        change = (after - before) / abs(before)
+        # Only timings and rates say better or worse; counts are informational
+        leaf = name.rsplit(".", 1)[-1]
+        if leaf.endswith(HIGHER_IS_BETTER):
+            worse = -change
+        elif leaf.endswith(("_ms", "_us", "seconds")):
+            worse = change
+        else:
+            worse = None
+        flag = ""
+        if worse is not None and max_regression is not None and worse > max_regression:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<52}{before:>14.4g} -> {after:<14.4g}{change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--quick", action="store_true", help="small sizes and short load tests, for CI")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="dataset sizes for the scaling runs")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=None, help="seconds per load test")
+    parser.add_argument("--single-requests", type=int, default=None)
+    parser.add_argument("--import-runs", type=int, default=None)
+    parser.add_argument("--notifications", type=int, default=200)
+    parser.add_argument("--webhook-interval", type=float, default=0.01, help="dispatcher min seconds between posts")
+    parser.add_argument("--workdir", default=None, help="keep state here instead of a temporary directory")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to diff against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="fail if a timing or rate got worse by more than this fraction")
+    args = parser.parse_args()
+    args.sizes = args.sizes or ([1_000, 10_000] if args.quick else [1_000, 10_000, 100_000, 1_000_000])
+    args.duration = args.duration or (3.0 if args.quick else 10.0)
+    args.single_requests = args.single_requests or (500 if args.quick else 2_000)
+    args.import_runs = args.import_runs or (3 if args.quick else 5)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    isolate(workdir)
+    results = {}
+    try:
+        if "import" in args.only:
+            results["import"] = bench_import(args)
+        if "startup" in args.only or "predict" in args.only:
+            results.update(bench_startup_and_predict(args, args.only))
+        if "scaling" in args.only:
+            results["scaling"] = bench_scaling(args)
+        if "webhook" in args.only:
+            results["webhook"] = bench_webhook(args)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Keep test state out of the working tree.
+
+The API reads its storage locations from the environment at import time, so
+they are pointed at a scratch directory before any test module imports app.
+"""
+import os
+import shutil
+import tempfile
+
+_state_dir = None
+
+
+def pytest_configure(config):
+    global _state_dir
+    _state_dir = tempfile.mkdtemp(prefix="continual-ml-tests-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(_state_dir, 'ml_data.db')}",
+        "MLFLOW_TRACKING_URI": "file://" + os.path.join(_state_dir, "mlruns"),
+        "MODEL_STORE_DIR": os.path.join(_state_dir, "model_store"),
+        "JOB_STATE_DIR": os.path.join(_state_dir, "job_state"),
+        "DATASET_DIR": os.path.join(_state_dir, "dataset_store"),
+    })
+
+
+def pytest_unconfigure(config):
+    if _state_dir is not None:
+        shutil.rmtree(_state_dir, ignore_errors=True)
@@ -0,0 +1,50 @@
+"""Engine construction from DATABASE_URL with pool sizing and SQLite WAL"""
+import os
+
+from sqlalchemy import create_engine, event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ml_data.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds after which pooled connections are replaced (-1 keeps them)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# WAL lets readers (training, /dataset/fingerprint) run while the
+# prediction logger or an ingest is writing
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # NORMAL is durable across application crashes in WAL mode
+            cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url=DATABASE_URL):
+    """Create an engine for url; file-backed SQLite gets WAL and a busy timeout"""
+    url = str(url)
+    options = {"pool_recycle": DB_POOL_RECYCLE}
+    if url.startswith("sqlite"):
+        in_memory = url in ("sqlite://", "sqlite:///:memory:")
+        # Connections move between the request threadpool and background writers
+        options["connect_args"] = {"check_same_thread": False}
+        if not in_memory:
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        engine = create_engine(url, **options)
+        if not in_memory:
+            event.listen(engine, "connect", _configure_sqlite)
+        return engine
+
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    return create_engine(url, **options)
@@ -0,0 +1,331 @@
+"""Shared dataset ingest and load layer used by /generate and retraining"""
+import os
+from contextlib import contextmanager
+from time import perf_counter
+
+import numpy as np
+from sqlalchemy import bindparam, select, func
+from dotenv import load_dotenv
+from loguru import logger
+
+from features import FEATURES
+from metrics import DB_QUERY_SECONDS
+
+load_dotenv()
+
+DEFAULT_N_SAMPLES = int(os.getenv("N_SAMPLES", "1000"))
+INSERT_CHUNK_SIZE = int(os.getenv("INSERT_CHUNK_SIZE", "50000"))
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "100000"))
+
+FEATURE_DTYPE = np.float32
+TARGET_DTYPE = np.int8
+
+# Pragmas applied to the loading connection only. They trade durability of the
+# in-flight load for speed; the previous values are restored afterwards so the
+# pooled connection goes back to normal behaviour.
+SQLITE_BULK_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-65536",  # 64 MiB page cache
+}
+
+
+def make_dataset(n_samples=DEFAULT_N_SAMPLES, random_state=42, n_features=None):
+    """Generate a linearly separable dataset with one column per schema feature"""
+    # sklearn.datasets is slow to import and only generation needs it
+    from sklearn.datasets import make_classification
+    n_features = FEATURES.n_features if n_features is None else n_features
+    # Half the features carry signal (all of them for the 2-feature default)
+    n_informative = min(n_features, max(2, n_features // 2))
+    X, y = make_classification(n_samples=n_samples, n_features=n_features, n_redundant=0,
+                               n_informative=n_informative, n_clusters_per_class=1, random_state=random_state)
+    return X, y
+
+
+def feature_columns(table):
+    """The table's feature columns in order: everything but the id and the target"""
+    return [column for column in table.c if column.name not in ("id", "target")]
+
+
+@contextmanager
+def sqlite_bulk_load(connection):
+    """Apply bulk-load pragmas to a SQLite connection for the duration of a load"""
+    if connection.dialect.name != "sqlite":
+        yield connection
+        return
+
+    previous = {}
+    for pragma, value in SQLITE_BULK_PRAGMAS.items():
+        previous[pragma] = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+        connection.exec_driver_sql(f"PRAGMA {pragma}={value}")
+    connection.commit()
+    try:
+        yield connection
+    finally:
+        connection.rollback()
+        for pragma, value in previous.items():
+            connection.exec_driver_sql(f"PRAGMA {pragma}={value}")
+        connection.commit()
+
+
+def _insert_statement(dialect, table, keys):
+    """Compile an INSERT for keys; returns (sql, positional) for the DBAPI cursor"""
+    compiled = table.insert().values({key: bindparam(key) for key in keys}).compile(dialect=dialect)
+    positional = dialect.positional and list(compiled.positiontup) == list(keys)
+    return str(compiled), positional
+
+
+def _row_chunks(X, y, keys, positional, chunk_size):
+    """Yield lists of insert parameters (tuples in keys order, or dicts), chunk_size rows at a time"""
+    for start in range(0, len(X), chunk_size):
+        stop = start + chunk_size
+        # One tolist() per chunk converts every row at once, whatever the width
+        rows = [(*row, t) for row, t in zip(X[start:stop].tolist(), y[start:stop].tolist())]
+        yield rows if positional else [dict(zip(keys, row)) for row in rows]
+
+
+def _mix64(h):
+    """splitmix64 finaliser over a uint64 array (wrapping arithmetic)"""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def rows_digest(X, y):
+    """64-bit content digest of (features, target) rows.
+
+    It is the wrapping sum of per-row hashes, so it does not depend on row
+    order or on how rows were split into batches: the digest after an append
+    is the old digest plus the digest of the appended rows.
+    """
+    bits = np.ascontiguousarray(X, dtype=np.float64).view(np.uint64)
+    h = _mix64(np.asarray(y, dtype=np.int64).astype(np.uint64))
+    for j in range(bits.shape[1]):
+        h = _mix64(h ^ bits[:, j])
+    return int(h.sum(dtype=np.uint64))
+
+
+def _combine_digests(a, b):
+    return (a + b) & 0xFFFFFFFFFFFFFFFF
+
+
+def format_digest(digest):
+    return f"{digest:016x}"
+
+
+def _max_id(connection, table):
+    return connection.execute(select(func.max(table.c.id))).scalar() or 0
+
+
+def _read_fingerprint(connection, fingerprints, table):
+    query = select(fingerprints.c.n_rows, fingerprints.c.max_id, fingerprints.c.digest)
+    return connection.execute(query.where(fingerprints.c.table_name == table.name)).first()
+
+
+def _write_fingerprint(connection, fingerprints, table, n_rows, max_id, digest):
+    connection.execute(fingerprints.delete().where(fingerprints.c.table_name == table.name))
+    if n_rows is not None:
+        connection.execute(fingerprints.insert(), {
+            "table_name": table.name, "n_rows": n_rows, "max_id": max_id, "digest": format_digest(digest)
+        })
+
+
+def bulk_insert_dataset(engine, table, X, y, replace=True, chunk_size=INSERT_CHUNK_SIZE, fingerprints=None):
+    """Write a dataset to the table with chunked executemany inside one transaction
+
+    If a fingerprints table is given, the table's fingerprint is updated in
+    the same transaction from the inserted rows alone.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=int)
+    if len(X) != len(y):
+        raise ValueError(f"X and y length mismatch: {len(X)} != {len(y)}")
+    names = [column.name for column in feature_columns(table)]
+    if X.ndim != 2 or X.shape[1] != len(names):
+        raise ValueError(f"Expected {len(names)} feature columns for '{table.name}', got an array of shape {X.shape}")
+
+    with engine.connect() as connection, sqlite_bulk_load(connection):
+        previous = None
+        if fingerprints is not None and not replace:
+            previous = _read_fingerprint(connection, fingerprints, table)
+            # Rows written without going through here leave a stale record
+            if previous is not None and previous.max_id != _max_id(connection, table):
+                previous = None
+        if replace:
+            connection.execute(table.delete())
+        # Plain tuples through the DBAPI cursor: per-row parameter dicts and
+        # SQLAlchemy's executemany bookkeeping cost more than SQLite itself
+        # once there are more than a handful of features
+        keys = [*names, "target"]
+        sql, positional = _insert_statement(connection.dialect, table, keys)
+        if not connection.in_transaction():
+            # Make sure commit() below reaches the driver
+            connection.begin()
+        cursor = connection.connection.cursor()
+        try:
+            for rows in _row_chunks(X, y, keys, positional, chunk_size):
+                # Raw cursors bypass instrument_engine's hooks, so time them here
+                start = perf_counter()
+                cursor.executemany(sql, rows)
+                DB_QUERY_SECONDS.observe(perf_counter() - start, "INSERT")
+        finally:
+            cursor.close()
+        if fingerprints is not None:
+            n_rows = digest = None
+            if replace:
+                n_rows, digest = len(X), rows_digest(X, y)
+            elif previous is not None:
+                n_rows = previous.n_rows + len(X)
+                digest = _combine_digests(int(previous.digest, 16), rows_digest(X, y))
+            # Without a trustworthy previous record, drop it and let
+            # dataset_fingerprint() rebuild it on the next read
+            _write_fingerprint(connection, fingerprints, table, n_rows, _max_id(connection, table), digest)
+        connection.commit()
+
+    logger.info(f"Bulk inserted {len(X)} rows into '{table.name}'")
+    return len(X)
+
+
+def _id_range(query, table, min_id=None, max_id=None):
+    """Restrict a query to min_id < id <= max_id"""
+    if min_id is not None:
+        query = query.where(table.c.id > min_id)
+    if max_id is not None:
+        query = query.where(table.c.id <= max_id)
+    return query
+
+
+def dataset_watermark(engine, table, min_id=None, max_id=None):
+    """Return (row_count, max_id) for the rows in min_id < id <= max_id"""
+    query = _id_range(select(func.count(), func.max(table.c.id)).select_from(table), table, min_id, max_id)
+    with engine.connect() as connection:
+        n_rows, last_id = connection.execute(query).one()
+    return n_rows, last_id or 0
+
+
+def dataset_id_bounds(engine, table, step, max_id=None):
+    """Ids of the step-th, 2*step-th, ... row up to max_id, in order.
+
+    Keyset pagination over the primary key, one indexed query per boundary,
+    so gaps left by deleted or replaced rows never stretch a range.
+    """
+    bounds = []
+    query = select(table.c.id).order_by(table.c.id).offset(step - 1).limit(1)
+    with engine.connect() as connection:
+        while True:
+            bound = connection.execute(_id_range(query, table, bounds[-1] if bounds else None, max_id)).scalar()
+            if bound is None:
+                return bounds
+            bounds.append(bound)
+
+
+def _iter_blocks(engine, table, chunk_size=LOAD_CHUNK_SIZE, min_id=None, max_id=None):
+    """Stream float64 blocks of (features..., target) from the table in id order"""
+    columns = [*feature_columns(table), table.c.target]
+    query = _id_range(select(*columns).order_by(table.c.id), table, min_id, max_id)
+
+    with engine.connect() as connection:
+        # Go through the DBAPI cursor directly: building SQLAlchemy Row objects
+        # costs more than the whole fetch, and fetchmany keeps memory bounded.
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        cursor = connection.connection.cursor()
+        # Database time only (execute and fetches), not the caller's work
+        # between chunks; observed once per query like instrument_engine does
+        start = perf_counter()
+        elapsed = 0.0
+        try:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                elapsed += perf_counter() - start
+                if not rows:
+                    break
+                yield np.array(rows, dtype=np.float64)
+                start = perf_counter()
+        finally:
+            cursor.close()
+            DB_QUERY_SECONDS.observe(elapsed, "SELECT")
+
+
+def iter_dataset_chunks(engine, table, chunk_size=LOAD_CHUNK_SIZE, min_id=None, max_id=None):
+    """Stream (X, y) chunks from the table in id order without materialising Row objects"""
+    for block in _iter_blocks(engine, table, chunk_size, min_id=min_id, max_id=max_id):
+        yield block[:, :-1].astype(FEATURE_DTYPE), block[:, -1].astype(TARGET_DTYPE)
+
+
+def dataset_fingerprint(engine, table, fingerprints):
+    """Return {n_rows, max_id, digest} identifying the table's current contents
+
+    Normally an O(1) read of the record bulk_insert_dataset() maintains. If
+    the record is missing or stale it is rebuilt with one scan and stored.
+    """
+    with engine.connect() as connection:
+        stored = _read_fingerprint(connection, fingerprints, table)
+        max_id = _max_id(connection, table)
+    if stored is not None and stored.max_id == max_id:
+        return {"n_rows": stored.n_rows, "max_id": stored.max_id, "digest": stored.digest}
+
+    n_rows = digest = 0
+    for block in _iter_blocks(engine, table, max_id=max_id):
+        n_rows += len(block)
+        digest = _combine_digests(digest, rows_digest(block[:, :-1], block[:, -1].astype(np.int64)))
+    with engine.begin() as connection:
+        _write_fingerprint(connection, fingerprints, table, n_rows, max_id, digest)
+    logger.info(f"Rebuilt fingerprint of '{table.name}' from {n_rows} rows")
+    return {"n_rows": n_rows, "max_id": max_id, "digest": format_digest(digest)}
+
+
+def load_dataset(engine, table, chunk_size=LOAD_CHUNK_SIZE, min_id=None, max_id=None):
+    """Load rows in min_id < id <= max_id into preallocated float32/int8 arrays, one chunk at a time"""
+    n_rows, max_id = dataset_watermark(engine, table, min_id, max_id)
+
+    X = np.empty((n_rows, len(feature_columns(table))), dtype=FEATURE_DTYPE)
+    y = np.empty(n_rows, dtype=TARGET_DTYPE)
+    if n_rows == 0:
+        return X, y
+
+    # Rows are bounded by the max id seen above so concurrent appends cannot
+    # overflow the buffers; a concurrent delete just leaves us with fewer rows.
+    filled = 0
+    for X_chunk, y_chunk in iter_dataset_chunks(engine, table, chunk_size, min_id=min_id, max_id=max_id):
+        stop = min(filled + len(X_chunk), n_rows)
+        X[filled:stop] = X_chunk[:stop - filled]
+        y[filled:stop] = y_chunk[:stop - filled]
+        filled = stop
+
+    if filled < n_rows:
+        X, y = X[:filled], y[:filled]
+    return X, y
+
+
+class SQLDatasetStore:
+    """Dataset rows in a SQL table, with the fingerprint kept in a side table.
+
+    Same interface as parquet_store.ParquetDatasetStore, so the API and
+    retraining do not care which backend holds the data.
+    """
+
+    def __init__(self, engine, table, fingerprints):
+        self.engine = engine
+        self.table = table
+        self.fingerprints = fingerprints
+
+    def insert(self, X, y, replace=False):
+        return bulk_insert_dataset(self.engine, self.table, X, y, replace=replace, fingerprints=self.fingerprints)
+
+    def watermark(self, min_id=None, max_id=None):
+        return dataset_watermark(self.engine, self.table, min_id, max_id)
+
+    def fingerprint(self):
+        return dataset_fingerprint(self.engine, self.table, self.fingerprints)
+
+    def id_bounds(self, step, max_id=None):
+        return dataset_id_bounds(self.engine, self.table, step, max_id)
+
+    def iter_chunks(self, chunk_size=LOAD_CHUNK_SIZE, min_id=None, max_id=None):
+        return iter_dataset_chunks(self.engine, self.table, chunk_size, min_id=min_id, max_id=max_id)
+
+    def load(self, min_id=None, max_id=None, chunk_size=LOAD_CHUNK_SIZE):
+        return load_dataset(self.engine, self.table, chunk_size, min_id=min_id, max_id=max_id)
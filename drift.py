@@ -0,0 +1,193 @@
+"""Streaming drift monitoring over live traffic.
+
+All state is fixed-size: per-feature histograms over a sliding window of the
+last DRIFT_WINDOW requests, plus a sliding window of labeled outcomes for
+accuracy and calibration. Observing a sample is O(1) and evaluating is
+O(bins), so nothing ever rescans the predictions or datasets tables.
+
+The windows live in one API worker's memory: with API_WORKERS > 1 each
+worker sees only the traffic routed to it, and /drift reports the worker
+that answers.
+"""
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DRIFT_WINDOW = int(os.getenv("DRIFT_WINDOW", "1000"))
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+DRIFT_MIN_LABELED = int(os.getenv("DRIFT_MIN_LABELED", "100"))
+PSI_THRESHOLD = float(os.getenv("PSI_THRESHOLD", "0.2"))
+KS_THRESHOLD = float(os.getenv("KS_THRESHOLD", "0.15"))
+CALIBRATION_BINS = 10
+# Keeps log() finite for bins that are empty on one side
+PSI_EPSILON = 1e-4
+
+
+def reference_profile(X, bins=DRIFT_BINS):
+    """Summarise training features as quantile bin edges and reference proportions.
+
+    The result is plain lists so it can be stored in model metadata.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    features = []
+    for j in range(X.shape[1]):
+        # Inner edges only: values below the first edge fall in bin 0 and
+        # values above the last edge in the final bin
+        edges = np.unique(np.quantile(X[:, j], np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, X[:, j], side="right"), minlength=len(edges) + 1)
+        features.append({"edges": edges.tolist(), "proportions": (counts / counts.sum()).tolist()})
+    return {"features": features, "n_samples": int(len(X))}
+
+
+class SlidingWindow:
+    """Fixed-capacity ring of small integer codes with per-code counts"""
+
+    def __init__(self, size, n_codes):
+        self.size = size
+        self.codes = np.full(size, -1, dtype=np.int32)
+        self.counts = np.zeros(n_codes, dtype=np.int64)
+        self.position = 0
+        self.filled = 0
+
+    def push(self, code):
+        old = self.codes[self.position]
+        if old >= 0:
+            self.counts[old] -= 1
+        self.codes[self.position] = code
+        self.counts[code] += 1
+        self.position = (self.position + 1) % self.size
+        self.filled = min(self.filled + 1, self.size)
+
+    def push_many(self, codes):
+        codes = np.asarray(codes, dtype=np.int32)[-self.size:]
+        slots = (self.position + np.arange(len(codes))) % self.size
+        old = self.codes[slots]
+        np.subtract.at(self.counts, old[old >= 0], 1)
+        self.codes[slots] = codes
+        np.add.at(self.counts, codes, 1)
+        self.position = (self.position + len(codes)) % self.size
+        self.filled = min(self.filled + len(codes), self.size)
+
+
+def psi(expected, actual):
+    """Population stability index between two proportion vectors"""
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks(expected, actual):
+    """Kolmogorov-Smirnov statistic evaluated at the shared bin edges"""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+class DriftMonitor:
+    """Rolling feature-drift, accuracy and calibration metrics for one model version.
+
+    Thread-safe: request threads observe while the model watcher may reset,
+    so every method holds one lock for its (short, O(batch)) duration.
+    """
+
+    def __init__(self, profile=None, model_version=None, window=DRIFT_WINDOW):
+        self._lock = threading.Lock()
+        self.window = window
+        self.model_version = model_version
+        self.reset(profile, model_version)
+
+    def reset(self, profile, model_version):
+        """Start over against a new reference profile (e.g. after a model swap)"""
+        with self._lock:
+            self._reset(profile, model_version)
+
+    def _reset(self, profile, model_version):
+        self.model_version = model_version
+        self.profile = profile
+        self.edges = []
+        self.reference = []
+        self.features = []
+        if profile is not None:
+            for feature in profile["features"]:
+                self.edges.append(np.asarray(feature["edges"], dtype=np.float64))
+                self.reference.append(np.asarray(feature["proportions"], dtype=np.float64))
+                self.features.append(SlidingWindow(self.window, len(feature["proportions"])))
+        # Labeled outcomes: code = calibration_bin * 2 + correct
+        self.outcomes = SlidingWindow(self.window, CALIBRATION_BINS * 2)
+        self.confidence_sum = np.zeros(CALIBRATION_BINS, dtype=np.float64)
+        self.confidence_ring = np.zeros(self.window, dtype=np.float64)
+
+    def observe(self, row):
+        """Record one served feature row"""
+        with self._lock:
+            for j, window in enumerate(self.features):
+                window.push(int(np.searchsorted(self.edges[j], row[j], side="right")))
+
+    def observe_many(self, X):
+        """Record a batch of served feature rows"""
+        X = np.asarray(X, dtype=np.float64)
+        with self._lock:
+            for j, window in enumerate(self.features):
+                window.push_many(np.searchsorted(self.edges[j], X[:, j], side="right"))
+
+    def observe_labeled(self, confidences, correct):
+        """Record labeled outcomes: the model's max probability and whether it was right"""
+        confidences = np.asarray(confidences, dtype=np.float64)[-self.window:]
+        correct = np.asarray(correct, dtype=bool)[-self.window:]
+        calibration_bin = np.minimum((confidences * CALIBRATION_BINS).astype(np.int32), CALIBRATION_BINS - 1)
+        with self._lock:
+            # Keep per-bin confidence sums in step with the ring of outcome codes
+            slots = (self.outcomes.position + np.arange(len(confidences))) % self.window
+            old_codes = self.outcomes.codes[slots]
+            valid = old_codes >= 0
+            np.subtract.at(self.confidence_sum, old_codes[valid] // 2, self.confidence_ring[slots][valid])
+            self.confidence_ring[slots] = confidences
+            np.add.at(self.confidence_sum, calibration_bin, confidences)
+            self.outcomes.push_many(calibration_bin * 2 + correct.astype(np.int32))
+
+    def evaluate(self, performance_threshold):
+        """Return current drift metrics and whether they amount to a retraining signal"""
+        with self._lock:
+            return self._evaluate(performance_threshold)
+
+    def _evaluate(self, performance_threshold):
+        reasons = []
+        features = []
+        n_observed = self.features[0].filled if self.features else 0
+        for j, window in enumerate(self.features):
+            metrics = {"psi": None, "ks": None}
+            if window.filled >= DRIFT_MIN_SAMPLES:
+                actual = window.counts / window.filled
+                metrics = {"psi": psi(self.reference[j], actual), "ks": binned_ks(self.reference[j], actual)}
+                if metrics["psi"] > PSI_THRESHOLD:
+                    reasons.append(f"feature {j + 1} PSI {metrics['psi']:.3f} > {PSI_THRESHOLD}")
+                elif metrics["ks"] > KS_THRESHOLD:
+                    reasons.append(f"feature {j + 1} KS {metrics['ks']:.3f} > {KS_THRESHOLD}")
+            features.append(metrics)
+
+        n_labeled = self.outcomes.filled
+        accuracy = ece = None
+        if n_labeled:
+            per_bin = self.outcomes.counts.reshape(CALIBRATION_BINS, 2)
+            bin_totals = per_bin.sum(axis=1)
+            accuracy = float(per_bin[:, 1].sum() / n_labeled)
+            occupied = bin_totals > 0
+            gap = np.abs(per_bin[occupied, 1] - self.confidence_sum[occupied])
+            ece = float(gap.sum() / n_labeled)
+            if n_labeled >= DRIFT_MIN_LABELED and accuracy < performance_threshold:
+                reasons.append(f"windowed accuracy {accuracy:.3f} < {performance_threshold}")
+
+        return {
+            "model_version": self.model_version,
+            "window": self.window,
+            "observed": n_observed,
+            "features": features,
+            "labeled": n_labeled,
+            "accuracy": accuracy,
+            "calibration_error": ece,
+            "drift_detected": bool(reasons),
+            "reasons": reasons,
+        }
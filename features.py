@@ -0,0 +1,69 @@
+"""Feature schema: the one definition of the model's input features.
+
+Table layouts (datasets, predictions, Parquet partitions), request
+validation and array packing are all derived from FEATURES, so moving from
+2 to N features is a configuration change rather than a code change.
+Changing the schema changes the stored layout: point DATABASE_URL and
+DATASET_DIR at fresh locations when you do.
+"""
+import keyword
+import os
+from operator import attrgetter
+
+from dotenv import load_dotenv
+from pydantic import create_model
+from sqlalchemy import Column, Float
+
+load_dotenv()
+
+N_FEATURES = int(os.getenv("N_FEATURES", "2"))
+# Optional explicit comma-separated names; overrides N_FEATURES
+FEATURE_NAMES = os.getenv("FEATURE_NAMES", "")
+
+# Column names the tables already use for something else
+RESERVED_NAMES = {"id", "target", "created_at", "prediction", "probability", "model_version"}
+
+
+class FeatureSchema:
+    """Ordered float features and everything derived from them"""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        if not self.names:
+            raise ValueError("A feature schema needs at least one feature")
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Duplicate feature names in {self.names}")
+        for name in self.names:
+            if not name.isidentifier() or keyword.iskeyword(name) or name in RESERVED_NAMES:
+                raise ValueError(f"Invalid feature name {name!r}")
+        self.n_features = len(self.names)
+        # One C-level call pulls every feature out of a request object; with
+        # a single feature attrgetter returns a bare value
+        self._getter = attrgetter(*self.names)
+
+    @classmethod
+    def numbered(cls, n_features):
+        """feature1 .. featureN"""
+        return cls(f"feature{i + 1}" for i in range(n_features))
+
+    def __repr__(self):
+        return f"FeatureSchema({self.n_features} features: {', '.join(self.names[:4])}{', ...' if self.n_features > 4 else ''})"
+
+    def columns(self):
+        """Float columns for a SQLAlchemy Table, in schema order"""
+        return [Column(name, Float) for name in self.names]
+
+    def request_model(self, name="PredictionInput"):
+        """Pydantic model with one required float field per feature"""
+        return create_model(name, **{feature: (float, ...) for feature in self.names})
+
+    def row(self, obj):
+        """Feature values of a request object (attribute access) as a tuple"""
+        values = self._getter(obj)
+        return values if self.n_features > 1 else (values,)
+
+
+if FEATURE_NAMES.strip():
+    FEATURES = FeatureSchema(name.strip() for name in FEATURE_NAMES.split(",") if name.strip())
+else:
+    FEATURES = FeatureSchema.numbered(N_FEATURES)
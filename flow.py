@@ -1,6 +1,9 @@
+import atexit
 import os
-import random
+import time
 import requests
+import http_client
+from notifications import NotificationDispatcher
 from prefect import flow, task
 from prefect.logging import get_run_logger
 from dotenv import load_dotenv
@@ -12,99 +15,132 @@ DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 API_KEY = os.getenv("API_KEY", "default-key-change-me")
 PERFORMANCE_THRESHOLD = float(os.getenv("PERFORMANCE_THRESHOLD", "0.8"))
+# Seconds to wait after a retrain for the API to report serving the new version
+MODEL_WATCH_TIMEOUT = float(os.getenv("MODEL_WATCH_TIMEOUT", "60"))
 
-def send_discord_embed(message, title="Continual ML Automation", color=0x00ff00):
-    """Send structured message to Discord webhook"""
-    if not DISCORD_WEBHOOK_URL or "REPLACE_WITH_YOUR_WEBHOOK_URL" in DISCORD_WEBHOOK_URL:
+# Webhook posts happen on the dispatcher's thread; atexit drains what is left
+notifier = None
+if DISCORD_WEBHOOK_URL and "REPLACE_WITH_YOUR_WEBHOOK_URL" not in DISCORD_WEBHOOK_URL:
+    notifier = NotificationDispatcher(DISCORD_WEBHOOK_URL)
+    atexit.register(notifier.stop)
+
+# Last /model-status body and its ETag, so unchanged status costs a bodiless 304
+_status_cache = {"etag": None, "status": None}
+
+def get_model_status():
+    """Fetch /model-status, revalidating the cached copy with If-None-Match"""
+    headers = {}
+    if _status_cache["etag"]:
+        headers["If-None-Match"] = _status_cache["etag"]
+    response = http_client.get(f"{API_BASE_URL}/model-status", headers=headers)
+    if response.status_code == 304:
+        return _status_cache["status"]
+    if response.status_code != 200:
+        return None
+    _status_cache["etag"] = response.headers.get("ETag")
+    _status_cache["status"] = response.json()
+    return _status_cache["status"]
+
+def wait_for_model_version(version, timeout=MODEL_WATCH_TIMEOUT):
+    """Long-poll /model-status/watch until the API serves `version`; returns the status or None on timeout.
+
+    Each request is held by the API until the status differs from our ETag,
+    so the wait costs one request per model change instead of a poll loop.
+    With API_WORKERS > 1 this confirms the worker that answered.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        status = _status_cache["status"]
+        if status and (status.get("model_version") or 0) >= version:
+            return status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        headers = {}
+        if _status_cache["etag"]:
+            headers["If-None-Match"] = _status_cache["etag"]
+        response = http_client.get(
+            f"{API_BASE_URL}/model-status/watch", params={"timeout": remaining}, headers=headers,
+            # The server holds the request for up to `remaining` seconds
+            timeout=(http_client.HTTP_CONNECT_TIMEOUT, remaining + http_client.HTTP_READ_TIMEOUT)
+        )
+        # 304: the status did not change before the timeout
+        if response.status_code != 200:
+            return None
+        _status_cache["etag"] = response.headers.get("ETag")
+        _status_cache["status"] = response.json()
+
+def send_discord_embed(message, title="Continual ML Automation", color=0x00ff00, dedupe_key=None):
+    """Queue a structured message for the Discord webhook without waiting on it"""
+    if notifier is None:
         print(f"Discord notification: {title} - {message}")
         return
-    
-    try:
-        embed = {
-            "title": title,
-            "description": message,
-            "color": color,
-            "timestamp": "2024-01-01T00:00:00.000Z"
-        }
-        
-        data = {
-            "embeds": [embed],
-            "username": "Continual ML Bot"
-        }
-        
-        response = requests.post(DISCORD_WEBHOOK_URL, json=data, timeout=10)
-        if response.status_code == 204:
-            print(f"Discord notification sent: {message}")
-        else:
-            print(f"Discord notification failed: {response.status_code}")
-            
-    except Exception as e:
-        print(f"Discord notification error: {str(e)}")
+    notifier.notify(message, title, color, dedupe_key=dedupe_key)
 
 @task(retries=2, retry_delay_seconds=1)
 def check_model_performance():
-    """Check current model performance and determine if retraining is needed"""
+    """Check drift metrics on live traffic and determine if retraining is needed"""
     logger = get_run_logger()
     
     try:
         # Get current model status
-        response = requests.get(f"{API_BASE_URL}/model-status", timeout=10)
-        if response.status_code != 200:
-            logger.warning("Could not get model status")
-            # Simulate performance check with random value for demo
-            performance = random.random()
-        else:
-            status = response.json()
-            performance = status.get("performance", 0.0)
-            model_trained = status.get("model_trained", False)
-            
-            if not model_trained:
-                logger.info("No model found - triggering initial training")
-                send_discord_embed("🤖 No model detected. Initiating first-time training.", "Initial Setup", 0xffa500)
-                raise Exception("No model available - retraining required")
+        status = get_model_status()
+        if status is None:
+            logger.warning("Could not get model status - skipping this check")
+            return "skipped"
         
-        logger.info(f"Current model performance: {performance:.3f}, threshold: {PERFORMANCE_THRESHOLD}")
+        if not status.get("model_trained", False):
+            logger.info("No model found - triggering initial training")
+            send_discord_embed("🤖 No model detected. Initiating first-time training.", "Initial Setup", 0xffa500)
+            raise Exception("No model available - retraining required")
         
-        # Check if performance has degraded below threshold
+        # Held-out accuracy of the serving model plus rolling live-traffic metrics
+        performance = status.get("performance", 0.0)
+        # Per-worker metrics: with API_WORKERS > 1 this is whichever worker
+        # answers, over the share of traffic it served (see README)
+        response = http_client.get(f"{API_BASE_URL}/drift")
+        if response.status_code != 200:
+            logger.warning(f"/drift answered {response.status_code} - skipping this check")
+            return "skipped"
+        drift = response.json()
+        reasons = list(drift.get("reasons", []))
         if performance < PERFORMANCE_THRESHOLD:
-            logger.warning(f"Model drift detected! Performance {performance:.3f} < threshold {PERFORMANCE_THRESHOLD}")
+            reasons.append(f"held-out accuracy {performance:.3f} < {PERFORMANCE_THRESHOLD}")
+        
+        logger.info(
+            f"Model v{status.get('model_version')}: held-out accuracy {performance:.3f}, "
+            f"live window {drift.get('observed', 0)} requests / {drift.get('labeled', 0)} labeled"
+        )
+        
+        if reasons:
+            logger.warning(f"Model drift detected: {'; '.join(reasons)}")
             send_discord_embed(
                 f"🔄 **Model drift detected!**\n"
-                f"• Current performance: {performance:.3f}\n"
-                f"• Threshold: {PERFORMANCE_THRESHOLD}\n"
-                f"• Action: Retraining initiated",
+                + "".join(f"• {reason}\n" for reason in reasons)
+                + "• Action: Retraining initiated",
                 "Model Drift Alert",
                 0xff6b6b
             )
-            raise Exception("Model performance below threshold - retraining required")
+            raise Exception("Drift detected - retraining required")
         else:
-            logger.info("Model performance is above threshold - no retraining needed")
+            logger.info("No drift signal - no retraining needed")
             send_discord_embed(
                 f"✅ **Model performance OK**\n"
-                f"• Current performance: {performance:.3f}\n"
+                f"• Held-out accuracy: {performance:.3f}\n"
                 f"• Threshold: {PERFORMANCE_THRESHOLD}\n"
                 f"• Status: No action required",
                 "Performance Check",
-                0x51cf66
+                0x51cf66,
+                dedupe_key="performance-ok"
             )
             return "ok"
             
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request failed: {str(e)}")
-        # Fallback to random check if API is unavailable
-        performance = random.random()
-        if performance < 0.5:
-            send_discord_embed(
-                f"⚠️ **Simulated drift detected** (API unavailable)\n"
-                f"• Simulated performance: {performance:.3f}\n"
-                f"• Action: Demonstration retraining",
-                "Demo Mode",
-                0xffd43b
-            )
-            raise Exception("Simulated model drift for demonstration")
-        else:
-            send_discord_embed("✅ Simulated performance check OK (API unavailable)", "Demo Mode", 0x51cf66)
-            return "ok"
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Without the API (or with a body that is not JSON) there is no signal
+        # to act on; retraining on noise would only burn CPU, so wait for the
+        # next scheduled check
+        logger.error(f"API request failed - skipping this check: {str(e)}")
+        return "skipped"
 
 @task(retries=1, retry_delay_seconds=2)
 def trigger_retraining():
@@ -118,15 +154,33 @@ def trigger_retraining():
         logger.info("Starting automated model retraining")
         result = retrain_model_internal()
         
+        if result.get("skipped"):
+            # Another run holds the retrain lock, or the model already saw this data
+            logger.info(f"Retraining skipped: {result['message']}")
+            return result
+        
         accuracy = result.get("accuracy", 0.0)
         logger.success(f"Model retraining completed successfully with accuracy: {accuracy:.3f}")
+        timings = result.get("timings") or {}
+        if timings:
+            logger.info("Retrain phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+        
+        # The API picks the new version up from the model store; wait for it
+        # to say so rather than assuming it
+        try:
+            served = wait_for_model_version(result["version"]) is not None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Could not confirm the API is serving v{result['version']}: {str(e)}")
+            served = False
+        if not served:
+            logger.warning(f"API not yet serving v{result['version']} after {MODEL_WATCH_TIMEOUT:g}s")
         
         send_discord_embed(
             f"🎉 **Model retraining successful!**\n"
             f"• New accuracy: {accuracy:.3f}\n"
             f"• Training samples: Auto-generated\n"
             f"• MLflow: Experiment logged\n"
-            f"• Status: Ready for predictions",
+            f"• Status: {'Ready for predictions' if served else 'Published, not yet served'}",
             "Retraining Success",
             0x69db7c
         )
@@ -147,13 +201,25 @@ def trigger_retraining():
 
 @task(retries=2, retry_delay_seconds=1)  
 def ensure_dataset_exists():
-    """Ensure training dataset exists before retraining"""
+    """Ensure training dataset exists before retraining, generating one only if the table is empty"""
     logger = get_run_logger()
     
     try:
-        # Try to generate dataset if none exists
         headers = {"Authorization": f"Bearer {API_KEY}"}
-        response = requests.post(f"{API_BASE_URL}/generate", headers=headers, timeout=10)
+        # Regenerating an existing dataset would only churn ids and force a refit
+        response = http_client.get(f"{API_BASE_URL}/dataset/fingerprint", headers=headers)
+        if response.status_code != 200:
+            # Unknown state: leave the data alone, retraining generates a
+            # default dataset itself if the table turns out to be empty
+            logger.warning(f"/dataset/fingerprint answered {response.status_code} - skipping generation")
+            return None
+        fingerprint = response.json()
+        if fingerprint.get("n_rows", 0) > 0:
+            logger.info(f"Dataset present with {fingerprint['n_rows']} rows (digest {fingerprint['digest']}) - skipping generation")
+            return fingerprint
+        
+        # Generate dataset since none exists
+        response = http_client.post(f"{API_BASE_URL}/generate", headers=headers)
         
         if response.status_code == 200:
             result = response.json()
@@ -163,7 +229,7 @@ def ensure_dataset_exists():
         else:
             logger.warning(f"Dataset generation failed with status {response.status_code}")
             
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         logger.warning(f"Could not connect to API for dataset generation: {str(e)}")
         # This is OK - the internal retraining function will handle missing datasets
 
@@ -207,7 +273,7 @@ if __name__ == "__main__":
     
     print("🤖 Starting Continual ML automated monitoring...")
     print(f"📊 Performance threshold: {PERFORMANCE_THRESHOLD}")
-    print(f"🔔 Discord notifications: {'Enabled' if DISCORD_WEBHOOK_URL and 'REPLACE_WITH_YOUR_WEBHOOK_URL' not in DISCORD_WEBHOOK_URL else 'Demo mode'}")
+    print(f"🔔 Discord notifications: {'Enabled' if notifier is not None else 'Demo mode'}")
     print("⏰ Checking every 30 seconds...")
     
     # Start the automated pipeline
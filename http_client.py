@@ -0,0 +1,99 @@
+"""Shared HTTP client for the pipeline and the dashboard.
+
+One keep-alive requests.Session per process with a sized connection pool,
+default timeouts and retries with jittered exponential backoff, so repeated
+calls to the API or the Discord webhook reuse sockets instead of opening a
+new TCP connection each time.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# For calls that do real work server-side, e.g. synchronous /generate
+HTTP_SLOW_READ_TIMEOUT = float(os.getenv("HTTP_SLOW_READ_TIMEOUT", "300"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.2"))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.1"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_retry(total=HTTP_RETRIES, backoff=HTTP_BACKOFF, jitter=HTTP_BACKOFF_JITTER):
+    """Retry connection errors for any method, and 429/5xx for idempotent methods only"""
+    return Retry(
+        total=total,
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        status_forcelist=(429, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def build_session(pool_size=HTTP_POOL_SIZE, retry=None):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry if retry is not None else build_retry(),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide keep-alive session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request(method, url, session=None, **kwargs):
+    """Send a request through the shared session with default timeouts"""
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    return (session or get_session()).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def connection_stats(session=None):
+    """Requests sent, TCP connections opened and connections reused, per live pool"""
+    session = session or get_session()
+    requests_sent = connections = 0
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections += pool.num_connections
+    return {
+        "requests": requests_sent,
+        "connections_opened": connections,
+        "connections_reused": max(requests_sent - connections, 0),
+    }
@@ -0,0 +1,40 @@
+"""Vectorized inference helpers shared by the prediction endpoints"""
+import io
+import os
+
+import numpy as np
+
+from features import FEATURES
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100000"))
+N_FEATURES = FEATURES.n_features
+
+
+def predict_with_proba(model, X):
+    """Return (labels, max_probabilities) for X from a single predict_proba call"""
+    proba = model.predict_proba(X)
+    return model.classes_[proba.argmax(axis=1)], proba.max(axis=1)
+
+
+def validate_batch(X):
+    """Check a feature matrix has the expected shape, raising ValueError otherwise"""
+    if X.ndim != 2 or X.shape[1] != N_FEATURES:
+        raise ValueError(f"Expected an array of shape (n, {N_FEATURES}), got {X.shape}")
+    if len(X) == 0:
+        raise ValueError("Batch is empty")
+    if len(X) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(X)} rows exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}")
+    if not np.isfinite(X).all():
+        raise ValueError("Batch contains NaN or infinite values")
+    return X
+
+
+def load_npy_batch(payload):
+    """Decode a NumPy .npy payload into a float64 feature matrix"""
+    try:
+        X = np.load(io.BytesIO(payload), allow_pickle=False)
+    except Exception as e:
+        raise ValueError(f"Invalid .npy payload: {str(e)}")
+    if not np.issubdtype(X.dtype, np.number):
+        raise ValueError(f"Expected a numeric array, got dtype {X.dtype}")
+    return validate_batch(np.asarray(X, dtype=np.float64))
@@ -0,0 +1,215 @@
+"""Background job queue running heavy work (generation, training, MLflow logging) in worker processes.
+
+Job records are mirrored to JOB_STATE_DIR as JSON so that, when several API
+workers run side by side, a job can be polled through any of them.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# "process" keeps CPU-bound work off the API's GIL; "thread" is for debugging
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "process")
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", "./job_state")
+
+
+def generate_job(n_samples):
+    """Worker entry point: generate a dataset and replace the datasets table"""
+    from app import generate_and_store
+    return {"samples": generate_and_store(n_samples)}
+
+
+def retrain_job(full_refit=False):
+    """Worker entry point: retrain, log to MLflow and publish to the model store"""
+    from app import retrain_model_internal
+    return retrain_model_internal(full_refit=full_refit)
+
+
+JOB_KINDS = {
+    "generate": generate_job,
+    "retrain": retrain_job,
+}
+
+
+class Job:
+    """Status record for one submitted job"""
+
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.future = None
+        self.finished_status = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.foreign_status = None
+
+    @property
+    def status(self):
+        if self.finished_status is not None:
+            return self.finished_status
+        if self.foreign_status is not None:
+            return self.foreign_status
+        if self.future is not None and self.future.running():
+            return "running"
+        return "pending"
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a job record written by another worker"""
+        job = cls(data["kind"], data["params"])
+        job.id = data["job_id"]
+        job.submitted_at = data["submitted_at"]
+        job.finished_at = data["finished_at"]
+        job.error = data["error"]
+        job.result = data.get("result")
+        if data["status"] in ("succeeded", "failed"):
+            job.finished_status = data["status"]
+        else:
+            # Only the owning worker can see the future; from here it is in flight
+            job.foreign_status = "running"
+        return job
+
+
+class JobManager:
+    """Submit jobs to a worker pool and keep a bounded history of their status"""
+
+    def __init__(self, workers=JOB_WORKERS, executor=JOB_EXECUTOR, history=JOB_HISTORY, state_dir=JOB_STATE_DIR):
+        self.workers = workers
+        self.executor_kind = executor
+        self.history = history
+        self.state_dir = state_dir
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        """Mirror a job record to the shared state directory"""
+        if not self.state_dir:
+            return
+        path = self._state_path(job.id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({**job.to_dict(), "result": job.result}, f, default=float)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not persist state of job {job.id}: {str(e)}")
+
+    def _load(self, job_id):
+        if not self.state_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                return Job.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _forget(self, job):
+        if self.state_dir:
+            try:
+                os.unlink(self._state_path(job.id))
+            except FileNotFoundError:
+                pass
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "thread":
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+                else:
+                    # spawn: the API process runs threads (model watcher, anyio
+                    # pool) and forking those can deadlock on inherited locks
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _submit_future(self, fn, *args, **kwargs):
+        try:
+            return self._get_executor().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            logger.warning("Job worker pool was broken - restarting it")
+            self._reset_executor()
+            return self._get_executor().submit(fn, *args, **kwargs)
+
+    def submit(self, kind, **params):
+        """Queue a job of a known kind and return its Job record"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                _, expired = self._jobs.popitem(last=False)
+                self._forget(expired)
+        self._save(job)
+
+        job.future = self._submit_future(JOB_KINDS[kind], **params)
+        job.future.add_done_callback(lambda f: self._finish(job, f))
+        logger.info(f"Submitted {kind} job {job.id}")
+        return job
+
+    def _finish(self, job, future):
+        try:
+            job.result = future.result()
+            job.finished_at = time.time()
+            job.finished_status = "succeeded"
+            logger.info(f"{job.kind} job {job.id} succeeded")
+        except Exception as e:
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.finished_status = "failed"
+            logger.error(f"{job.kind} job {job.id} failed: {str(e)}")
+        self._save(job)
+
+    def run(self, fn, *args):
+        """Run a function in the worker pool and wait for its result"""
+        return self._submit_future(fn, *args).result()
+
+    def get(self, job_id):
+        """Return a job submitted here, or one another worker recorded in the state directory"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    def shutdown(self):
+        self._reset_executor()
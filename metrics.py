@@ -0,0 +1,339 @@
+"""Low-overhead Prometheus metrics for the API and the training pipeline.
+
+Every thread records into its own shard, a dict only that thread writes,
+so the hot path takes no lock: a thread-local lookup, a bisect and two list
+increments. A scrape sums the shards of every thread that has recorded;
+shards of threads that have exited are folded into a retired total, so
+short-lived worker threads do not accumulate. Metrics are per process; with
+several uvicorn workers each exposes its own.
+"""
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+from dotenv import load_dotenv
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+from sqlalchemy import event
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384, 65536)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric(ABC):
+    """Label tuple -> cell storage split per thread"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (weak reference to the owning thread, shard)
+        self._shards = []
+        # Summed shards of threads that have exited
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        shard = self._local.shard = {}
+        with self._lock:
+            self._retire_dead()
+            self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _retire_dead(self):
+        """Fold shards of exited threads into the retired total; call with the lock held"""
+        live = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, shard))
+            else:
+                # The thread is gone, so nothing writes this shard any more
+                self._fold(self._retired, shard)
+        self._shards = live
+
+    @abstractmethod
+    def _fold(self, total, shard):
+        """Add one shard's cells into total and return it"""
+
+    def _snapshots(self):
+        with self._lock:
+            self._retire_dead()
+            shards = [shard for _, shard in self._shards]
+            retired = self._fold({}, self._retired)
+        # dict.copy() runs without releasing the GIL, so it never sees a
+        # shard mid-insert
+        return [retired] + [shard.copy() for shard in shards]
+
+
+class Counter(_ShardedMetric):
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _fold(self, total, shard):
+        for labels, value in shard.items():
+            total[labels] = total.get(labels, 0) + value
+        return total
+
+    def values(self):
+        """{label tuple: total} summed over threads"""
+        totals = {}
+        for shard in self._snapshots():
+            self._fold(totals, shard)
+        return totals
+
+    def render(self):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_ShardedMetric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # Non-cumulative count per bucket (the last one is +Inf), then the sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 2)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of the block in seconds"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, *labels)
+
+    def _fold(self, total, shard):
+        for labels, cell in shard.items():
+            into = total.get(labels)
+            if into is None:
+                total[labels] = list(cell)
+            else:
+                for i, value in enumerate(cell):
+                    into[i] += value
+        return total
+
+    def values(self):
+        """{label tuple: (bucket counts, sum)} summed over threads"""
+        totals = {}
+        for shard in self._snapshots():
+            self._fold(totals, shard)
+        return {labels: (cell[:-1], cell[-1]) for labels, cell in totals.items()}
+
+    def render(self):
+        lines = []
+        for labels, (counts, total) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="' + (bound if bound == "+Inf" else _number(float(bound))) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Values read at scrape time from a callback.
+
+    Without labelnames fn returns a number, or None for no sample; with
+    labelnames it returns {label tuple: number}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        value = self.fn()
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [f"{self.name} {_number(value)}"]
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in sorted(value.items())]
+
+
+class PhaseTimer:
+    """Time named phases of one run into a histogram, keeping the durations"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.seconds = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            self.histogram.observe(elapsed, name)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        """Add a metric, or return the one already registered under its name.
+
+        A module can be imported twice in one process (a spawned job worker
+        runs app.py as __mp_main__ and then imports app), so registering
+        the same metric again is not an error; a different kind or label
+        set under the same name is.
+        """
+        existing = self._metrics.get(metric.name)
+        if existing is None:
+            self._metrics[metric.name] = metric
+            return metric
+        if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric {metric.name} is already registered as a different {existing.kind}")
+        if isinstance(existing, Gauge):
+            # Read the state of the module that registered last
+            existing.fn = metric.fn
+        return existing
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self._register(Gauge(name, help, fn, labelnames))
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time spent in each route, from routing to the response",
+    ("method", "route", "status"))
+INFERENCE_BATCH_SIZE = REGISTRY.histogram(
+    "inference_batch_rows", "Rows scored per model call (single, microbatch or batch endpoint)",
+    ("path",), buckets=BATCH_SIZE_BUCKETS)
+RETRAIN_PHASE_SECONDS = REGISTRY.histogram(
+    "retrain_phase_duration_seconds", "Duration of each retraining phase", ("phase",), buckets=PHASE_BUCKETS)
+ROWS_LOADED = REGISTRY.counter(
+    "retrain_rows_loaded_total", "Dataset rows loaded for training", ("mode",))
+AUTH_REJECTIONS = REGISTRY.counter(
+    "api_key_rejections_total", "Requests refused by API key checks", ("reason",))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type", ("statement",))
+
+
+class TimedRoute(APIRoute):
+    """Route class timing every request to its endpoint, labelled by route template.
+
+    Set as app.router.route_class before routes are declared. Timing inside
+    the route handler rather than in a middleware avoids an extra ASGI layer
+    and a wrapper around send(); the route and status are known directly.
+    Streaming responses are timed until the response object is returned.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        observe = HTTP_REQUEST_SECONDS.observe
+        path = self.path
+
+        async def timed_handler(request):
+            start = perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                observe(perf_counter() - start, request.method, path, status)
+
+        return timed_handler
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start", None)
+    if started is not None:
+        DB_QUERY_SECONDS.observe(perf_counter() - started, statement.lstrip().split(None, 1)[0].upper())
+
+
+def instrument_engine(engine):
+    """Time every statement SQLAlchemy executes on engine.
+
+    Raw DBAPI cursors bypass these hooks; dataset.py's bulk insert and load
+    paths time their cursors into the same histogram themselves.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
@@ -0,0 +1,237 @@
+"""Versioned on-disk model store and background watcher for atomic hot-swaps.
+
+Layout under MODEL_STORE_DIR:
+
+    v000001/model.pkl     pickled estimator (used for training and as fallback)
+    v000001/scorer.json   compact serving artifact header (binary linear models only)
+    v000001/weights.npy   raw weights the header describes, memory-mapped on load
+    v000001/meta.json     performance, training watermark, MLflow run id, ...
+    LATEST                version number of the newest complete model
+
+A version directory is fully written under a temporary name and renamed into
+place before LATEST is replaced, so readers never see a partial model.
+"""
+import fcntl
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, NamedTuple
+
+from dotenv import load_dotenv
+from loguru import logger
+
+from scoring import COMPACT_HEADER, COMPACT_WEIGHTS, LinearScorer, build_scorer
+
+load_dotenv()
+
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "./model_store")
+MODEL_STORE_KEEP = int(os.getenv("MODEL_STORE_KEEP", "10"))
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "1.0"))
+
+
+class ServingModel(NamedTuple):
+    """Immutable snapshot of everything needed to serve one model version"""
+    model: Any
+    scorer: Any
+    version: int
+    performance: float
+    metadata: dict
+
+
+def make_serving_model(model, version, metadata, scorer=None):
+    return ServingModel(
+        model=model,
+        scorer=scorer if scorer is not None else build_scorer(model),
+        version=version,
+        performance=float(metadata.get("performance", 0.0)),
+        metadata=metadata,
+    )
+
+
+def _write_atomic(path, data):
+    """Write bytes to path via a temp file and rename"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ModelStore:
+    """Filesystem registry holding versioned serialized models"""
+
+    def __init__(self, root=MODEL_STORE_DIR, keep=MODEL_STORE_KEEP):
+        self.root = root
+        self.keep = keep
+        os.makedirs(self.root, exist_ok=True)
+
+    def _version_dir(self, version):
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def versions(self):
+        """Return all complete versions in ascending order"""
+        versions = []
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:].isdigit():
+                versions.append(int(name[1:]))
+        return sorted(versions)
+
+    def latest_version(self):
+        """Return the version LATEST points at, or None if nothing was published"""
+        try:
+            with open(os.path.join(self.root, "LATEST")) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def publish(self, model, metadata):
+        """Serialize a model as the next version, point LATEST at it and return its ServingModel"""
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        try:
+            with open(os.path.join(staging, "model.pkl"), "wb") as f:
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+            scorer = build_scorer(model)
+            if scorer is not None:
+                scorer.save(staging)
+            # Claim the next free version number; rename fails if another
+            # publisher got there first, in which case we try the next one.
+            while True:
+                version = (max(self.versions(), default=0)) + 1
+                metadata = {**metadata, "version": version, "published_at": time.time()}
+                with open(os.path.join(staging, "meta.json"), "w") as f:
+                    json.dump(metadata, f)
+                try:
+                    os.rename(staging, self._version_dir(version))
+                    break
+                except OSError:
+                    if not os.path.exists(self._version_dir(version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # Read-compare-write of LATEST under a lock, so a slower publisher of
+        # an older version can never move LATEST backwards
+        with self.exclusive("latest", wait=True):
+            latest = self.latest_version()
+            if latest is None or version > latest:
+                _write_atomic(os.path.join(self.root, "LATEST"), str(version).encode())
+            self._prune()
+        logger.info(f"Published model version {version} to {self.root}")
+        return make_serving_model(model, version, metadata, scorer=scorer)
+
+    def artifact_paths(self, version):
+        """Paths of the compact serving artifact files of a version, if it has them"""
+        paths = [os.path.join(self._version_dir(version), name) for name in (COMPACT_HEADER, COMPACT_WEIGHTS)]
+        return paths if all(os.path.exists(path) for path in paths) else []
+
+    def load_metadata(self, version):
+        """Metadata of a version, without loading the model"""
+        with open(os.path.join(self._version_dir(version), "meta.json")) as f:
+            return json.load(f)
+
+    def load(self, version):
+        """Load (model, metadata) for a version"""
+        version_dir = self._version_dir(version)
+        metadata = self.load_metadata(version)
+        with open(os.path.join(version_dir, "model.pkl"), "rb") as f:
+            model = pickle.load(f)
+        return model, metadata
+
+    def load_serving_model(self, version=None):
+        """Load a version (default: latest) as a ServingModel, or None if the store is empty.
+
+        Versions with a compact artifact are served from memory-mapped weights
+        without unpickling; their ServingModel.model is None, so callers that
+        need the estimator itself use load().
+        """
+        version = self.latest_version() if version is None else version
+        if version is None:
+            return None
+        version_dir = self._version_dir(version)
+        if self.artifact_paths(version):
+            metadata = self.load_metadata(version)
+            return make_serving_model(None, version, metadata, scorer=LinearScorer.load(version_dir))
+        model, metadata = self.load(version)
+        return make_serving_model(model, version, metadata)
+
+    @contextmanager
+    def exclusive(self, name, wait=False):
+        """Try to take a cross-process lock file in the store; yields whether it was acquired.
+
+        By default never waits: a caller that finds the lock held is expected
+        to skip its work. With wait=True it blocks until the lock is free.
+        """
+        with open(os.path.join(self.root, f".{name}.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _prune(self):
+        """Delete all but the newest `keep` versions"""
+        versions = self.versions()
+        latest = self.latest_version()
+        for version in versions[:-self.keep] if self.keep > 0 else []:
+            if version != latest:
+                shutil.rmtree(self._version_dir(version), ignore_errors=True)
+
+
+class ModelWatcher:
+    """Poll a ModelStore in a background thread and hand new versions to a callback.
+
+    Loading (unpickling, compiling the scorer) happens on the watcher thread;
+    the callback only has to swap a reference, so serving never waits.
+    """
+
+    def __init__(self, store, get_current_version, on_update, interval=MODEL_POLL_INTERVAL):
+        self.store = store
+        self.get_current_version = get_current_version
+        self.on_update = on_update
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Load and hand over the latest version if it is newer than the one serving"""
+        latest = self.store.latest_version()
+        current = self.get_current_version()
+        if latest is None or (current is not None and latest <= current):
+            return False
+        serving_model = self.store.load_serving_model(latest)
+        self.on_update(serving_model)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Model watcher failed to load new version: {str(e)}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
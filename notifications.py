@@ -0,0 +1,195 @@
+"""Non-blocking Discord notifications: callers enqueue embeds, a background
+thread sends them in batches of up to 10 per webhook payload"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+from loguru import logger
+
+import http_client
+
+load_dotenv()
+
+NOTIFY_CAPACITY = int(os.getenv("NOTIFY_CAPACITY", "1000"))
+# Seconds between webhook posts; Discord allows roughly 5 per 2 seconds
+NOTIFY_MIN_INTERVAL = float(os.getenv("NOTIFY_MIN_INTERVAL", "0.5"))
+# Seconds to wait after the first queued embed so a burst shares one post
+NOTIFY_LINGER = float(os.getenv("NOTIFY_LINGER", "0.25"))
+NOTIFY_DEDUPE_SECONDS = float(os.getenv("NOTIFY_DEDUPE_SECONDS", "3600"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "3"))
+NOTIFY_USERNAME = os.getenv("NOTIFY_USERNAME", "Continual ML Bot")
+
+# Discord rejects payloads with more embeds than this
+MAX_EMBEDS_PER_MESSAGE = 10
+# Upper bound on a server-requested rate-limit pause
+MAX_RETRY_AFTER = 30.0
+
+
+def _retry_after(response):
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1.0))
+    except ValueError:
+        return 1.0
+
+
+class NotificationDispatcher:
+    """Queue webhook embeds and deliver them off the caller's thread.
+
+    notify() only appends to a bounded queue. The sender thread packs up to
+    10 embeds into each payload, keeps posts at least min_interval apart,
+    and backs off on 429s. A notification with the same dedupe_key as the
+    one just before it is suppressed for dedupe_seconds, so a steady
+    "performance OK" only goes out once until something else is reported.
+    """
+
+    def __init__(self, webhook_url, username=NOTIFY_USERNAME, capacity=NOTIFY_CAPACITY,
+                 min_interval=NOTIFY_MIN_INTERVAL, linger=NOTIFY_LINGER,
+                 dedupe_seconds=NOTIFY_DEDUPE_SECONDS, max_attempts=NOTIFY_MAX_ATTEMPTS):
+        self.webhook_url = webhook_url
+        self.username = username
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.linger = linger
+        self.dedupe_seconds = dedupe_seconds
+        self.max_attempts = max_attempts
+
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._send_lock = threading.Lock()
+        self._dedupe_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._last_key = None
+        self._last_key_at = 0.0
+        self._last_post = 0.0
+
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.posts = 0
+        self.rate_limited = 0
+
+    def _is_repeat(self, dedupe_key):
+        now = time.monotonic()
+        with self._dedupe_lock:
+            repeat = (dedupe_key is not None and dedupe_key == self._last_key
+                      and now - self._last_key_at < self.dedupe_seconds)
+            if not repeat:
+                self._last_key = dedupe_key
+                self._last_key_at = now
+        return repeat
+
+    def notify(self, message, title, color, dedupe_key=None):
+        """Queue one embed; returns False if it was deduplicated or dropped"""
+        if self._is_repeat(dedupe_key):
+            self.deduplicated += 1
+            return False
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._queue.append({
+            "title": title,
+            "description": message,
+            "color": color,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        })
+        self.enqueued += 1
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+        return True
+
+    def _drain(self):
+        batch = []
+        popleft = self._queue.popleft
+        try:
+            for _ in range(MAX_EMBEDS_PER_MESSAGE):
+                batch.append(popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def _post(self, embeds):
+        payload = {"username": self.username, "embeds": embeds}
+        for _ in range(self.max_attempts):
+            pause = self._last_post + self.min_interval - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            try:
+                response = http_client.post(self.webhook_url, json=payload)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Discord notification error: {str(e)}")
+                return False
+            finally:
+                self._last_post = time.monotonic()
+            self.posts += 1
+            if response.status_code == 429:
+                self.rate_limited += 1
+                time.sleep(min(_retry_after(response), MAX_RETRY_AFTER))
+                continue
+            if response.ok:
+                return True
+            logger.warning(f"Discord notification failed: {response.status_code}")
+            return False
+        return False
+
+    def flush(self):
+        """Send everything queued; returns the number of embeds delivered"""
+        delivered = 0
+        with self._send_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                if self._post(batch):
+                    self.sent += len(batch)
+                    delivered += len(batch)
+                else:
+                    self.failed += len(batch)
+        return delivered
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            self._stop.wait(self.linger)
+            self.flush()
+        self.flush()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stop the sender thread after a final flush"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self):
+        return {
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "failed": self.failed,
+            "posts": self.posts,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,265 @@
+"""Columnar dataset store: one Parquet file per ingestion batch plus a JSON manifest.
+
+Layout under DATASET_DIR:
+
+    batch-000001.parquet   id, one column per schema feature, target for one insert call
+                           (or for several small ones merged together)
+    manifest.json          feature names, next id, per partition its id range, row count and digest,
+                           and the files the last rewrite retired
+    .lock                  serialises writers across processes
+
+Ids are assigned contiguously within a partition and never reused, like the
+SQL table's autoincrement ids, so training watermarks work the same way.
+Watermarks and fingerprints are answered from the manifest alone, and loads
+open only the partitions overlapping the requested id range and read only
+the feature and target columns.
+
+Small appends (such as /feedback rows) are merged once PARQUET_COMPACT_FILES
+of them trail the manifest. Files dropped by a replace or a compaction are
+deleted by the next one rather than straight away, so readers that loaded
+the previous manifest can still open them.
+
+pyarrow is an optional dependency needed only when this backend is selected.
+"""
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+from loguru import logger
+
+from dataset import FEATURE_DTYPE, LOAD_CHUNK_SIZE, TARGET_DTYPE, format_digest, rows_digest
+from features import FEATURES
+
+load_dotenv()
+
+DATASET_DIR = os.getenv("DATASET_DIR", "./dataset_store")
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "1000000"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy")
+# Once this many partitions under PARQUET_COMPACT_ROWS rows each trail the
+# manifest (e.g. from /feedback appends), they are merged into one file
+PARQUET_COMPACT_ROWS = int(os.getenv("PARQUET_COMPACT_ROWS", "100000"))
+PARQUET_COMPACT_FILES = int(os.getenv("PARQUET_COMPACT_FILES", "16"))
+
+MANIFEST = "manifest.json"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("DATASET_BACKEND=parquet requires pyarrow (pip install pyarrow)") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _overlap(partition, min_id, max_id):
+    """Id range [lo, hi] of a partition inside min_id < id <= max_id, or None"""
+    lo = partition["min_id"] if min_id is None else max(partition["min_id"], min_id + 1)
+    hi = partition["max_id"] if max_id is None else min(partition["max_id"], max_id)
+    return (lo, hi) if lo <= hi else None
+
+
+class ParquetDatasetStore:
+    """Dataset rows as Parquet partitions, one per ingestion batch"""
+
+    def __init__(self, root=DATASET_DIR, row_group_size=PARQUET_ROW_GROUP_SIZE, compression=PARQUET_COMPRESSION,
+                 schema=FEATURES, compact_rows=PARQUET_COMPACT_ROWS, compact_files=PARQUET_COMPACT_FILES):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.compact_rows = compact_rows
+        self.compact_files = max(compact_files, 2)
+        self.schema = schema
+        self.columns = [*schema.names, "target"]
+        os.makedirs(self.root, exist_ok=True)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"features": list(self.schema.names), "next_id": 1, "next_batch": 1, "partitions": []}
+        if manifest.get("features", list(self.schema.names)) != list(self.schema.names):
+            raise ValueError(f"{self.root} holds features {manifest['features']}, "
+                             f"not the configured {list(self.schema.names)}")
+        return manifest
+
+    def _write_manifest(self, manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.root, MANIFEST))
+
+    @contextmanager
+    def _writer_lock(self):
+        with open(os.path.join(self.root, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_partition(self, manifest, table, partition):
+        """Write `table` as the next batch file; returns `partition` with its file name"""
+        _, pq = _pyarrow()
+        name = f"batch-{manifest['next_batch']:06d}.parquet"
+        tmp_path = os.path.join(self.root, f".tmp-{name}")
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size, compression=self.compression)
+        os.replace(tmp_path, os.path.join(self.root, name))
+        manifest["next_batch"] += 1
+        return {"file": name, **partition}
+
+    def _small_tail(self, partitions):
+        """The run of partitions under compact_rows rows at the end of the list"""
+        n_small = 0
+        for partition in reversed(partitions):
+            if partition["n_rows"] >= self.compact_rows:
+                break
+            n_small += 1
+        return partitions[len(partitions) - n_small:]
+
+    def _compact(self, manifest, partitions):
+        """Merge consecutive partitions into one file; their ids stay contiguous"""
+        pa, pq = _pyarrow()
+        table = pa.concat_tables(pq.read_table(os.path.join(self.root, partition["file"]))
+                                 for partition in partitions)
+        merged = self._write_partition(manifest, table, {
+            "min_id": partitions[0]["min_id"],
+            "max_id": partitions[-1]["max_id"],
+            "n_rows": sum(partition["n_rows"] for partition in partitions),
+            # Fingerprints sum partition digests, so the merged digest is their sum
+            "digest": format_digest(sum(int(partition["digest"], 16) for partition in partitions)
+                                    & 0xFFFFFFFFFFFFFFFF),
+        })
+        logger.info(f"Compacted {len(partitions)} partitions into {merged['file']}")
+        return merged
+
+    def insert(self, X, y, replace=False):
+        """Write the rows as a new partition; replace=True drops every existing one"""
+        pa, _ = _pyarrow()
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.int64)
+        if len(X) != len(y):
+            raise ValueError(f"X and y length mismatch: {len(X)} != {len(y)}")
+        if X.ndim != 2 or X.shape[1] != self.schema.n_features:
+            raise ValueError(f"Expected {self.schema.n_features} features, got an array of shape {X.shape}")
+
+        with self._writer_lock():
+            manifest = self._read_manifest()
+            retired = list(manifest["partitions"]) if replace else []
+            partitions = [] if replace else list(manifest["partitions"])
+            if len(X):
+                first_id = manifest["next_id"]
+                columns = {"id": np.arange(first_id, first_id + len(X), dtype=np.int64)}
+                columns.update(zip(self.schema.names, X.T))
+                columns["target"] = y
+                partitions.append(self._write_partition(manifest, pa.table(columns), {
+                    "min_id": first_id,
+                    "max_id": first_id + len(X) - 1,
+                    "n_rows": len(X),
+                    "digest": format_digest(rows_digest(X, y)),
+                }))
+                manifest["next_id"] = first_id + len(X)
+                small = self._small_tail(partitions)
+                if len(small) >= self.compact_files:
+                    partitions[-len(small):] = [self._compact(manifest, small)]
+                    retired += small
+            # Files dropped by the previous rewrite are deleted only now, so a
+            # reader that picked up that older manifest has had time to open them
+            stale = manifest.get("retired", []) if retired else []
+            manifest["features"] = list(self.schema.names)
+            manifest["partitions"] = partitions
+            if retired:
+                manifest["retired"] = [partition["file"] for partition in retired]
+            self._write_manifest(manifest)
+            for name in stale:
+                try:
+                    os.unlink(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+
+        logger.info(f"Wrote {len(X)} rows to {self.root} ({len(partitions)} partitions)")
+        return len(X)
+
+    def watermark(self, min_id=None, max_id=None):
+        """Return (row_count, max_id) for the rows in min_id < id <= max_id"""
+        n_rows = last_id = 0
+        for partition in self._read_manifest()["partitions"]:
+            span = _overlap(partition, min_id, max_id)
+            if span is not None:
+                n_rows += span[1] - span[0] + 1
+                last_id = max(last_id, span[1])
+        return n_rows, last_id
+
+    def fingerprint(self):
+        """Return {n_rows, max_id, digest} from the manifest"""
+        partitions = self._read_manifest()["partitions"]
+        digest = sum(int(partition["digest"], 16) for partition in partitions) & 0xFFFFFFFFFFFFFFFF
+        return {
+            "n_rows": sum(partition["n_rows"] for partition in partitions),
+            "max_id": max((partition["max_id"] for partition in partitions), default=0),
+            "digest": format_digest(digest),
+        }
+
+    def id_bounds(self, step, max_id=None):
+        """Ids of the step-th, 2*step-th, ... row up to max_id, from the manifest"""
+        bounds = []
+        # Rows still missing from the block being counted
+        pending = step
+        for partition in self._read_manifest()["partitions"]:
+            span = _overlap(partition, None, max_id)
+            if span is None:
+                continue
+            bound = span[0] + pending - 1
+            while bound <= span[1]:
+                bounds.append(bound)
+                bound += step
+            pending = bound - span[1]
+        return bounds
+
+    def iter_chunks(self, chunk_size=LOAD_CHUNK_SIZE, min_id=None, max_id=None):
+        """Stream (X, y) chunks in id order from the partitions overlapping the range"""
+        _, pq = _pyarrow()
+        # Open every file up front: a writer may retire them while we stream,
+        # and an open handle outlives the unlink
+        opened = []
+        for partition in self._read_manifest()["partitions"]:
+            span = _overlap(partition, min_id, max_id)
+            if span is not None:
+                opened.append((partition, span, pq.ParquetFile(os.path.join(self.root, partition["file"]))))
+        for partition, span, parquet_file in opened:
+            # Ids are contiguous within a partition, so the range is a row slice
+            skip = span[0] - partition["min_id"]
+            remaining = span[1] - span[0] + 1
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=self.columns):
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                batch = batch.slice(skip, remaining)
+                skip = 0
+                remaining -= batch.num_rows
+                X = np.empty((batch.num_rows, self.schema.n_features), dtype=FEATURE_DTYPE)
+                for j in range(self.schema.n_features):
+                    X[:, j] = batch.column(j).to_numpy()
+                yield X, batch.column(self.schema.n_features).to_numpy().astype(TARGET_DTYPE)
+                if remaining <= 0:
+                    break
+
+    def load(self, min_id=None, max_id=None, chunk_size=LOAD_CHUNK_SIZE):
+        """Load rows in min_id < id <= max_id into preallocated float32/int8 arrays"""
+        n_rows, _ = self.watermark(min_id, max_id)
+        X = np.empty((n_rows, self.schema.n_features), dtype=FEATURE_DTYPE)
+        y = np.empty(n_rows, dtype=TARGET_DTYPE)
+        filled = 0
+        for X_chunk, y_chunk in self.iter_chunks(chunk_size, min_id=min_id, max_id=max_id):
+            stop = min(filled + len(X_chunk), n_rows)
+            X[filled:stop] = X_chunk[:stop - filled]
+            y[filled:stop] = y_chunk[:stop - filled]
+            filled = stop
+        if filled < n_rows:
+            X, y = X[:filled], y[:filled]
+        return X, y
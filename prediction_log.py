@@ -0,0 +1,268 @@
+"""Buffered prediction logging: the hot path appends to a bounded ring buffer,
+a background thread flushes it to the predictions table in batches.
+
+Each flush also folds its records into a rollup table of per-interval,
+per-model-version counts, so prediction volume over any time range is read
+from a few thousand rollup rows instead of scanning millions of predictions.
+"""
+import os
+import threading
+from collections import deque
+
+from dotenv import load_dotenv
+from loguru import logger
+from sqlalchemy import Integer, cast, func, literal, select
+
+from features import FEATURES
+
+load_dotenv()
+
+PREDICTION_LOG_ENABLED = os.getenv("PREDICTION_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+PREDICTION_LOG_CAPACITY = int(os.getenv("PREDICTION_LOG_CAPACITY", "100000"))
+PREDICTION_LOG_BATCH = int(os.getenv("PREDICTION_LOG_BATCH", "1000"))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "1.0"))
+# Rollup granularity; /stats/predictions buckets are multiples of it
+PREDICTION_ROLLUP_SECONDS = int(os.getenv("PREDICTION_ROLLUP_SECONDS", "60"))
+
+# Column order of the tuples handed to log()/log_many()
+RECORD_FIELDS = ("created_at", *FEATURES.names, "prediction", "probability", "model_version")
+
+
+class PredictionLogger:
+    """Non-blocking writer for prediction records.
+
+    log() never waits on the database: when the buffer is full the record is
+    dropped and counted instead. Once the buffer passes the high-water mark
+    the writer is considered behind and stats() reports backpressure.
+    """
+
+    def __init__(self, engine, table, capacity=PREDICTION_LOG_CAPACITY,
+                 batch_size=PREDICTION_LOG_BATCH, flush_interval=PREDICTION_LOG_FLUSH_INTERVAL,
+                 rollup=None, rollup_seconds=PREDICTION_ROLLUP_SECONDS):
+        self.engine = engine
+        self.table = table
+        self.rollup = rollup
+        self.rollup_seconds = rollup_seconds
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = int(capacity * 0.8)
+
+        self._buffer = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def log(self, record):
+        """Queue one record tuple (see RECORD_FIELDS); returns False if it was dropped"""
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._buffer.append(record)
+        self.enqueued += 1
+        self._after_append()
+        return True
+
+    def log_many(self, records):
+        """Queue several records, dropping whatever does not fit"""
+        room = max(self.capacity - len(self._buffer), 0)
+        accepted = records[:room]
+        self._buffer.extend(accepted)
+        self.enqueued += len(accepted)
+        self.dropped += len(records) - len(accepted)
+        self._after_append()
+        return len(accepted)
+
+    def _after_append(self):
+        if self._thread is None:
+            self.start()
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def _drain(self):
+        batch = []
+        popleft = self._buffer.popleft
+        try:
+            for _ in range(self.batch_size):
+                batch.append(popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def flush(self):
+        """Write everything currently buffered; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                rows = [dict(zip(RECORD_FIELDS, record)) for record in batch]
+                try:
+                    with self.engine.begin() as connection:
+                        connection.execute(self.table.insert(), rows)
+                        if self.rollup is not None:
+                            update_rollup(connection, self.rollup, batch, self.rollup_seconds)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.error(f"Failed to write {len(batch)} prediction records: {str(e)}")
+                    break
+                self.written += len(batch)
+                self.flushes += 1
+                written += len(batch)
+        return written
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread after a final flush"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+
+    def stats(self):
+        buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "backpressure": buffered >= self.high_water,
+        }
+
+
+def rollup_counts(records, seconds):
+    """{(bucket_start, model_version): [n, n_positive, sum_probability]} for record tuples"""
+    counts = {}
+    for record in records:
+        created_at, prediction, probability, version = record[0], record[-3], record[-2], record[-1]
+        key = (int(created_at) // seconds * seconds, -1 if version is None else version)
+        cell = counts.get(key)
+        if cell is None:
+            cell = counts[key] = [0, 0, 0.0]
+        cell[0] += 1
+        cell[1] += 1 if prediction else 0
+        cell[2] += probability
+    return counts
+
+
+def update_rollup(connection, rollup, records, seconds):
+    """Add records to the rollup inside the caller's transaction.
+
+    A batch usually touches one or two buckets, so this is an UPDATE per
+    bucket plus an INSERT for buckets seen for the first time.
+    """
+    c = rollup.c
+    for (bucket, version), (n, n_positive, probability) in rollup_counts(records, seconds).items():
+        updated = connection.execute(
+            rollup.update()
+            .where(c.bucket_start == bucket, c.model_version == version)
+            .values(n_predictions=c.n_predictions + n, n_positive=c.n_positive + n_positive,
+                    sum_probability=c.sum_probability + probability)
+        ).rowcount
+        if not updated:
+            connection.execute(rollup.insert(), {
+                "bucket_start": bucket, "model_version": version, "n_predictions": n,
+                "n_positive": n_positive, "sum_probability": probability,
+            })
+
+
+def rebuild_rollup(engine, predictions, rollup, seconds=PREDICTION_ROLLUP_SECONDS):
+    """Recompute the rollup from the predictions table with one GROUP BY"""
+    p = predictions.c
+    # floor() first: CAST rounds on PostgreSQL but truncates on SQLite
+    second = cast(func.floor(p.created_at), Integer)
+    bucket = (second - second % literal(seconds)).label("bucket")
+    query = (select(bucket, func.coalesce(p.model_version, -1), func.count(), func.sum(p.prediction),
+                    func.sum(p.probability))
+             .group_by(bucket, p.model_version))
+    with engine.begin() as connection:
+        connection.execute(rollup.delete())
+        connection.execute(rollup.insert().from_select(
+            ["bucket_start", "model_version", "n_predictions", "n_positive", "sum_probability"], query))
+        n_buckets = connection.execute(select(func.count()).select_from(rollup)).scalar()
+    logger.info(f"Rebuilt prediction rollup: {n_buckets} buckets")
+    return n_buckets
+
+
+def ensure_rollup(engine, predictions, rollup, seconds=PREDICTION_ROLLUP_SECONDS):
+    """Build the rollup once for predictions logged before it existed"""
+    with engine.connect() as connection:
+        missing = (connection.execute(select(rollup.c.bucket_start).limit(1)).first() is None
+                   and connection.execute(select(predictions.c.id).limit(1)).first() is not None)
+    if missing:
+        rebuild_rollup(engine, predictions, rollup, seconds)
+
+
+def prediction_volume(engine, rollup, bucket_seconds, start=None, end=None, limit=500):
+    """Page of prediction counts per time bucket, oldest first.
+
+    Covers at most `limit` buckets from `start` (default: the first logged
+    prediction). Returns (buckets, next_start), where next_start is where
+    the next page begins, or None when nothing is left before `end`.
+    """
+    c = rollup.c
+    with engine.connect() as connection:
+        if start is None:
+            start = connection.execute(select(func.min(c.bucket_start))).scalar()
+            if start is None:
+                return [], None
+        start = int(start) // bucket_seconds * bucket_seconds
+        stop = start + limit * bucket_seconds
+        if end is not None:
+            stop = min(stop, int(end))
+        bucket = (c.bucket_start - c.bucket_start % literal(bucket_seconds)).label("bucket")
+        rows = connection.execute(
+            select(bucket, c.model_version, func.sum(c.n_predictions), func.sum(c.n_positive),
+                   func.sum(c.sum_probability))
+            .where(c.bucket_start >= start, c.bucket_start < stop)
+            .group_by(bucket, c.model_version)
+            .order_by(bucket, c.model_version)
+        ).all()
+        following = select(c.bucket_start).where(c.bucket_start >= stop)
+        if end is not None:
+            following = following.where(c.bucket_start < int(end))
+        more = connection.execute(following.limit(1)).first() is not None
+
+    buckets = {}
+    for bucket_start, version, n, n_positive, probability in rows:
+        entry = buckets.get(bucket_start)
+        if entry is None:
+            entry = buckets[bucket_start] = {"start": bucket_start, "count": 0, "positive": 0,
+                                             "sum_probability": 0.0, "by_version": {}}
+        entry["count"] += n
+        entry["positive"] += n_positive
+        entry["sum_probability"] += probability
+        entry["by_version"][str(version)] = n
+    pages = []
+    for entry in buckets.values():
+        sum_probability = entry.pop("sum_probability")
+        entry["positive_rate"] = entry["positive"] / entry["count"]
+        entry["mean_probability"] = sum_probability / entry["count"]
+        pages.append(entry)
+    return pages, stop if more else None
@@ -0,0 +1,113 @@
+"""Fast-path scorer for binary linear models, bypassing sklearn validation and dispatch"""
+import json
+import math
+import os
+from operator import mul
+
+import numpy as np
+from scipy.special import expit
+
+
+# Compact serving artifact written next to the pickled estimator
+COMPACT_HEADER = "scorer.json"
+COMPACT_WEIGHTS = "weights.npy"
+COMPACT_FORMAT = "linear-binary"
+COMPACT_FORMAT_VERSION = 1
+
+
+class LinearScorer:
+    """Score a binary linear classifier from its extracted coef_ and intercept_.
+
+    Mirrors sklearn's decision_function / predict / predict_proba for
+    LogisticRegression and SGDClassifier(loss="log_loss"). Inputs are assumed
+    to be already validated finite float matrices.
+    """
+
+    def __init__(self, coef, intercept, classes, model=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).reshape(1, -1)
+        self.intercept = np.ascontiguousarray(intercept, dtype=np.float64).reshape(1)
+        self.classes = np.asarray(classes)
+        self.n_features = self.coef.shape[1]
+        # The estimator this scorer was compiled from, if any
+        self.model = model
+        # Plain Python copies for the single-row path
+        self._weights = self.coef[0].tolist()
+        self._bias = float(self.intercept[0])
+        self._labels = self.classes.tolist()
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.coef_, model.intercept_, model.classes_, model=model)
+
+    def save(self, directory):
+        """Write the compact artifact: raw weights (coef then intercept) plus a JSON header"""
+        weights = np.concatenate([self.coef[0], self.intercept])
+        np.save(os.path.join(directory, COMPACT_WEIGHTS), weights)
+        header = {
+            "format": COMPACT_FORMAT,
+            "format_version": COMPACT_FORMAT_VERSION,
+            "n_features": self.n_features,
+            "classes": self._labels,
+            "dtype": str(weights.dtype),
+            "model_type": type(self.model).__name__ if self.model is not None else None,
+        }
+        with open(os.path.join(directory, COMPACT_HEADER), "w") as f:
+            json.dump(header, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a compact artifact; weights are memory-mapped unless mmap is False"""
+        with open(os.path.join(directory, COMPACT_HEADER)) as f:
+            header = json.load(f)
+        if header.get("format") != COMPACT_FORMAT or header.get("format_version") != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scorer artifact in {directory}: {header.get('format')} v{header.get('format_version')}")
+        weights = np.load(os.path.join(directory, COMPACT_WEIGHTS), mmap_mode="r" if mmap else None)
+        n_features = header["n_features"]
+        if weights.shape != (n_features + 1,):
+            raise ValueError(f"Scorer weights in {directory} have shape {weights.shape}, expected ({n_features + 1},)")
+        return cls(weights[:n_features], weights[n_features:], header["classes"])
+
+    def decision_function(self, X):
+        return (X @ self.coef.T + self.intercept).ravel()
+
+    def predict_proba(self, X):
+        prob = self.decision_function(X)
+        expit(prob, out=prob)
+        return np.vstack([1 - prob, prob]).T
+
+    def predict(self, X):
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
+
+    def predict_with_proba(self, X):
+        """Return (labels, max_probabilities) like inference.predict_with_proba"""
+        scores = self.decision_function(X)
+        positive = scores > 0
+        prob = expit(scores)
+        return self.classes[positive.astype(int)], np.where(positive, prob, 1 - prob)
+
+    def predict_one(self, row):
+        """Score a single row in pure Python; returns (label, max_probability)"""
+        # Same summation order as a bias-first loop, but the loop runs in C
+        z = sum(map(mul, self._weights, row), self._bias)
+        if z >= 0:
+            p = 1.0 / (1.0 + math.exp(-z))
+        else:
+            e = math.exp(z)
+            p = e / (1.0 + e)
+        if z > 0:
+            return self._labels[1], p
+        return self._labels[0], 1.0 - p
+
+
+def build_scorer(model):
+    """Compile a LinearScorer for a fitted binary linear model, or None if unsupported"""
+    coef = getattr(model, "coef_", None)
+    intercept = getattr(model, "intercept_", None)
+    classes = getattr(model, "classes_", None)
+    if coef is None or intercept is None or classes is None:
+        return None
+    if len(classes) != 2 or np.ndim(coef) != 2 or np.shape(coef)[0] != 1:
+        return None
+    if not hasattr(model, "predict_proba"):
+        return None
+    return LinearScorer.from_model(model)
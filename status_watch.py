@@ -0,0 +1,57 @@
+"""ETags and change notification for /model-status long-poll and SSE clients"""
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def status_etag(status):
+    """Weak ETag over the fields that describe the model, not per-request diagnostics"""
+    stable = {key: status.get(key) for key in ("model_trained", "model_version", "performance", "threshold", "needs_retraining")}
+    digest = hashlib.sha1(json.dumps(stable, sort_keys=True).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Evaluate an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+class StatusNotifier:
+    """Wake asyncio waiters from any thread when the model status may have changed"""
+
+    def __init__(self):
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    async def wait(self, timeout):
+        """Wait until notify() is called or the timeout expires; returns True if notified"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop is already closed
+                pass
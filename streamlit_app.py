@@ -1,9 +1,14 @@
 import streamlit as st
-import requests
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from dotenv import load_dotenv
 
+import http_client
+from features import FEATURES
+
 # Load environment variables
 load_dotenv()
 
@@ -11,6 +16,12 @@ load_dotenv()
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 API_KEY = os.getenv("API_KEY", "default-key-change-me")
 STREAMLIT_PASSWORD = os.getenv("STREAMLIT_PASSWORD", "admin123")
+# Seconds API reads are reused across reruns and sessions
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+# Model versions per history page
+MODEL_HISTORY_PAGE = 50
+
+BUCKET_CHOICES = {"Minute": 60, "Hour": 3600, "Day": 86400}
 
 def check_password():
     """Returns `True` if the user had the correct password."""
@@ -41,20 +52,120 @@ def check_password():
         return True
 
 def make_api_request(endpoint, method="GET", data=None):
-    """Make API request with authentication"""
+    """Make API request with authentication
+
+    GET responses carrying an ETag are kept in the session and revalidated
+    with If-None-Match, so an unchanged status comes back as a bodiless 304.
+    """
     headers = {"Authorization": f"Bearer {API_KEY}"}
     url = f"{API_BASE_URL}{endpoint}"
+    etag_cache = st.session_state.setdefault("etag_cache", {})
     
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers)
+            cached = etag_cache.get(endpoint)
+            if cached:
+                headers["If-None-Match"] = cached["etag"]
+            response = http_client.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return 200, cached["body"]
+            if response.status_code == 200 and "ETag" in response.headers:
+                etag_cache[endpoint] = {"etag": response.headers["ETag"], "body": response.json()}
         elif method == "POST":
-            response = requests.post(url, headers=headers, json=data)
+            # Generation can outlast the default read timeout
+            response = http_client.post(
+                url, headers=headers, json=data,
+                timeout=(http_client.HTTP_CONNECT_TIMEOUT, http_client.HTTP_SLOW_READ_TIMEOUT)
+            )
         
         return response.status_code, response.json()
     except Exception as e:
         return None, str(e)
 
+def get_json(endpoint, params=None):
+    """Authenticated GET returning (status_code, body); safe to call from worker threads"""
+    try:
+        response = http_client.get(f"{API_BASE_URL}{endpoint}", params=params,
+                                   headers={"Authorization": f"Bearer {API_KEY}"})
+        return response.status_code, response.json()
+    except Exception as e:
+        return None, str(e)
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def fetch_overview():
+    """Model status and the newest model versions, fetched concurrently"""
+    endpoints = {
+        "status": ("/model-status", None),
+        "models": ("/stats/models", {"limit": MODEL_HISTORY_PAGE}),
+    }
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as pool:
+        futures = {key: pool.submit(get_json, *request) for key, request in endpoints.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def fetch_model_page(before):
+    return get_json("/stats/models", {"limit": MODEL_HISTORY_PAGE, "before": before})
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def fetch_prediction_volume(bucket_seconds, start, limit):
+    """One page of server-side aggregated prediction counts; start is bucket-aligned so reruns hit the cache"""
+    return get_json("/stats/predictions", {"bucket_seconds": bucket_seconds, "start": start, "limit": limit})
+
+def render_history(overview):
+    """Prediction volume and model accuracy over time, from the aggregated endpoints"""
+    import pandas as pd
+
+    st.header("📈 History")
+    volume_col, models_col = st.columns(2)
+
+    with volume_col:
+        st.subheader("Prediction volume")
+        unit = st.selectbox("Bucket", list(BUCKET_CHOICES), index=1)
+        bucket_seconds = BUCKET_CHOICES[unit]
+        n_buckets = st.slider("Buckets", 12, 500, 48)
+        start = (int(time.time()) // bucket_seconds - n_buckets + 1) * bucket_seconds
+        status_code, response = fetch_prediction_volume(bucket_seconds, start, n_buckets)
+        if status_code != 200:
+            st.error(f"❌ Could not load prediction volume: {response}")
+        elif not response["buckets"]:
+            st.info("No predictions logged in this window")
+        else:
+            volume = pd.DataFrame(
+                [{"time": datetime.fromtimestamp(b["start"]), **b["by_version"]} for b in response["buckets"]]
+            ).set_index("time").fillna(0)
+            st.bar_chart(volume)
+            total = sum(b["count"] for b in response["buckets"])
+            st.caption(f"{total:,} predictions, stacked by model version")
+
+    with models_col:
+        st.subheader("Model accuracy over time")
+        status_code, response = overview["models"]
+        if status_code != 200:
+            st.error(f"❌ Could not load model history: {response}")
+            return
+        models = list(response["models"])
+        # Older pages the user asked for, by keyset cursor
+        next_before = response["next_before"]
+        for _ in range(st.session_state.get("model_pages", 1) - 1):
+            if next_before is None:
+                break
+            status_code, page = fetch_model_page(next_before)
+            if status_code != 200:
+                break
+            models.extend(page["models"])
+            next_before = page["next_before"]
+        if not models:
+            st.info("No model versions published yet")
+            return
+        history = pd.DataFrame(models)
+        history["published"] = pd.to_datetime(history["published_at"], unit="s")
+        st.line_chart(history.set_index("published")[["performance"]].sort_index())
+        st.dataframe(history[["version", "published", "performance", "mode", "candidate", "n_rows"]],
+                     hide_index=True)
+        if next_before is not None and st.button("Load older versions"):
+            st.session_state["model_pages"] = st.session_state.get("model_pages", 1) + 1
+            st.rerun()
+
 def main():
     st.set_page_config(
         page_title="Continual ML Dashboard",
@@ -75,15 +186,18 @@ def main():
         st.text(f"API Key: {'*' * len(API_KEY)}")
         
         if st.button("🔄 Refresh Status"):
+            st.cache_data.clear()
             st.rerun()
     
+    overview = fetch_overview()
+    
     # Main content
     col1, col2 = st.columns(2)
     
     with col1:
         st.header("🏥 System Status")
         
-        # Health Check
+        # Health Check: an explicit click always asks the API, never the cache
         if st.button("Check Health", type="primary"):
             with st.spinner("Checking health..."):
                 status_code, response = make_api_request("/health")
@@ -95,6 +209,7 @@ def main():
                     st.error(f"❌ Health check failed: {response}")
         
         # Model Status
+        # Revalidated by ETag, so an unchanged status costs a bodiless 304
         if st.button("Check Model Status"):
             with st.spinner("Checking model status..."):
                 status_code, response = make_api_request("/model-status")
@@ -126,6 +241,8 @@ def main():
                 status_code, response = make_api_request("/generate", method="POST")
                 
                 if status_code == 200:
+                    # New data changes the history views
+                    st.cache_data.clear()
                     st.success("✅ Dataset generated successfully!")
                     st.json(response)
                 else:
@@ -141,7 +258,7 @@ def main():
         
         if st.button("View Automation Details", type="secondary"):
             with st.spinner("Getting automation status..."):
-                status_code, response = make_api_request("/model-status")
+                status_code, response = overview["status"]
                 
                 if status_code == 200:
                     st.success("✅ Automation Status Retrieved!")
@@ -163,20 +280,25 @@ def main():
     
     st.markdown("---")
     
+    render_history(overview)
+    
+    st.markdown("---")
+    
     # Prediction section
     st.header("🎯 Make Prediction")
     
-    col1, col2, col3 = st.columns([1, 1, 2])
+    inputs_col, predict_col = st.columns([2, 2])
     
-    with col1:
-        feature1 = st.number_input("Feature 1", value=0.0, step=0.1)
-    
-    with col2:
-        feature2 = st.number_input("Feature 2", value=0.0, step=0.1)
+    with inputs_col:
+        # One input per schema feature, laid out four to a row
+        prediction_data = {}
+        for start in range(0, FEATURES.n_features, 4):
+            for col, name in zip(st.columns(4), FEATURES.names[start:start + 4]):
+                with col:
+                    prediction_data[name] = st.number_input(name, value=0.0, step=0.1)
     
-    with col3:
+    with predict_col:
         if st.button("Predict", type="primary"):
-            prediction_data = {"feature1": feature1, "feature2": feature2}
             
             with st.spinner("Making prediction..."):
                 status_code, response = make_api_request("/predict", method="POST", data=prediction_data)
@@ -1,7 +1,13 @@
 import pytest
 from fastapi.testclient import TestClient
-from app import app, current_model
+from app import app
 import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
 
 client = TestClient(app)
 
@@ -16,6 +22,7 @@ def test_health():
     data = response.json()
     assert data["status"] == "ok"
     assert "API is running" in data["message"]
+    assert data["worker"]["pid"] == os.getpid()
 
 def test_model_status():
     """Test the model status endpoint (no auth required)"""
@@ -35,6 +42,15 @@ def test_generate_dataset():
     assert "Dataset generated and stored successfully" in data["message"]
     assert data["samples"] == 1000
 
+def test_generate_dataset_custom_size():
+    """Test dataset generation with a configurable number of samples"""
+    response = client.post("/generate?n_samples=250", headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["samples"] == 250
+
+    response = client.post("/generate?n_samples=0", headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
 def test_generate_dataset_without_auth():
     """Test dataset generation without authentication should fail"""
     response = client.post("/generate")
@@ -58,12 +74,11 @@ def test_no_manual_retrain_endpoint():
 
 def test_predict_without_model():
     """Test prediction without a trained model should fail"""
-    from app import current_model
     import app
     
     # Save current model state and reset
-    original_model = app.current_model
-    app.current_model = None
+    original_model = app.serving_model
+    app.serving_model = None
     
     try:
         response = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS)
@@ -72,7 +87,7 @@ def test_predict_without_model():
         assert "No model available" in data["detail"]
     finally:
         # Restore original model state to avoid affecting other tests
-        app.current_model = original_model
+        app.serving_model = original_model
 
 def test_predict_with_model():
     """Test prediction with a trained model"""
@@ -100,4 +115,412 @@ def test_predict_without_auth():
 def test_predict_invalid_input():
     """Test prediction with invalid input"""
     response = client.post("/predict", json={"feature1": "invalid"}, headers=AUTH_HEADERS)
-    assert response.status_code == 422  # Validation error 
\ No newline at end of file
+    assert response.status_code == 422  # Validation error
+
+def test_incremental_retraining(monkeypatch):
+    """Incremental mode only trains on rows added since the last run"""
+    import app
+    from dataset import make_dataset, bulk_insert_dataset
+
+    monkeypatch.setattr(app, "RETRAIN_MODE", "incremental")
+
+    client.post("/generate?n_samples=500", headers=AUTH_HEADERS)
+    result = app.retrain_model_internal()
+    assert result["mode"] == "full"
+    assert result["new_samples"] == 500
+    full_accuracy = result["accuracy"]
+
+    X, y = make_dataset(50, random_state=7)
+    bulk_insert_dataset(app.engine, app.dataset_table, X, y, replace=False)
+    result = app.retrain_model_internal()
+    assert result["mode"] == "incremental"
+    assert result["new_samples"] == 50
+    # Too few new rows to move the held-out accuracy
+    assert result["accuracy"] == full_accuracy
+
+    # Nor can one misclassified feedback row flag the model for retraining
+    row = [[5.0, 5.0]]
+    label = 1 - int(app.serving_model.model.predict(row)[0])
+    client.post("/feedback", json={"rows": row, "labels": [label]}, headers=AUTH_HEADERS)
+    assert app.retrain_model_internal()["accuracy"] == full_accuracy
+    assert client.get("/model-status").json()["needs_retraining"] is (full_accuracy < app.PERFORMANCE_THRESHOLD)
+
+    result = app.retrain_model_internal()
+    assert result["new_samples"] == 0
+    assert result["skipped"] is True
+    assert result["version"] == app.serving_model.version
+
+    # Models published before fingerprinting reach the "no new rows" check
+    monkeypatch.setitem(app.serving_model.metadata, "data_fingerprint", None)
+    result = app.retrain_model_internal()
+    assert result["skipped"] is True
+    assert result["version"] == app.serving_model.version
+
+    assert app.retrain_model_internal(full_refit=True)["mode"] == "full"
+
+    # Regenerating replaces the table, which forces a full refit
+    client.post("/generate?n_samples=500", headers=AUTH_HEADERS)
+    assert app.retrain_model_internal()["mode"] == "full"
+
+def test_unchanged_data_skips_work():
+    """Regenerating identical data keeps the table, and retraining on it is a no-op"""
+    import app
+
+    client.post("/generate?n_samples=400", headers=AUTH_HEADERS)
+    trained = app.retrain_model_internal(full_refit=True)
+    before = client.get("/dataset/fingerprint", headers=AUTH_HEADERS).json()
+    assert before["n_rows"] == 400
+    assert before["model_up_to_date"] is True
+    # Can force a digest rescan, so it needs a key
+    assert client.get("/dataset/fingerprint").status_code == 403
+
+    client.post("/generate?n_samples=400", headers=AUTH_HEADERS)
+    assert client.get("/dataset/fingerprint", headers=AUTH_HEADERS).json()["max_id"] == before["max_id"]
+    result = app.retrain_model_internal()
+    assert result["skipped"] is True
+    assert result["version"] == trained["version"]
+
+    # A concurrent retrain backs off while the lock is held
+    with app.model_store.exclusive("retrain"):
+        assert app.retrain_model_internal(full_refit=True)["skipped"] is True
+
+    client.post("/feedback", json={"rows": [[1.0, 2.0]], "labels": [1]}, headers=AUTH_HEADERS)
+    assert client.get("/dataset/fingerprint", headers=AUTH_HEADERS).json()["model_up_to_date"] is False
+    assert "skipped" not in app.retrain_model_internal()
+
+def test_predict_batch():
+    """Batch prediction returns one label and probability per row"""
+    from app import retrain_model_internal
+    client.post("/generate", headers=AUTH_HEADERS)
+    retrain_model_internal()
+
+    rows = [[1.0, 2.0], [-1.0, -2.0], [0.5, 0.1]]
+    response = client.post("/predict/batch", json={"rows": rows}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert len(data["predictions"]) == len(data["probabilities"]) == 3
+
+    # Batch results match the single-row endpoint
+    single = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS).json()
+    assert data["predictions"][0] == single["prediction"]
+    assert abs(data["probabilities"][0] - single["probability"]) < 1e-9
+
+def test_predict_batch_npy():
+    """Batch prediction accepts a binary .npy payload"""
+    import io
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.save(buffer, np.array([[1.0, 2.0], [-1.0, -2.0]]))
+    response = client.post(
+        "/predict/batch/npy",
+        content=buffer.getvalue(),
+        headers={**AUTH_HEADERS, "Content-Type": "application/x-npy"}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
+
+    response = client.post("/predict/batch/npy", content=b"not numpy", headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+def test_predict_batch_invalid_shape():
+    """Rows with the wrong number of features are rejected"""
+    response = client.post("/predict/batch", json={"rows": [[1.0, 2.0, 3.0]]}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+    response = client.post("/predict/batch", json={"rows": []}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+def test_predict_with_microbatching(monkeypatch):
+    """/predict returns the same answer when routed through the micro-batcher"""
+    import app
+    from batching import MicroBatcher
+
+    client.post("/generate", headers=AUTH_HEADERS)
+    app.retrain_model_internal()
+    expected = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS).json()
+
+    monkeypatch.setattr(app, "predict_batcher", MicroBatcher(app._predict_current, max_wait_ms=1))
+    response = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.json() == expected
+
+    # A non-finite row is refused before it can join (and fail) a shared batch
+    headers = {**AUTH_HEADERS, "Content-Type": "application/json"}
+    response = client.post("/predict", content='{"feature1": NaN, "feature2": 1.0}', headers=headers)
+    assert response.status_code == 422
+
+def test_model_hot_swap_from_store():
+    """A version published by another process is picked up and served"""
+    import app
+    from dataset import make_dataset
+    from sklearn.linear_model import LogisticRegression
+
+    X, y = make_dataset(200, random_state=3)
+    published = app.model_store.publish(LogisticRegression().fit(X, y), {"performance": 0.91})
+    assert app.model_watcher.check() is True
+
+    data = client.get("/model-status").json()
+    assert data["model_version"] == published.version
+    assert data["performance"] == 0.91
+    response = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+
+def wait_for_job(job_id, timeout=120):
+    """Poll a background job until it finishes"""
+    import time
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get(f"/jobs/{job_id}/result", headers=AUTH_HEADERS)
+        if response.status_code != 202:
+            return response
+        time.sleep(0.2)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+def test_background_jobs():
+    """Generation and retraining can run as background jobs with status polling"""
+    import app
+
+    response = client.post("/jobs/generate?n_samples=300", headers=AUTH_HEADERS)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "generate"
+    assert job["status"] in ("pending", "running", "succeeded")
+
+    result = wait_for_job(job["job_id"])
+    assert result.status_code == 200
+    assert result.json()["result"]["samples"] == 300
+
+    response = client.post("/jobs/retrain?full_refit=true", headers=AUTH_HEADERS)
+    assert response.status_code == 202
+    result = wait_for_job(response.json()["job_id"])
+    assert result.status_code == 200
+    version = result.json()["result"]["version"]
+
+    # The API process picks the worker's model up from the model store
+    app.model_watcher.check()
+    assert client.get("/model-status").json()["model_version"] >= version
+
+    assert client.get("/jobs/does-not-exist", headers=AUTH_HEADERS).status_code == 404
+    assert client.post("/jobs/generate").status_code == 403
+
+def test_predictions_are_logged():
+    """Served predictions end up in the predictions table"""
+    import app
+    from sqlalchemy import select, func
+
+    client.post("/generate", headers=AUTH_HEADERS)
+    app.retrain_model_internal()
+
+    def logged():
+        with app.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(app.predictions_table)).scalar()
+
+    app.prediction_logger.flush()
+    before = logged()
+    client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS)
+    client.post("/predict/batch", json={"rows": [[1.0, 2.0], [3.0, 4.0]]}, headers=AUTH_HEADERS)
+    app.prediction_logger.flush()
+    assert logged() == before + 3
+
+    stats = client.get("/prediction-log/stats", headers=AUTH_HEADERS).json()
+    assert stats["written"] >= 3
+    assert stats["dropped"] == 0
+
+def test_feedback_and_drift():
+    """Labeled feedback feeds the drift monitor and is appended to the training data"""
+    import app
+    from dataset import make_dataset, dataset_watermark
+
+    client.post("/generate", headers=AUTH_HEADERS)
+    app.retrain_model_internal()
+    assert client.get("/drift").json()["model_version"] == app.serving_model.version
+
+    X, y = make_dataset(50, random_state=11)
+    before, _ = dataset_watermark(app.engine, app.dataset_table)
+    response = client.post("/feedback", json={"rows": X.tolist(), "labels": y.tolist()}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 50
+    assert dataset_watermark(app.engine, app.dataset_table)[0] == before + 50
+
+    drift = client.get("/drift").json()
+    assert drift["labeled"] == 50
+    assert 0.0 <= drift["accuracy"] <= 1.0
+
+    response = client.post("/feedback", json={"rows": [[1.0, 2.0]], "labels": [0, 1]}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+    # Labels outside the binary target are rejected, not stored
+    before, _ = dataset_watermark(app.engine, app.dataset_table)
+    for label in (300, 2, -1):
+        response = client.post("/feedback", json={"rows": [[1.0, 2.0]], "labels": [label]}, headers=AUTH_HEADERS)
+        assert response.status_code == 422
+    assert dataset_watermark(app.engine, app.dataset_table)[0] == before
+
+def test_model_status_etag():
+    """/model-status answers 304 while the client's ETag is still current"""
+    response = client.get("/model-status")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    response = client.get("/model-status", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/model-status", headers={"If-None-Match": 'W/"stale"'})
+    assert response.status_code == 200
+
+def test_model_status_long_poll():
+    """The watch endpoint times out with 304, and wakes up when a new model is published"""
+    import threading
+    import time
+    import app
+    from dataset import make_dataset
+    from sklearn.linear_model import LogisticRegression
+
+    etag = client.get("/model-status").headers["ETag"]
+    response = client.get("/model-status/watch?timeout=0.2", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    result = {}
+    def watch():
+        start = time.time()
+        result["response"] = client.get("/model-status/watch?timeout=20", headers={"If-None-Match": etag})
+        result["elapsed"] = time.time() - start
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    time.sleep(0.5)
+    X, y = make_dataset(200, random_state=5)
+    app.model_store.publish(LogisticRegression().fit(X, y), {"performance": 0.93})
+    app.model_watcher.check()
+    watcher.join(timeout=20)
+
+    assert result["response"].status_code == 200
+    assert result["response"].json()["performance"] == 0.93
+    assert result["elapsed"] < 10
+
+def test_model_status_events():
+    """The SSE stream starts with the current status and skips it on reconnect"""
+    import json
+
+    response = client.get("/model-status/events?timeout=0.2")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    lines = response.text.splitlines()
+    assert lines[0] == "event: status"
+    event_id = lines[1][len("id: "):]
+    assert "model_trained" in json.loads(lines[2][len("data: "):])
+
+    # Reconnecting with the last seen id only yields keepalives until something changes
+    response = client.get("/model-status/events?timeout=0.2", headers={"Last-Event-ID": event_id})
+    assert "event: status" not in response.text
+
+def test_import_is_lazy(tmp_path):
+    """Importing the app loads no training-only dependencies and touches no database"""
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        f"import sys; sys.path.insert(0, {root!r}); import app; "
+        "print(','.join(m for m in ('mlflow', 'pandas', 'sklearn') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+    assert not (tmp_path / "ml_data.db").exists()
+
+def test_metrics_endpoint():
+    """/metrics exposes per-route latency, batch sizes and the serving model version"""
+    import app
+    client.post("/generate", headers=AUTH_HEADERS)
+    app.retrain_model_internal(full_refit=True)
+    client.get("/health")
+    client.post("/predict/batch", json={"rows": [[0.1, 0.2], [0.3, 0.4]]}, headers=AUTH_HEADERS)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in text
+    assert 'inference_batch_rows_bucket{path="batch",le="4"}' in text
+    assert 'retrain_phase_duration_seconds_count{phase="fit"}' in text
+    assert 'model_retrain_phase_seconds{phase="load"}' in text
+    assert f"model_version {app.serving_model.version}" in text
+    assert 'db_query_duration_seconds_count{statement="SELECT"}' in text
+    # Raw-cursor bulk insert from /generate
+    assert 'db_query_duration_seconds_count{statement="INSERT"}' in text
+
+def test_stats_endpoints():
+    """Aggregated prediction volume and paginated model history"""
+    import app
+    client.post("/generate", headers=AUTH_HEADERS)
+    app.retrain_model_internal(full_refit=True)
+    app.retrain_model_internal(full_refit=True)
+    client.post("/predict/batch", json={"rows": [[0.1, 0.2], [0.3, 0.4]]}, headers=AUTH_HEADERS)
+    app.prediction_logger.flush()
+
+    data = client.get("/stats/predictions", params={"bucket_seconds": 86400 * 30}, headers=AUTH_HEADERS).json()
+    assert data["bucket_seconds"] % app.prediction_logger.rollup_seconds == 0
+    latest = data["buckets"][-1]
+    assert latest["count"] >= 2
+    assert latest["by_version"][str(app.serving_model.version)] >= 2
+    assert 0.0 <= latest["mean_probability"] <= 1.0
+    assert client.get("/stats/predictions").status_code == 403
+
+    page = client.get("/stats/models", params={"limit": 1}, headers=AUTH_HEADERS).json()
+    assert page["models"][0]["version"] == app.serving_model.version
+    assert page["next_before"] == app.serving_model.version
+    older = client.get("/stats/models", params={"limit": 1, "before": page["next_before"]}, headers=AUTH_HEADERS).json()
+    assert older["models"][0]["version"] < app.serving_model.version
+
+def test_out_of_core_retrain(monkeypatch):
+    """Datasets over the training memory budget are streamed into an SGD model"""
+    import app
+    monkeypatch.setattr(app, "TRAIN_MEMORY_BUDGET_MB", 0.0)
+    client.post("/generate", headers=AUTH_HEADERS)
+    result = app.retrain_model_internal(full_refit=True)
+    assert result["candidate"] == "sgd_streaming"
+    assert result["mode"] == "full"
+    assert result["accuracy"] > 0.5
+    assert app.serving_model.metadata["reference_profile"]["n_samples"] > 0
+
+    response = client.post("/predict", json={"feature1": 1.0, "feature2": 2.0}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_launch_as_script(tmp_path, workers):
+    """`python app.py`, as the Dockerfile runs it, serves jobs from spawned workers"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ,
+               FASTAPI_HOST="127.0.0.1",
+               FASTAPI_PORT=str(port),
+               API_WORKERS=str(workers),
+               DATABASE_URL=f"sqlite:///{tmp_path / 'ml_data.db'}",
+               MLFLOW_TRACKING_URI=f"file://{tmp_path / 'mlruns'}",
+               MODEL_STORE_DIR=str(tmp_path / "model_store"),
+               JOB_STATE_DIR=str(tmp_path / "job_state"),
+               DATASET_DIR=str(tmp_path / "dataset_store"))
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            assert server.poll() is None, "app.py exited during startup"
+            try:
+                if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            assert time.monotonic() < deadline, "app.py did not start serving"
+            time.sleep(0.2)
+
+        response = requests.post(f"{base_url}/generate?n_samples=100", headers=AUTH_HEADERS, timeout=60)
+        assert response.status_code == 200, response.text
+        assert response.json()["samples"] == 100
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
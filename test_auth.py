@@ -0,0 +1,60 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from auth import KeyStore, TokenBucket, hash_key, require_scope
+
+def test_key_store_scopes_and_hashed_secrets():
+    """Keys from API_KEYS are matched by digest, in plaintext or sha256= form, with their scopes"""
+    store = KeyStore.from_env(
+        legacy_key="legacy",
+        spec=f"reader:read-secret:read, scorer:sha256={hash_key('score-secret').hex()}:predict+feedback:5",
+    )
+    assert len(store) == 3
+    assert store.authenticate("legacy").allows("train")
+    reader = store.authenticate("read-secret")
+    assert reader.name == "reader" and reader.allows("read") and not reader.allows("predict")
+    scorer = store.authenticate("score-secret")
+    assert scorer.allows("feedback") and scorer.limiter.rate == 5
+    assert store.authenticate("sha256=" + hash_key("score-secret").hex()) is None
+    assert store.authenticate("wrong") is None
+
+    with pytest.raises(ValueError):
+        KeyStore.from_env(legacy_key="", spec="bad:secret:admin")
+    with pytest.raises(ValueError):
+        KeyStore.from_env(legacy_key="", spec="bad:secret")
+
+def test_token_bucket_refills():
+    """A burst is allowed up front, then requests are paced at the rate"""
+    bucket = TokenBucket(rate=10, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(now) == pytest.approx(0.1)
+    assert bucket.take(now + 0.1) == 0.0
+    assert bucket.take(now + 0.1) > 0
+    # Idle time refills up to the burst, never beyond
+    assert [bucket.take(now + 60) for _ in range(4)].count(0.0) == 3
+
+def test_require_scope_statuses():
+    """401 for unknown keys, 403 for a missing scope, 429 with Retry-After past the limit"""
+    store = KeyStore(rate=1, burst=1)
+    store.add("reader", "r", ["read"])
+    app = FastAPI()
+
+    @app.get("/read")
+    async def read(key=Depends(require_scope("read", store))):
+        return {"name": key.name}
+
+    @app.get("/train")
+    async def train(key=Depends(require_scope("train", store))):
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/read").status_code == 403
+    assert client.get("/read", headers={"Authorization": "Bearer nope"}).status_code == 401
+    headers = {"Authorization": "Bearer r"}
+    assert client.get("/train", headers=headers).status_code == 403
+    assert client.get("/read", headers=headers).json() == {"name": "reader"}
+    response = client.get("/read", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
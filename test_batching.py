@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+def fake_predict(X):
+    """Label is the sign of the first feature, probability is the second feature"""
+    return (X[:, 0] > 0).astype(int), X[:, 1]
+
+def test_concurrent_requests_are_coalesced():
+    """Concurrent submits share one batch and each caller gets its own row back"""
+    calls = []
+
+    def predict_fn(X):
+        calls.append(len(X))
+        return fake_predict(X)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=16, max_wait_ms=50)
+
+    async def run():
+        rows = [[(-1) ** i, i / 10] for i in range(10)]
+        return await asyncio.gather(*(batcher.submit(row) for row in rows))
+
+    results = asyncio.run(run())
+    assert calls == [10]
+    for i, (label, probability) in enumerate(results):
+        assert label == (1 if i % 2 == 0 else 0)
+        assert probability == pytest.approx(i / 10)
+
+def test_batches_respect_max_size():
+    """No batch is larger than max_batch_size"""
+    calls = []
+
+    def predict_fn(X):
+        calls.append(len(X))
+        return fake_predict(X)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit([1.0, 0.5]) for _ in range(10)))
+
+    assert len(asyncio.run(run())) == 10
+    assert max(calls) <= 4
+    assert sum(calls) == 10
+    assert batcher.stats()["items"] == 10
+
+def test_errors_propagate_to_every_caller():
+    """A failing predict_fn fails every request in the batch"""
+    def predict_fn(X):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit([0.0, 0.0]) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_failed_batch_is_resolved_per_row():
+    """A row that breaks predict_fn fails only its own caller, and scoring runs off the loop thread"""
+    threads = []
+
+    def predict_fn(X):
+        threads.append(threading.get_ident())
+        if (X[:, 0] < 0).any():
+            raise ValueError("negative input")
+        return fake_predict(X)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        rows = [[1.0, 0.1], [-1.0, 0.2], [1.0, 0.3], [1.0, 0.4]]
+        return await asyncio.gather(*(batcher.submit(row) for row in rows), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results[1], ValueError)
+    assert [r[1] for i, r in enumerate(results) if i != 1] == pytest.approx([0.1, 0.3, 0.4])
+    assert threading.get_ident() not in threads
@@ -0,0 +1,163 @@
+import numpy as np
+from sqlalchemy import create_engine, Column, Integer, Float, String, Table, MetaData, select, func
+
+import pytest
+
+from dataset import make_dataset, bulk_insert_dataset, load_dataset, dataset_fingerprint, rows_digest, format_digest
+from features import FeatureSchema
+
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    metadata = MetaData()
+    table = Table(
+        'datasets',
+        metadata,
+        Column('id', Integer, primary_key=True),
+        Column('feature1', Float),
+        Column('feature2', Float),
+        Column('target', Integer)
+    )
+    metadata.create_all(engine)
+    return engine, table
+
+def make_fingerprints(engine):
+    fingerprints = Table(
+        'dataset_fingerprints',
+        MetaData(),
+        Column('table_name', String, primary_key=True),
+        Column('n_rows', Integer, nullable=False),
+        Column('max_id', Integer, nullable=False),
+        Column('digest', String(16), nullable=False)
+    )
+    fingerprints.create(engine)
+    return fingerprints
+
+def test_make_dataset_size():
+    """Generated dataset honours n_samples"""
+    X, y = make_dataset(250)
+    assert X.shape == (250, 2)
+    assert y.shape == (250,)
+
+def test_bulk_insert_roundtrip(tmp_path):
+    """Bulk insert writes every row across multiple chunks"""
+    engine, table = make_engine(tmp_path)
+    X, y = make_dataset(1234)
+
+    inserted = bulk_insert_dataset(engine, table, X, y, chunk_size=100)
+    assert inserted == 1234
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(table).order_by(table.c.id)).fetchall()
+    assert len(rows) == 1234
+    np.testing.assert_allclose([rows[0].feature1, rows[0].feature2], X[0])
+    assert [row.target for row in rows] == y.tolist()
+
+def test_bulk_insert_replace_and_append(tmp_path):
+    """replace=True clears the table, replace=False appends"""
+    engine, table = make_engine(tmp_path)
+    X, y = make_dataset(100)
+
+    bulk_insert_dataset(engine, table, X, y)
+    bulk_insert_dataset(engine, table, X, y, replace=False)
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(table)).scalar() == 200
+
+    bulk_insert_dataset(engine, table, X, y, replace=True)
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(table)).scalar() == 100
+
+def test_bulk_insert_restores_pragmas(tmp_path):
+    """Bulk-load pragmas do not leak onto the pooled connection"""
+    engine, table = make_engine(tmp_path)
+    with engine.connect() as connection:
+        before = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+
+    X, y = make_dataset(10)
+    bulk_insert_dataset(engine, table, X, y)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == before
+
+def test_load_dataset_roundtrip(tmp_path):
+    """Streaming loader returns float32/int8 arrays matching the stored rows"""
+    engine, table = make_engine(tmp_path)
+    X, y = make_dataset(1050)
+    bulk_insert_dataset(engine, table, X, y)
+
+    X_loaded, y_loaded = load_dataset(engine, table, chunk_size=100)
+    assert X_loaded.dtype == np.float32
+    assert y_loaded.dtype == np.int8
+    assert X_loaded.shape == (1050, 2)
+    np.testing.assert_allclose(X_loaded, X.astype(np.float32))
+    np.testing.assert_array_equal(y_loaded, y)
+
+def test_load_dataset_empty(tmp_path):
+    """Loading an empty table yields empty arrays"""
+    engine, table = make_engine(tmp_path)
+    X, y = load_dataset(engine, table)
+    assert X.shape == (0, 2)
+    assert len(y) == 0
+
+def test_rows_digest_is_order_and_batch_independent():
+    """The digest of a table is the same however its rows were ordered or appended"""
+    X, y = make_dataset(300)
+    whole = rows_digest(X, y)
+    order = np.random.default_rng(0).permutation(300)
+    assert rows_digest(X[order], y[order]) == whole
+    assert (rows_digest(X[:100], y[:100]) + rows_digest(X[100:], y[100:])) % 2**64 == whole
+
+    y_changed = y.copy()
+    y_changed[0] = 1 - y_changed[0]
+    assert rows_digest(X, y_changed) != whole
+
+def test_fingerprint_tracks_inserts(tmp_path):
+    """The fingerprint maintained on ingest matches a full rescan of the table"""
+    engine, table = make_engine(tmp_path)
+    fingerprints = make_fingerprints(engine)
+    X, y = make_dataset(500)
+
+    bulk_insert_dataset(engine, table, X[:400], y[:400], fingerprints=fingerprints)
+    bulk_insert_dataset(engine, table, X[400:], y[400:], replace=False, fingerprints=fingerprints)
+    fingerprint = dataset_fingerprint(engine, table, fingerprints)
+    assert fingerprint == {"n_rows": 500, "max_id": 500, "digest": format_digest(rows_digest(X, y))}
+
+    # Rows written without updating the record make it stale; it is rebuilt
+    bulk_insert_dataset(engine, table, X[:10], y[:10], replace=False)
+    with engine.begin() as connection:
+        connection.execute(fingerprints.delete())
+    rebuilt = dataset_fingerprint(engine, table, fingerprints)
+    assert rebuilt["n_rows"] == 510
+    assert rebuilt["digest"] == format_digest((rows_digest(X, y) + rows_digest(X[:10], y[:10])) % 2**64)
+
+    bulk_insert_dataset(engine, table, X, y, fingerprints=fingerprints)
+    assert dataset_fingerprint(engine, table, fingerprints)["n_rows"] == 500
+
+def test_engine_uses_wal(tmp_path):
+    """File-backed SQLite engines run in WAL mode with a busy timeout"""
+    from database import create_db_engine
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+    assert engine.pool.size() > 1
+
+def test_wide_schema_roundtrip(tmp_path):
+    """A table built from a 32-feature schema ingests, loads and fingerprints like the default one"""
+    schema = FeatureSchema.numbered(32)
+    engine = create_engine(f"sqlite:///{tmp_path / 'wide.db'}")
+    metadata = MetaData()
+    table = Table('datasets', metadata, Column('id', Integer, primary_key=True), *schema.columns(), Column('target', Integer))
+    metadata.create_all(engine)
+    fingerprints = make_fingerprints(engine)
+
+    X, y = make_dataset(500, n_features=32)
+    assert X.shape == (500, 32)
+    bulk_insert_dataset(engine, table, X, y, chunk_size=128, fingerprints=fingerprints)
+    X_loaded, y_loaded = load_dataset(engine, table, chunk_size=100)
+    np.testing.assert_allclose(X_loaded, X.astype(np.float32))
+    np.testing.assert_array_equal(y_loaded, y)
+    assert dataset_fingerprint(engine, table, fingerprints)["digest"] == format_digest(rows_digest(X, y))
+
+    with pytest.raises(ValueError, match="32 feature columns"):
+        bulk_insert_dataset(engine, table, X[:, :2], y, replace=False)
@@ -0,0 +1,106 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from drift import DriftMonitor, reference_profile, SlidingWindow
+
+@pytest.fixture
+def profile():
+    rng = np.random.default_rng(0)
+    return reference_profile(rng.normal(size=(5000, 2)))
+
+def test_sliding_window_counts():
+    """Counts always reflect exactly the last `size` codes"""
+    window = SlidingWindow(5, 3)
+    for code in [0, 1, 2, 2, 2, 1]:
+        window.push(code)
+    assert window.counts.tolist() == [0, 2, 3]
+    window.push_many([0, 0, 0, 0])
+    assert window.counts.tolist() == [4, 1, 0]
+    window.push_many(list(range(3)) * 4)
+    assert window.counts.sum() == 5
+    assert window.filled == 5
+
+def test_no_drift_on_same_distribution(profile):
+    """Traffic from the training distribution raises no signal"""
+    monitor = DriftMonitor(profile, model_version=1, window=1000)
+    monitor.observe_many(np.random.default_rng(1).normal(size=(1000, 2)))
+    result = monitor.evaluate(0.8)
+    assert result["drift_detected"] is False
+    assert all(f["psi"] < 0.1 for f in result["features"])
+
+def test_shifted_feature_is_detected(profile):
+    """A shifted feature distribution shows up in PSI and KS"""
+    monitor = DriftMonitor(profile, model_version=1, window=1000)
+    X = np.random.default_rng(1).normal(size=(1000, 2))
+    X[:, 1] += 1.5
+    for row in X:
+        monitor.observe(row)
+    result = monitor.evaluate(0.8)
+    assert result["drift_detected"] is True
+    assert result["features"][1]["psi"] > 0.2
+    assert result["features"][1]["ks"] > 0.15
+    assert result["features"][0]["psi"] < 0.1
+
+def test_too_few_samples_is_not_a_signal(profile):
+    """Metrics are withheld until the window has enough samples"""
+    monitor = DriftMonitor(profile, model_version=1)
+    monitor.observe_many(np.full((10, 2), 5.0))
+    result = monitor.evaluate(0.8)
+    assert result["drift_detected"] is False
+    assert result["features"][0]["psi"] is None
+
+def test_windowed_accuracy_and_calibration(profile):
+    """Labeled outcomes drive windowed accuracy and expected calibration error"""
+    monitor = DriftMonitor(profile, model_version=1, window=500)
+    # Old, good outcomes roll out of the window entirely
+    monitor.observe_labeled(np.full(500, 0.9), np.ones(500, dtype=bool))
+    assert monitor.evaluate(0.8)["accuracy"] == 1.0
+
+    correct = np.arange(500) % 2 == 0
+    monitor.observe_labeled(np.full(500, 0.9), correct)
+    result = monitor.evaluate(0.8)
+    assert result["labeled"] == 500
+    assert result["accuracy"] == pytest.approx(0.5)
+    assert result["calibration_error"] == pytest.approx(0.4)
+    assert result["drift_detected"] is True
+
+def test_concurrent_observe_and_reset(profile):
+    """Batches from many threads and resets from another never corrupt the windows"""
+    monitor = DriftMonitor(profile, model_version=1, window=500)
+    narrow = reference_profile(np.random.default_rng(2).normal(size=(1000, 2)), bins=4)
+    errors = []
+
+    def observe():
+        rng = np.random.default_rng()
+        try:
+            for _ in range(200):
+                monitor.observe_many(rng.normal(size=(37, 2)))
+                monitor.observe_labeled(rng.random(37), rng.random(37) > 0.5)
+        except Exception as e:
+            errors.append(e)
+
+    def reset():
+        for i in range(50):
+            monitor.reset(narrow if i % 2 else profile, model_version=i)
+
+    threads = [threading.Thread(target=observe) for _ in range(4)] + [threading.Thread(target=reset)]
+    # Switch threads as often as possible so unguarded updates would interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    for window in monitor.features + [monitor.outcomes]:
+        assert window.counts.min() >= 0
+        assert window.counts.sum() == window.filled
+    result = monitor.evaluate(0.8)
+    assert all(f["psi"] is None or np.isfinite(f["psi"]) for f in result["features"])
@@ -0,0 +1,27 @@
+import pytest
+from pydantic import ValidationError
+
+from features import FeatureSchema
+
+def test_numbered_schema_drives_columns_and_requests():
+    """Column names, request fields and packed rows all follow the schema order"""
+    schema = FeatureSchema.numbered(3)
+    assert schema.names == ("feature1", "feature2", "feature3")
+    assert [column.name for column in schema.columns()] == list(schema.names)
+
+    model = schema.request_model()
+    request = model(feature3=3.0, feature1=1.0, feature2=2.0)
+    assert schema.row(request) == (1.0, 2.0, 3.0)
+    with pytest.raises(ValidationError):
+        model(feature1=1.0, feature2=2.0)
+
+def test_single_feature_row_is_a_tuple():
+    """attrgetter returns a bare value for one name; row() still returns a tuple"""
+    schema = FeatureSchema(["x"])
+    assert schema.row(schema.request_model()(x=0.5)) == (0.5,)
+
+@pytest.mark.parametrize("names", [[], ["a", "a"], ["target"], ["1st"], ["class"]])
+def test_invalid_names_are_rejected(names):
+    """Empty, duplicate, reserved and non-identifier names are refused"""
+    with pytest.raises(ValueError):
+        FeatureSchema(names)
@@ -0,0 +1,58 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = 0
+
+    def do_GET(self):
+        status = 200
+        if self.path == "/flaky" and StubHandler.failures > 0:
+            StubHandler.failures -= 1
+            status = 503
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_connections_are_reused(server):
+    """Sequential calls through one session share a single keep-alive connection"""
+    session = http_client.build_session()
+    for _ in range(5):
+        assert http_client.get(f"{server}/ok", session=session).json() == {"ok": True}
+
+    stats = http_client.connection_stats(session)
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
+
+def test_retries_transient_errors(server):
+    """503s on idempotent requests are retried with backoff until the server recovers"""
+    StubHandler.failures = 2
+    session = http_client.build_session(retry=http_client.build_retry(total=3, backoff=0.01, jitter=0.01))
+    response = http_client.get(f"{server}/flaky", session=session)
+    assert response.status_code == 200
+    assert StubHandler.failures == 0
+
+    StubHandler.failures = 5
+    session = http_client.build_session(retry=http_client.build_retry(total=1, backoff=0.01, jitter=0.01))
+    # Out of retries: the last response is returned rather than raised
+    assert http_client.get(f"{server}/flaky", session=session).status_code == 503
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager
+
+def double_job(value):
+    return {"value": value * 2}
+
+def failing_job(value):
+    raise RuntimeError(f"cannot handle {value}")
+
+def wait(manager, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def test_job_lifecycle(tmp_path, monkeypatch):
+    """Jobs report their result or error once finished"""
+    monkeypatch.setitem(jobs.JOB_KINDS, "double", double_job)
+    monkeypatch.setitem(jobs.JOB_KINDS, "fail", failing_job)
+    manager = JobManager(executor="thread", state_dir=str(tmp_path))
+
+    job = wait(manager, manager.submit("double", value=21).id)
+    assert job.status == "succeeded"
+    assert job.result == {"value": 42}
+
+    job = wait(manager, manager.submit("fail", value=1).id)
+    assert job.status == "failed"
+    assert "cannot handle 1" in job.error
+    manager.shutdown()
+
+def test_jobs_visible_across_workers(tmp_path, monkeypatch):
+    """A job submitted through one worker can be polled through another"""
+    monkeypatch.setitem(jobs.JOB_KINDS, "double", double_job)
+    first = JobManager(executor="thread", state_dir=str(tmp_path))
+    second = JobManager(executor="thread", state_dir=str(tmp_path))
+
+    job = wait(first, first.submit("double", value=5).id)
+    seen = second.get(job.id)
+    assert seen.status == "succeeded"
+    assert seen.result == {"value": 10}
+    assert second.get("unknown") is None
+    first.shutdown()
+
+def test_history_is_bounded(tmp_path, monkeypatch):
+    """Old job records are dropped from memory and from the state directory"""
+    monkeypatch.setitem(jobs.JOB_KINDS, "double", double_job)
+    manager = JobManager(executor="thread", history=2, state_dir=str(tmp_path))
+    ids = [wait(manager, manager.submit("double", value=i).id).id for i in range(4)]
+    assert manager.get(ids[0]) is None
+    assert manager.get(ids[-1]) is not None
+    manager.shutdown()
+
+def test_unknown_job_kind(tmp_path):
+    manager = JobManager(executor="thread", state_dir=str(tmp_path))
+    with pytest.raises(ValueError, match="Unknown job kind"):
+        manager.submit("nope")
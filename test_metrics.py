@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from metrics import Registry, PhaseTimer
+
+def test_histogram_merges_thread_shards():
+    """Observations from many threads add up, with cumulative buckets in the exposition"""
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    def record():
+        for _ in range(1000):
+            histogram.observe(0.05, "/a")
+            histogram.observe(0.5, "/a")
+            histogram.observe(5.0, "/b")
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 4000' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 8000' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 8000' in text
+    assert 'latency_seconds_count{route="/b"} 4000' in text
+    assert 'latency_seconds_sum{route="/b"} 20000' in text
+
+def test_counter_gauge_and_phase_timer():
+    """Counters sum, callback gauges render labelled values, phase timers feed a histogram"""
+    registry = Registry()
+    rows = registry.counter("rows_total", "Rows", ("mode",))
+    rows.inc(10, "full")
+    rows.inc(5, "full")
+    registry.gauge("version", "Version", lambda: None)
+    registry.gauge("phase_seconds", "Phases", lambda: {("fit",): 1.5}, labelnames=("phase",))
+    timer = PhaseTimer(registry.histogram("phase_duration_seconds", "Phases", ("phase",)))
+    with timer.phase("load"):
+        pass
+
+    text = registry.render()
+    assert 'rows_total{mode="full"} 15' in text
+    assert "\nversion " not in text
+    assert 'phase_seconds{phase="fit"} 1.5' in text
+    assert 'phase_duration_seconds_count{phase="load"} 1' in text
+    assert set(timer.seconds) == {"load"}
+
+def test_registering_twice_returns_the_existing_metric():
+    """Re-importing a module that registers metrics reuses them; a clashing kind still fails"""
+    registry = Registry()
+    rows = registry.counter("rows_total", "Rows", ("mode",))
+    assert registry.counter("rows_total", "Rows", ("mode",)) is rows
+    registry.gauge("version", "Version", lambda: 1)
+    registry.gauge("version", "Version", lambda: 2)
+    assert "\nversion 2\n" in registry.render()
+
+    with pytest.raises(ValueError):
+        registry.histogram("rows_total", "Rows", ("mode",))
+    with pytest.raises(ValueError):
+        registry.counter("rows_total", "Rows", ("route",))
+
+def test_shards_of_exited_threads_are_retired():
+    """Short-lived threads leave their counts behind but not their shards"""
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    counter = registry.counter("rows_total", "Rows")
+
+    def record():
+        histogram.observe(0.5, "/a")
+        counter.inc(2)
+
+    for _ in range(50):
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+
+    assert len(histogram._shards) <= 1
+    assert counter.values() == {(): 100}
+    assert len(counter._shards) == 0
+    text = registry.render()
+    assert 'latency_seconds_bucket{route="/a",le="1"} 50' in text
+    assert 'latency_seconds_sum{route="/a"} 25' in text
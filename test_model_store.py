@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from dataset import make_dataset
+from model_store import ModelStore, ModelWatcher
+
+def fit_model(seed):
+    X, y = make_dataset(200, random_state=seed)
+    return LogisticRegression().fit(X, y)
+
+def test_publish_and_load(tmp_path):
+    """Published models get increasing versions and round-trip through the store"""
+    store = ModelStore(str(tmp_path))
+    assert store.latest_version() is None
+    assert store.load_serving_model() is None
+
+    first = store.publish(fit_model(1), {"performance": 0.9})
+    second = store.publish(fit_model(2), {"performance": 0.95})
+    assert (first.version, second.version) == (1, 2)
+    assert store.latest_version() == 2
+
+    loaded = store.load_serving_model()
+    assert loaded.version == 2
+    assert loaded.performance == 0.95
+    assert loaded.scorer is not None
+    np.testing.assert_array_equal(store.load(2)[0].coef_, second.model.coef_)
+
+    # No staging directories or temp files are left behind
+    # Hidden entries are lock files
+    assert sorted(n for n in os.listdir(tmp_path) if not n.startswith(".")) == ["LATEST", "v000001", "v000002"]
+
+def test_prune_keeps_latest_versions(tmp_path):
+    """Only the newest `keep` versions stay on disk"""
+    store = ModelStore(str(tmp_path), keep=2)
+    for seed in range(4):
+        store.publish(fit_model(seed), {"performance": 0.9})
+    assert store.versions() == [3, 4]
+    assert store.latest_version() == 4
+
+def test_watcher_hands_over_new_versions(tmp_path):
+    """The watcher loads newer versions and skips ones already serving"""
+    store = ModelStore(str(tmp_path))
+    serving = {"model": None}
+    watcher = ModelWatcher(
+        store,
+        get_current_version=lambda: serving["model"].version if serving["model"] else None,
+        on_update=lambda new_model: serving.update(model=new_model)
+    )
+
+    assert watcher.check() is False
+    store.publish(fit_model(1), {"performance": 0.9})
+    assert watcher.check() is True
+    assert serving["model"].version == 1
+    assert watcher.check() is False
+
+def test_compact_artifact_is_memory_mapped(tmp_path):
+    """Linear models are served from memory-mapped weights without unpickling"""
+    store = ModelStore(str(tmp_path))
+    published = store.publish(fit_model(1), {"performance": 0.9})
+    assert len(store.artifact_paths(published.version)) == 2
+
+    loaded = store.load_serving_model()
+    assert loaded.model is None
+    base = loaded.scorer.coef
+    while not isinstance(base, np.memmap) and base is not None:
+        base = base.base
+    assert base is not None
+    X, _ = make_dataset(50, random_state=9)
+    np.testing.assert_allclose(loaded.scorer.predict_proba(X), published.model.predict_proba(X))
+
+def test_models_without_scorer_fall_back_to_pickle(tmp_path):
+    """Non-linear models have no compact artifact and load the estimator"""
+    from sklearn.tree import DecisionTreeClassifier
+
+    store = ModelStore(str(tmp_path))
+    X, y = make_dataset(100)
+    published = store.publish(DecisionTreeClassifier().fit(X, y), {"performance": 0.9})
+    assert store.artifact_paths(published.version) == []
+    loaded = store.load_serving_model()
+    assert loaded.scorer is None
+    assert loaded.model is not None
+
+def test_exclusive_lock(tmp_path):
+    """Only one holder gets the lock; it is free again once released"""
+    store = ModelStore(str(tmp_path))
+    with store.exclusive("retrain") as first:
+        assert first is True
+        with store.exclusive("retrain") as second:
+            assert second is False
+        with store.exclusive("other") as other:
+            assert other is True
+    with store.exclusive("retrain") as again:
+        assert again is True
+
+def test_concurrent_publishes_never_move_latest_back(tmp_path):
+    """However publishers interleave, LATEST ends on the highest version"""
+    import threading
+    store = ModelStore(str(tmp_path), keep=0)
+    model = fit_model(0)
+    threads = [threading.Thread(target=lambda: [store.publish(model, {}) for _ in range(3)]) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.versions() == list(range(1, 19))
+    assert store.latest_version() == 18
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from notifications import MAX_EMBEDS_PER_MESSAGE, NotificationDispatcher
+from webhook_stub import WebhookStub
+
+@pytest.fixture
+def stub():
+    with WebhookStub() as stub:
+        yield stub
+
+def make_dispatcher(url, **kwargs):
+    kwargs.setdefault("min_interval", 0.0)
+    kwargs.setdefault("linger", 0.05)
+    return NotificationDispatcher(url, **kwargs)
+
+def test_bursts_share_payloads(stub):
+    """A burst of notifications goes out as few payloads of at most 10 embeds"""
+    dispatcher = make_dispatcher(stub.url)
+    for i in range(25):
+        assert dispatcher.notify(f"event {i}", "Test", 0x00ff00)
+    dispatcher.stop()
+
+    assert [embed["description"] for embed in stub.embeds()] == [f"event {i}" for i in range(25)]
+    assert all(len(payload["embeds"]) <= MAX_EMBEDS_PER_MESSAGE for payload in stub.payloads)
+    assert len(stub.payloads) == 3
+    assert dispatcher.stats()["sent"] == 25
+
+def test_repeated_messages_are_deduplicated(stub):
+    """The same keyed message is only sent again once something else was reported"""
+    dispatcher = make_dispatcher(stub.url)
+    assert dispatcher.notify("ok", "Performance Check", 1, dedupe_key="performance-ok")
+    assert not dispatcher.notify("ok", "Performance Check", 1, dedupe_key="performance-ok")
+    assert dispatcher.notify("drift", "Model Drift Alert", 2)
+    assert dispatcher.notify("ok", "Performance Check", 1, dedupe_key="performance-ok")
+    dispatcher.stop()
+
+    assert [embed["title"] for embed in stub.embeds()] == ["Performance Check", "Model Drift Alert", "Performance Check"]
+    assert dispatcher.stats()["deduplicated"] == 1
+
+def test_rate_limited_posts_are_retried(stub):
+    """A 429 pauses for retry_after and resends the same batch"""
+    stub.rate_limit_every = 2
+    dispatcher = make_dispatcher(stub.url, linger=0.0)
+    for i in range(3):
+        dispatcher.notify(f"event {i}", "Test", 0)
+        dispatcher.flush()
+    dispatcher.stop()
+
+    assert len(stub.embeds()) == 3
+    stats = dispatcher.stats()
+    assert stats["rate_limited"] == stub.rate_limited >= 1
+    assert stats["failed"] == 0
+
+def test_notify_does_not_wait_for_webhook(stub):
+    """A slow webhook never delays the caller"""
+    stub.delay = 0.5
+    dispatcher = make_dispatcher(stub.url)
+    start = time.perf_counter()
+    for i in range(5):
+        dispatcher.notify(f"event {i}", "Test", 0)
+    assert time.perf_counter() - start < 0.1
+    dispatcher.stop()
+    assert len(stub.embeds()) == 5
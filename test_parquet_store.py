@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from dataset import make_dataset, rows_digest, format_digest
+from parquet_store import ParquetDatasetStore
+
+def test_insert_load_roundtrip(tmp_path):
+    """Partitions load back as float32/int8 arrays in id order"""
+    store = ParquetDatasetStore(str(tmp_path))
+    X, y = make_dataset(1050)
+    store.insert(X[:1000], y[:1000], replace=True)
+    store.insert(X[1000:], y[1000:])
+
+    X_loaded, y_loaded = store.load(chunk_size=128)
+    assert X_loaded.dtype == np.float32
+    assert y_loaded.dtype == np.int8
+    np.testing.assert_allclose(X_loaded, X.astype(np.float32))
+    np.testing.assert_array_equal(y_loaded, y)
+
+def test_id_ranges_and_fingerprint(tmp_path):
+    """Watermarks, range loads and fingerprints match the SQL backend's semantics"""
+    store = ParquetDatasetStore(str(tmp_path))
+    X, y = make_dataset(300)
+    store.insert(X[:200], y[:200], replace=True)
+    store.insert(X[200:], y[200:])
+
+    assert store.watermark() == (300, 300)
+    assert store.watermark(min_id=150, max_id=250) == (100, 250)
+    X_tail, y_tail = store.load(min_id=150, max_id=250, chunk_size=64)
+    np.testing.assert_allclose(X_tail, X[150:250].astype(np.float32))
+    np.testing.assert_array_equal(y_tail, y[150:250])
+
+    assert store.fingerprint() == {"n_rows": 300, "max_id": 300, "digest": format_digest(rows_digest(X, y))}
+
+    # Replacing drops old partitions but never reuses ids; their files go at the next replace
+    store.insert(X[:10], y[:10], replace=True)
+    assert store.watermark() == (10, 310)
+    assert len(list(tmp_path.glob("*.parquet"))) == 3
+    store.insert(X[:5], y[:5], replace=True)
+    assert sorted(p.name for p in tmp_path.glob("*.parquet")) == ["batch-000003.parquet", "batch-000004.parquet"]
+
+def test_id_bounds_span_partitions(tmp_path):
+    """Block boundaries count rows across partitions and skip the ids a replace retired"""
+    store = ParquetDatasetStore(str(tmp_path))
+    X, y = make_dataset(100)
+    store.insert(X[:50], y[:50], replace=True)
+    store.insert(X[:10], y[:10], replace=True)
+    store.insert(X[10:25], y[10:25])
+    store.insert(X[25:30], y[25:30])
+
+    assert store.watermark() == (30, 80)
+    assert store.id_bounds(12) == [62, 74]
+    assert store.id_bounds(12, max_id=70) == [62]
+    assert store.id_bounds(5) == [55, 60, 65, 70, 75, 80]
+
+def test_small_appends_are_compacted(tmp_path):
+    """Trailing small partitions merge into one file without changing ids or the fingerprint"""
+    store = ParquetDatasetStore(str(tmp_path), compact_rows=100, compact_files=4)
+    X, y = make_dataset(520)
+    store.insert(X[:500], y[:500], replace=True)
+    for i in range(500, 520, 5):
+        store.insert(X[i:i + 5], y[i:i + 5])
+
+    partitions = store._read_manifest()["partitions"]
+    assert [(p["min_id"], p["max_id"]) for p in partitions] == [(1, 500), (501, 520)]
+    assert store.fingerprint() == {"n_rows": 520, "max_id": 520, "digest": format_digest(rows_digest(X, y))}
+    X_loaded, y_loaded = store.load(min_id=490, chunk_size=8)
+    np.testing.assert_allclose(X_loaded, X[490:].astype(np.float32))
+    np.testing.assert_array_equal(y_loaded, y[490:])
+
+def test_readers_survive_a_concurrent_replace(tmp_path):
+    """A stream that started before a replace keeps reading the files it saw"""
+    store = ParquetDatasetStore(str(tmp_path))
+    X, y = make_dataset(200)
+    store.insert(X[:100], y[:100], replace=True)
+    store.insert(X[100:], y[100:])
+
+    chunks = store.iter_chunks(chunk_size=50)
+    first = next(chunks)
+    store.insert(X[:10], y[:10], replace=True)
+    store.insert(X[:10], y[:10], replace=True)
+    X_rest = np.concatenate([first[0], *(X_chunk for X_chunk, _ in chunks)])
+    np.testing.assert_allclose(X_rest, X.astype(np.float32))
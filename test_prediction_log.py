@@ -0,0 +1,101 @@
+import time
+
+from sqlalchemy import create_engine, Column, Integer, Float, Table, MetaData, select, func
+
+from prediction_log import PredictionLogger, prediction_volume, rebuild_rollup
+
+def make_logger(tmp_path, **kwargs):
+    engine = create_engine(f"sqlite:///{tmp_path / 'log.db'}")
+    metadata = MetaData()
+    table = Table(
+        'predictions',
+        metadata,
+        Column('id', Integer, primary_key=True),
+        Column('created_at', Float),
+        Column('feature1', Float),
+        Column('feature2', Float),
+        Column('prediction', Integer),
+        Column('probability', Float),
+        Column('model_version', Integer)
+    )
+    rollup = Table(
+        'prediction_rollups',
+        metadata,
+        Column('bucket_start', Integer, primary_key=True),
+        Column('model_version', Integer, primary_key=True),
+        Column('n_predictions', Integer, nullable=False),
+        Column('n_positive', Integer, nullable=False),
+        Column('sum_probability', Float, nullable=False)
+    )
+    metadata.create_all(engine)
+    return engine, table, PredictionLogger(engine, table, rollup=rollup, **kwargs)
+
+def count(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+def test_records_are_flushed_in_batches(tmp_path):
+    """Logged records reach the table via the background writer"""
+    engine, table, prediction_logger = make_logger(tmp_path, batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        assert prediction_logger.log((time.time(), float(i), 0.0, 1, 0.9, 1))
+
+    deadline = time.time() + 5
+    while count(engine, table) < 25 and time.time() < deadline:
+        time.sleep(0.02)
+    prediction_logger.stop()
+
+    assert count(engine, table) == 25
+    stats = prediction_logger.stats()
+    assert stats["written"] == 25
+    assert stats["dropped"] == 0
+    assert stats["flushes"] >= 3
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path):
+    """Past capacity records are dropped and counted, and backpressure is reported"""
+    engine, table, prediction_logger = make_logger(tmp_path, capacity=10, batch_size=100, flush_interval=60)
+    accepted = prediction_logger.log_many([(time.time(), 0.0, 0.0, 0, 0.5, 1)] * 15)
+    assert accepted == 10
+    assert prediction_logger.log((time.time(), 0.0, 0.0, 0, 0.5, 1)) is False
+
+    stats = prediction_logger.stats()
+    assert stats["dropped"] == 6
+    assert stats["backpressure"] is True
+
+    assert prediction_logger.flush() == 10
+    assert prediction_logger.stats()["backpressure"] is False
+    prediction_logger.stop()
+    assert count(engine, table) == 10
+
+def test_rollup_matches_predictions(tmp_path):
+    """Flushes keep per-bucket counts that equal a rebuild from the raw rows"""
+    engine, table, prediction_logger = make_logger(tmp_path, batch_size=7, flush_interval=60, rollup_seconds=60)
+    records = [(1000.0 + 13 * i, 0.0, 0.0, i % 3 == 0, 0.25 + 0.5 * (i % 2), 1 + i // 40) for i in range(100)]
+    prediction_logger.log_many(records)
+    prediction_logger.flush()
+    prediction_logger.stop()
+
+    def rows():
+        with engine.connect() as connection:
+            return sorted(connection.execute(select(prediction_logger.rollup)).all())
+
+    incremental = rows()
+    rebuild_rollup(engine, table, prediction_logger.rollup, 60)
+    assert [r[:4] for r in rows()] == [r[:4] for r in incremental]
+    assert sum(r[2] for r in incremental) == 100
+
+    # 300-second buckets, two per page
+    buckets, next_start = prediction_volume(engine, prediction_logger.rollup, 300, limit=2)
+    assert [b["start"] for b in buckets] == [900, 1200]
+    assert next_start == 1500
+    first = [r for r in records if 900 <= r[0] < 1200]
+    assert buckets[0]["count"] == len(first)
+    assert buckets[0]["positive_rate"] == sum(r[3] for r in first) / len(first)
+    assert abs(buckets[0]["mean_probability"] - sum(r[4] for r in first) / len(first)) < 1e-9
+
+    pages = buckets
+    while next_start is not None:
+        buckets, next_start = prediction_volume(engine, prediction_logger.rollup, 300, start=next_start, limit=2)
+        pages += buckets
+    assert sum(b["count"] for b in pages) == 100
+    assert sum(b["by_version"].get("3", 0) for b in pages) == 20
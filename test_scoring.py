@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from dataset import make_dataset
+from inference import predict_with_proba
+from scoring import build_scorer
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = make_dataset(500)
+    rng = np.random.default_rng(0)
+    # Include far-out points to exercise both tails of the sigmoid
+    X_test = np.vstack([rng.normal(size=(1000, 2)), rng.normal(scale=1e3, size=(50, 2))])
+    return X, y, X_test
+
+@pytest.mark.parametrize("model", [
+    LogisticRegression(random_state=42),
+    SGDClassifier(loss="log_loss", random_state=42),
+])
+def test_scorer_matches_sklearn(data, model):
+    """Compiled scorer gives the same labels and probabilities as sklearn"""
+    X, y, X_test = data
+    model.fit(X, y)
+    scorer = build_scorer(model)
+    assert scorer is not None
+
+    np.testing.assert_array_equal(scorer.predict(X_test), model.predict(X_test))
+    np.testing.assert_array_equal(scorer.predict_proba(X_test), model.predict_proba(X_test))
+
+    labels, probabilities = scorer.predict_with_proba(X_test)
+    np.testing.assert_array_equal(labels, model.predict(X_test))
+    np.testing.assert_allclose(probabilities, model.predict_proba(X_test).max(axis=1), rtol=1e-12)
+
+    for row in X_test[:200]:
+        label, probability = scorer.predict_one(row.tolist())
+        assert label == model.predict(row[None, :])[0]
+        assert probability == pytest.approx(model.predict_proba(row[None, :])[0].max(), rel=1e-12)
+
+def test_scorer_matches_predict_with_proba(data):
+    """Fast path agrees with the generic sklearn inference helper"""
+    X, y, X_test = data
+    model = LogisticRegression(random_state=42).fit(X, y)
+    labels, probabilities = predict_with_proba(model, X_test)
+    fast_labels, fast_probabilities = build_scorer(model).predict_with_proba(X_test)
+    np.testing.assert_array_equal(fast_labels, labels)
+    np.testing.assert_allclose(fast_probabilities, probabilities, rtol=1e-12)
+
+def test_no_scorer_for_unsupported_models(data):
+    """Non-linear and hinge-loss models fall back to sklearn"""
+    X, y, _ = data
+    assert build_scorer(RandomForestClassifier(n_estimators=5).fit(X, y)) is None
+    assert build_scorer(SGDClassifier(loss="hinge").fit(X, y)) is None
+    assert build_scorer(None) is None
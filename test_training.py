@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import create_engine, Column, Integer, Table, MetaData
+
+from dataset import make_dataset, SQLDatasetStore
+from features import FEATURES, FeatureSchema
+from training import (DEFAULT_CANDIDATES, _id_ranges, blend_performance, build_model, fit_candidates, fit_streaming,
+                      split_holdout)
+
+def test_fit_candidates_ranks_by_validation_accuracy():
+    """Every candidate is fitted and results come back best first"""
+    X, y = make_dataset(600)
+    X_train, X_val, y_train, y_val = split_holdout(X, y)
+
+    results = fit_candidates(X_train, y_train, X_val, y_val, mode="full", n_jobs=2)
+    assert {r["name"] for r in results} == set(DEFAULT_CANDIDATES["full"])
+    accuracies = [r["accuracy"] for r in results]
+    assert accuracies == sorted(accuracies, reverse=True)
+    assert results[0]["accuracy"] == results[0]["model"].score(X_val, y_val)
+
+def test_fit_candidates_subset_and_incremental():
+    """Candidates can be narrowed by name; incremental ones support partial_fit"""
+    X, y = make_dataset(300)
+    results = fit_candidates(X, y, X, y, mode="incremental", names=["sgd_alpha1e-3"], n_jobs=1)
+    assert [r["name"] for r in results] == ["sgd_alpha1e-3"]
+    assert hasattr(results[0]["model"], "partial_fit")
+
+    with pytest.raises(ValueError):
+        fit_candidates(X, y, X, y, mode="incremental", names=["logreg_c1"])
+
+def test_build_model_is_default_candidate():
+    """build_model returns the first candidate of each mode"""
+    assert type(build_model("full")).__name__ == "LogisticRegression"
+    assert type(build_model("incremental")).__name__ == "SGDClassifier"
+
+def test_blend_performance_weights_by_rows():
+    """Few new rows leave the accuracy alone; enough are weighted against the rows behind it"""
+    assert blend_performance(0.9, 100, 0.0, 1, min_rows=50) == (0.9, 100)
+    performance, rows = blend_performance(0.9, 100, 0.6, 50, min_rows=50)
+    assert performance == pytest.approx(0.8)
+    assert rows == 150
+    # Models published without evaluated_rows take the prequential score
+    assert blend_performance(0.9, 0, 0.6, 50, min_rows=50) == (0.6, 50)
+
+class RecordingStore:
+    """Dataset store wrapper remembering the size of every chunk it streamed"""
+
+    def __init__(self, store):
+        self.store = store
+        self.chunk_rows = []
+
+    def id_bounds(self, step, max_id=None):
+        return self.store.id_bounds(step, max_id=max_id)
+
+    def iter_chunks(self, **kwargs):
+        for X, y in self.store.iter_chunks(**kwargs):
+            self.chunk_rows.append(len(y))
+            yield X, y
+
+def test_id_ranges_follow_actual_ids(tmp_path):
+    """Gaps in the ids never put more than block_rows rows in one range"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'train.db'}")
+    metadata = MetaData()
+    table = Table('datasets', metadata, Column('id', Integer, primary_key=True), *FEATURES.columns(),
+                  Column('target', Integer), sqlite_autoincrement=True)
+    metadata.create_all(engine)
+    store = SQLDatasetStore(engine, table, None)
+    X, y = make_dataset(3_000)
+    store.insert(X[:500], y[:500], replace=True)
+    store.insert(X, y, replace=True)
+    # Delete most of the rows in the middle, as a partial cleanup would
+    with engine.begin() as connection:
+        connection.execute(table.delete().where(table.c.id.between(1_000, 2_800)))
+    n_rows, max_id = store.watermark()
+
+    ranges = _id_ranges(store, max_id, 400)
+    counts = [store.watermark(lo, hi)[0] for lo, hi in ranges]
+    assert sum(counts) == n_rows
+    assert counts[:-1] == [400] * (len(counts) - 1) and 0 < counts[-1] <= 400
+    assert ranges[0][0] is None and ranges[-1][1] == max_id
+
+@pytest.mark.parametrize("n_features", [2, 16])
+def test_streaming_matches_in_memory_fit(tmp_path, n_features):
+    """Out-of-core SGD stays within the documented 0.02 of an in-memory LogisticRegression"""
+    schema = FeatureSchema.numbered(n_features)
+    engine = create_engine(f"sqlite:///{tmp_path / 'train.db'}")
+    metadata = MetaData()
+    table = Table('datasets', metadata, Column('id', Integer, primary_key=True), *schema.columns(),
+                  Column('target', Integer), sqlite_autoincrement=True)
+    metadata.create_all(engine)
+    store = SQLDatasetStore(engine, table, None)
+
+    X, y = make_dataset(25_000, random_state=7, n_features=n_features)
+    X_test, y_test = X[20_000:], y[20_000:]
+    # A replaced table leaves ids starting well above 1
+    store.insert(X[:500], y[:500], replace=True)
+    store.insert(X[:15_000], y[:15_000], replace=True)
+    store.insert(X[15_000:20_000], y[15_000:20_000])
+    n_rows, max_id = store.watermark()
+
+    recording = RecordingStore(store)
+    result = fit_streaming(recording, n_rows, max_id, n_features, memory_budget_mb=0.1)
+    assert result["block_rows"] == 1_000
+    assert max(recording.chunk_rows) <= result["block_rows"]
+    # 5 epochs plus the validation pass, each over all 20k rows
+    assert sum(recording.chunk_rows) == 6 * 20_000
+    assert result["sample"].shape == (10_000, n_features)
+
+    in_memory = build_model("full").fit(X[:20_000], y[:20_000])
+    assert result["model"].score(X_test, y_test) >= in_memory.score(X_test, y_test) - 0.02
+    assert abs(result["accuracy"] - in_memory.score(X_test, y_test)) < 0.05
@@ -0,0 +1,269 @@
+"""Model fitting strategies for retraining: full refit, incremental updates and
+out-of-core training for datasets larger than the memory budget"""
+import copy
+import importlib
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from dataset import LOAD_CHUNK_SIZE
+
+load_dotenv()
+
+# "full" refits a LogisticRegression on the whole table every time.
+# "incremental" keeps an SGDClassifier and only feeds it rows added since the
+# last run, falling back to a full refit when needed.
+RETRAIN_MODE = os.getenv("RETRAIN_MODE", "full")
+FULL_REFIT_EVERY = int(os.getenv("FULL_REFIT_EVERY", "20"))
+# Share of rows held out of a full refit to measure the model's accuracy
+VALIDATION_FRACTION = float(os.getenv("VALIDATION_FRACTION", "0.2"))
+# New rows an incremental update needs before its prequential score is
+# blended into the model's accuracy; fewer leave the accuracy as it was
+PREQUENTIAL_MIN_ROWS = int(os.getenv("PREQUENTIAL_MIN_ROWS", "200"))
+# Comma-separated candidate names to try on a full refit (empty: the mode's defaults)
+TRAIN_CANDIDATES = [name for name in os.getenv("TRAIN_CANDIDATES", "").split(",") if name.strip()]
+# Worker processes fitting candidates side by side; -1 uses every core
+TRAIN_N_JOBS = int(os.getenv("TRAIN_N_JOBS", "-1"))
+# Memory a full refit may use for training data. Larger datasets are trained
+# out of core: streamed in shuffled blocks through SGD for TRAIN_EPOCHS passes.
+TRAIN_MEMORY_BUDGET_MB = float(os.getenv("TRAIN_MEMORY_BUDGET_MB", "1024"))
+TRAIN_EPOCHS = int(os.getenv("TRAIN_EPOCHS", "5"))
+# Rows kept (reservoir-sampled) to build the drift reference profile when streaming
+PROFILE_SAMPLE_ROWS = 10_000
+
+# Candidate estimators per retrain mode as (class path, params), best-known first
+# so ties go to the earlier one. Incremental candidates must support
+# partial_fit since the winner keeps being updated between full refits.
+# Classes are named rather than imported so sklearn loads only when training.
+CANDIDATES = {
+    "full": {
+        "logreg_c1": ("sklearn.linear_model.LogisticRegression", {"C": 1.0}),
+        "logreg_c0.1": ("sklearn.linear_model.LogisticRegression", {"C": 0.1}),
+        "logreg_c10": ("sklearn.linear_model.LogisticRegression", {"C": 10.0}),
+        "sgd_log": ("sklearn.linear_model.SGDClassifier", {"loss": "log_loss", "alpha": 1e-4}),
+        # Opt-in through TRAIN_CANDIDATES: much slower to fit, and it is
+        # served through sklearn instead of the linear fast path
+        "random_forest": ("sklearn.ensemble.RandomForestClassifier", {"n_estimators": 100, "max_depth": 8, "n_jobs": 1}),
+    },
+    "incremental": {
+        "sgd_alpha1e-4": ("sklearn.linear_model.SGDClassifier", {"loss": "log_loss", "alpha": 1e-4}),
+        "sgd_alpha1e-3": ("sklearn.linear_model.SGDClassifier", {"loss": "log_loss", "alpha": 1e-3}),
+        "sgd_alpha1e-5": ("sklearn.linear_model.SGDClassifier", {"loss": "log_loss", "alpha": 1e-5}),
+    },
+}
+DEFAULT_CANDIDATES = {
+    "full": ["logreg_c1", "logreg_c0.1", "logreg_c10", "sgd_log"],
+    "incremental": list(CANDIDATES["incremental"]),
+}
+
+
+def _estimator_class(path):
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def build_model(mode=RETRAIN_MODE):
+    """Return the default (first) candidate for the given retrain mode, unfitted"""
+    estimator_path, params = next(iter(CANDIDATES[mode].values()))
+    return _estimator_class(estimator_path)(random_state=42, **params)
+
+
+def split_holdout(X, y, fraction=VALIDATION_FRACTION):
+    """Split off a validation set; returns (X_train, X_val, y_train, y_val)"""
+    _, class_counts = np.unique(y, return_counts=True)
+    if fraction <= 0 or len(y) * fraction < 2 or len(class_counts) < 2:
+        return X, X, y, y
+    stratify = y if class_counts.min() >= 2 else None
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=fraction, random_state=42, stratify=stratify)
+
+
+def fit_full(X, y, mode=RETRAIN_MODE):
+    """Fit a fresh model on the whole dataset"""
+    model = build_model(mode)
+    model.fit(X, y)
+    return model
+
+
+def fit_candidate(name, estimator_path, params, X_train, y_train, X_val, y_val):
+    """Fit one candidate and score it on the validation split"""
+    start = time.perf_counter()
+    model = _estimator_class(estimator_path)(random_state=42, **params).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return {
+        "name": name,
+        "model": model,
+        "params": params,
+        "accuracy": float(model.score(X_val, y_val)),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def fit_candidates(X_train, y_train, X_val, y_val, mode=RETRAIN_MODE, names=None, n_jobs=TRAIN_N_JOBS):
+    """Fit every candidate for the mode in parallel; returns results best first.
+
+    Candidates run in separate joblib worker processes, so wall-clock time
+    tracks the slowest candidate rather than the sum of all of them.
+    """
+    available = CANDIDATES[mode]
+    names = names or TRAIN_CANDIDATES or DEFAULT_CANDIDATES[mode]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown {mode} candidates: {', '.join(unknown)}")
+
+    from joblib import Parallel, delayed
+    tasks = [delayed(fit_candidate)(name, *available[name], X_train, y_train, X_val, y_val) for name in names]
+    results = Parallel(n_jobs=min(len(tasks), n_jobs) if n_jobs > 0 else n_jobs)(tasks)
+    # Stable sort: equal accuracy keeps the configured order
+    return sorted(results, key=lambda result: -result["accuracy"])
+
+
+def supports_incremental(model):
+    """Whether a fitted model can be updated with partial_fit"""
+    return model is not None and hasattr(model, "partial_fit") and hasattr(model, "classes_")
+
+
+def blend_performance(performance, evaluated_rows, score, n_rows, min_rows=PREQUENTIAL_MIN_ROWS):
+    """Fold a prequential score on n_rows new rows into an accuracy measured on evaluated_rows.
+
+    Returns (performance, evaluated_rows), each score weighted by the rows
+    behind it. Below min_rows the estimate is returned unchanged, so a
+    single misclassified /feedback row cannot pull it under the threshold.
+    """
+    if n_rows < min_rows:
+        return performance, evaluated_rows
+    total = evaluated_rows + n_rows
+    return (performance * evaluated_rows + score * n_rows) / total, total
+
+
+def partial_update(model, X, y):
+    """Return a copy of the model updated on the new rows only.
+
+    The live model is never mutated, so whatever is serving predictions keeps
+    a consistent set of weights until the updated copy replaces it.
+    """
+    updated = copy.deepcopy(model)
+    updated.partial_fit(X, y)
+    return updated
+
+
+# Streaming learner: the sgd_log candidate with averaged weights (ASGD),
+# which makes a few passes over a stream land close to the batch optimum.
+# It keeps supporting partial_fit, so incremental mode can update it.
+STREAMING_CANDIDATE = ("sgd_streaming", "sklearn.linear_model.SGDClassifier",
+                       {"loss": "log_loss", "alpha": 1e-4, "average": True})
+
+
+def in_memory_bytes(n_rows, n_features, load_chunk_rows=LOAD_CHUNK_SIZE):
+    """Rough peak of a full refit's training data.
+
+    The loaded float32/int8 arrays, their train/validation split copies and
+    the float64 copy sklearn fits on, plus one load chunk in flight.
+    """
+    per_row = 2 * (4 * n_features + 1) + 8 * n_features
+    return n_rows * per_row + min(n_rows, load_chunk_rows) * streaming_row_bytes(n_features)
+
+
+def streaming_row_bytes(n_features):
+    """Peak bytes per row of one streamed block.
+
+    Covers the largest case, the SQL backend: fetched row tuples of Python
+    floats, the float64 block built from them, then the float32 features and
+    their shuffled copy.
+    """
+    fetched = 56 + 8 * (n_features + 1) + 24 * (n_features + 1)
+    return fetched + 8 * (n_features + 1) + 2 * (4 * n_features + 1)
+
+
+def _id_ranges(store, max_id, block_rows):
+    """Split the ids up to max_id into (min_id, max_id] ranges of at most block_rows rows.
+
+    Boundaries come from the store's actual ids, so gaps left by deletes or
+    replaces never put more than block_rows rows in one range.
+    """
+    bounds = store.id_bounds(block_rows, max_id=max_id)
+    if not bounds or bounds[-1] != max_id:
+        bounds.append(max_id)
+    return list(zip([None, *bounds[:-1]], bounds))
+
+
+def _holdout_mask(n, every):
+    """Every `every`-th row of a block, by position in id order, is validation data"""
+    mask = np.zeros(n, dtype=bool)
+    if every:
+        mask[::every] = True
+    return mask
+
+
+def _reservoir_update(sample, seen, X, rng):
+    """Add a block to a uniform reservoir sample (Algorithm R, vectorised); returns rows seen"""
+    fill = max(0, min(len(sample) - seen, len(X)))
+    sample[seen:seen + fill] = X[:fill]
+    if fill < len(X):
+        # Row i of the rest replaces a random slot with probability len(sample) / (its index + 1);
+        # for repeated slots the later row wins, as it would sequentially
+        slots = rng.integers(0, np.arange(seen + fill, seen + len(X)) + 1)
+        keep = slots < len(sample)
+        sample[slots[keep]] = X[fill:][keep]
+    return seen + len(X)
+
+
+def fit_streaming(store, n_rows, max_id, n_features, epochs=TRAIN_EPOCHS,
+                  memory_budget_mb=TRAIN_MEMORY_BUDGET_MB, fraction=VALIDATION_FRACTION, random_state=42):
+    """Train out of core on the rows of a dataset store up to max_id.
+
+    Each epoch visits the id ranges in a fresh random order and shuffles the
+    rows within each block, so SGD sees an approximately shuffled stream while
+    only one block, sized from memory_budget_mb, is held at a time. Every
+    1/fraction-th row of each block is held out for validation, the same rows
+    every epoch. Returns a result dict like fit_candidate, plus a row sample
+    for the drift reference profile and the block size used.
+
+    Accuracy tolerance: with the default 5 epochs, holdout accuracy is within
+    0.02 of a LogisticRegression fitted in memory on the same training rows
+    (make_dataset data, 2 to 32 features; see
+    test_streaming_matches_in_memory_fit). Fewer epochs or far wider data
+    can widen the gap.
+    """
+    start_time = time.perf_counter()
+    name, estimator_path, params = STREAMING_CANDIDATE
+    model = _estimator_class(estimator_path)(random_state=random_state, **params)
+    rng = np.random.default_rng(random_state)
+    block_rows = max(1_000, int(memory_budget_mb * 2**20 // streaming_row_bytes(n_features)))
+    every = round(1 / fraction) if fraction > 0 else 0
+    ranges = _id_ranges(store, max_id, block_rows)
+    # The dataset's targets are binary labels; partial_fit needs them all up front
+    classes = np.array([0, 1])
+
+    sample = np.empty((min(PROFILE_SAMPLE_ROWS, n_rows), n_features), dtype=np.float32)
+    seen = 0
+    for epoch in range(epochs):
+        for index in rng.permutation(len(ranges)):
+            lo, hi = ranges[index]
+            for X, y in store.iter_chunks(chunk_size=block_rows, min_id=lo, max_id=hi):
+                train = ~_holdout_mask(len(y), every)
+                X, y = X[train], y[train]
+                if epoch == 0:
+                    seen = _reservoir_update(sample, seen, X, rng)
+                order = rng.permutation(len(y))
+                model.partial_fit(X[order], y[order], classes=classes)
+
+    correct = total = 0
+    for lo, hi in ranges:
+        for X, y in store.iter_chunks(chunk_size=block_rows, min_id=lo, max_id=hi):
+            # Without a holdout, score on the training rows as split_holdout does
+            held_out = _holdout_mask(len(y), every) if every else slice(None)
+            correct += int((model.predict(X[held_out]) == y[held_out]).sum())
+            total += len(y[held_out])
+    return {
+        "name": name,
+        "model": model,
+        "params": {**params, "epochs": epochs, "block_rows": block_rows},
+        "accuracy": correct / total if total else 0.0,
+        "validation_rows": total,
+        "fit_seconds": time.perf_counter() - start_time,
+        "sample": sample[:min(seen, len(sample))],
+        "block_rows": block_rows,
+    }
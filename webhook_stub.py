@@ -0,0 +1,109 @@
+"""Local stand-in for a Discord webhook, used by tests and benchmarks.
+
+    python webhook_stub.py --port 9000
+
+Records every JSON payload and answers 204 like Discord does. It can also
+answer slowly or reject every Nth request with a 429 carrying retry_after,
+so the notification dispatcher can be exercised without a real webhook.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookStub:
+    """Threaded HTTP server collecting webhook payloads in memory"""
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, rate_limit_every=0, retry_after=0.05, verbose=False):
+        self.delay = delay
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.payloads = []
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                with stub._lock:
+                    stub.requests += 1
+                    limited = stub.rate_limit_every and stub.requests % stub.rate_limit_every == 0
+                    if limited:
+                        stub.rate_limited += 1
+                    else:
+                        stub.payloads.append(json.loads(body))
+                if limited:
+                    reply = json.dumps({"message": "You are being rate limited.",
+                                        "retry_after": stub.retry_after}).encode()
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(reply)))
+                    self.end_headers()
+                    self.wfile.write(reply)
+                    return
+                if stub.verbose:
+                    print(json.dumps(json.loads(body), ensure_ascii=False))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def embeds(self):
+        """All embeds received so far, in arrival order"""
+        with self._lock:
+            return [embed for payload in self.payloads for embed in payload.get("embeds", [])]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub Discord webhook that prints payloads")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    stub = WebhookStub(port=args.port, delay=args.delay, rate_limit_every=args.rate_limit_every, verbose=True)
+    print(f"Stub webhook listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()